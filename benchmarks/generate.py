@@ -0,0 +1,135 @@
+from pathlib import Path
+import argparse
+import json
+import random
+
+
+### CONSTANTS ###
+
+
+DEFAULT_SEED = 1
+# relative weights of each element in a scene
+DEFAULT_MIX = {"dialog": 50, "action": 25, "dir": 10, "comment": 5, "summary": 5, "transition": 5}
+ELEMENTS_PER_SCENE = (4, 20)
+
+WORDS = (
+    "the old keeper lights lamp fog boat young sea night rock wind storm door stairs "
+    "bell gull oil bottle window wave shore look slowly turns toward away back again "
+    "hand face eyes silence shadow light beam glass floor wall rope iron salt cold"
+).split()
+CHARACTERS = ("OLD", "YOUNG", "Thomas", "Ephraim", "Mermaid", "Captain")
+SHORT_LINES = ("Yes.", "No.", "Aye.", "What?", "Why?", "Hark!", "...")
+DIRECTIONS = ("softly", "angrily", "to himself", "laughing", "beat", "whispering")
+TRANSITIONS = ("cut to:", "fade out.", "dissolve to:", "smash cut to:")
+LOCATIONS = ("Lighthouse", "Lantern room", "Kitchen", "Cistern", "Shore", "Bedroom", "Boat")
+TIMES = ("day", "night", "dawn", "dusk")
+
+
+### FUNCTIONS ###
+
+
+def _sentence(rng: random.Random, min_words: int, max_words: int) -> str:
+    words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng: random.Random, max_sentences: int) -> str:
+    return " ".join(_sentence(rng, 3, 15) for _ in range(rng.randint(1, max_sentences)))
+
+
+def generate_screenplay(nb_scenes: int, seed: int = DEFAULT_SEED, mix: dict = None) -> list:
+    """Generates a realistic screenplay, always the same for a given seed.
+
+    Args:
+        nb_scenes (int): number of scenes.
+        seed (int): seed of the random generator. Defaults to DEFAULT_SEED.
+        mix (dict, optional): relative weights of the elements. Defaults to DEFAULT_MIX.
+
+    Returns:
+        list: lines of the screenplay file.
+    """
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    lines = []
+    for scene_nb in range(nb_scenes):
+        lines.append(
+            f"\\scene{{{rng.choice(('int', 'ext'))}}}{{{rng.choice(LOCATIONS)}}}{{{rng.choice(TIMES)}}}"
+        )
+        lines.append("")
+        if mix.get("summary") and rng.randrange(100) < mix["summary"] * 4:
+            lines.append(f"\\summary{{{_paragraph(rng, 2)}}}")
+            lines.append("")
+        for kind in rng.choices(kinds, weights, k=rng.randint(*ELEMENTS_PER_SCENE)):
+            if kind == "dialog":
+                speech = rng.choice(SHORT_LINES) if rng.random() < 0.3 else _paragraph(rng, 4)
+                if rng.random() < 0.2:
+                    lines.append(f"\\dialog{{{rng.choice(CHARACTERS)}}}[{rng.choice(DIRECTIONS)}]{{{speech}}}")
+                else:
+                    lines.append(f"\\dialog{{{rng.choice(CHARACTERS)}}}{{{speech}}}")
+            elif kind == "action":
+                for _ in range(rng.randint(1, 3)):
+                    text = _paragraph(rng, 5)
+                    if rng.random() < 0.2:
+                        text += f" <note {scene_nb}>"
+                    lines.append(text)
+                lines.append("")
+            elif kind == "dir":
+                lines.append(f"\\dir{{{_sentence(rng, 2, 10)}}}")
+            elif kind == "comment":
+                lines.append(f"<{_sentence(rng, 3, 12)}>")
+        if mix.get("transition") and rng.randrange(100) < mix["transition"] * 4:
+            lines.append(f"\\transition{{{rng.choice(TRANSITIONS)}}}")
+        lines.append("")
+    lines.append("\\end")
+    return lines
+
+
+def generate_metadata(nb_scenes: int) -> dict:
+    """Generates the metadata of a synthetic project.
+
+    Args:
+        nb_scenes (int): number of scenes, used in the title.
+
+    Returns:
+        dict: metadata of the project.
+    """
+    return {
+        "name": f"Benchmark {nb_scenes}",
+        "authors": ["Robert Eggers", "Max Eggers"],
+        "director": "Robert Eggers",
+        "creation-date": "18/10/2019",
+        "production": "A24",
+    }
+
+
+def write_project(path: Path, nb_scenes: int, seed: int = DEFAULT_SEED) -> Path:
+    """Writes a synthetic project directory.
+
+    Args:
+        path (Path): directory of the project (created if needed).
+        nb_scenes (int): number of scenes.
+        seed (int): seed of the random generator. Defaults to DEFAULT_SEED.
+
+    Returns:
+        Path: directory of the project.
+    """
+    path.mkdir(parents=True, exist_ok=True)
+    with open(str(path / "screenplay.txt"), mode="w", encoding="utf-8") as screenplay_file:
+        screenplay_file.write("\n".join(generate_screenplay(nb_scenes, seed)) + "\n")
+    with open(str(path / "metadata.json"), mode="w", encoding="utf-8") as metadata_file:
+        json.dump(generate_metadata(nb_scenes), metadata_file, indent=4)
+    return path
+
+
+### SCRIPT ###
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a synthetic screenplay project.")
+    parser.add_argument("project", type=str, help="path to the project's directory to write.")
+    parser.add_argument("-n", "--scenes", type=int, default=100, help="number of scenes. Defaults to 100.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help=f"random seed. Defaults to {DEFAULT_SEED}.")
+    args = parser.parse_args()
+    write_project(Path(args.project), args.scenes, args.seed)
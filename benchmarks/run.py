@@ -0,0 +1,209 @@
+from pathlib import Path
+import argparse
+import json
+import logging as lg
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# the benchmarks run against the renderer of this repository
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from render import *
+from modules.pdf_handler import *
+from generate import write_project
+
+
+### CONSTANTS ###
+
+
+DEFAULT_SCALES = (10, 100, 1000)
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.2  # relative slowdown reported as a regression
+STAGES = ("read_screenplay_file", "doc_to_scenes", "doc_to_screenplay", "create_pdf", "pdf.output")
+
+
+### FUNCTIONS ###
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_stages(project: Path, output_path: Path, stage_hook=None) -> dict:
+    """Runs every stage of a render once.
+
+    Args:
+        project (Path): project directory.
+        output_path (Path): path to the rendered pdf.
+        stage_hook (Callable, optional): called around each stage with (name, "start" | "stop").
+
+    Returns:
+        dict: duration of each stage in seconds.
+    """
+    timings = {}
+    results = {}
+
+    def stage(name, function, *args, **kwargs):
+        if stage_hook:
+            stage_hook(name, "start")
+        start = time.perf_counter()
+        results[name] = function(*args, **kwargs)
+        timings[name] = time.perf_counter() - start
+        if stage_hook:
+            stage_hook(name, "stop")
+        return results[name]
+
+    metadata = read_metadata(project / DEFAULT_METADATA_NAME)
+    document = stage("read_screenplay_file", read_screenplay_file, project / DEFAULT_SCREENPLAY_NAME)
+    stage("doc_to_scenes", doc_to_scenes, document)
+    screenplay = stage("doc_to_screenplay", doc_to_screenplay, metadata, document)
+    pdf = stage(
+        "create_pdf",
+        create_pdf,
+        screenplay.title,
+        screenplay.authors,
+        screenplay.director,
+        screenplay.date,
+        screenplay.production,
+        screenplay.scenes,
+        other=screenplay.other,
+    )
+    stage("pdf.output", pdf.output, str(output_path))
+    return timings
+
+
+def measure_memory(project: Path, output_path: Path) -> dict:
+    """Runs every stage of a render once, recording the peak memory of each stage.
+
+    Args:
+        project (Path): project directory.
+        output_path (Path): path to the rendered pdf.
+
+    Returns:
+        dict: peak memory allocated during each stage, in bytes.
+    """
+    peaks = {}
+
+    def hook(name, event):
+        if event == "start":
+            tracemalloc.reset_peak()
+        else:
+            peaks[name] = tracemalloc.get_traced_memory()[1]
+
+    tracemalloc.start()
+    try:
+        run_stages(project, output_path, hook)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def run_benchmarks(scales: list, repeat: int = DEFAULT_REPEAT, memory: bool = True) -> dict:
+    """Benchmarks every stage of a render on synthetic projects of several sizes.
+
+    Args:
+        scales (list): numbers of scenes of the projects.
+        repeat (int): number of runs of each scale, the best time being kept. Defaults to DEFAULT_REPEAT.
+        memory (bool): whether to record the peak memory of each stage. Defaults to True.
+
+    Returns:
+        dict: results of the benchmarks, with the environment.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for nb_scenes in scales:
+            project = write_project(Path(tmp_dir) / f"project-{nb_scenes}", nb_scenes)
+            output_path = project / DEFAULT_OUTPUT_PATH
+            runs = [run_stages(project, output_path) for _ in range(repeat)]
+            result = {
+                "lines": sum(1 for _ in open(str(project / DEFAULT_SCREENPLAY_NAME), encoding="utf-8")),
+                "seconds": {stage: min(run[stage] for run in runs) for stage in STAGES},
+                "output_bytes": output_path.stat().st_size,
+            }
+            if memory:
+                result["peak_memory"] = measure_memory(project, output_path)
+            results[str(nb_scenes)] = result
+            lg.info(f"{nb_scenes} scene(s): " + ", ".join(f"{stage} {seconds:.4f}s" for stage, seconds in result["seconds"].items()))
+    return {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """Compares the results to a baseline.
+
+    Args:
+        baseline (dict): previous results.
+        current (dict): new results.
+        threshold (float): relative slowdown reported as a regression. Defaults to DEFAULT_THRESHOLD.
+
+    Returns:
+        list: (scale, stage, baseline seconds, current seconds, ratio) of every regression.
+    """
+    regressions = []
+    for scale, result in current["results"].items():
+        previous = baseline["results"].get(scale)
+        if previous is None:
+            continue
+        for stage, seconds in result["seconds"].items():
+            before = previous["seconds"].get(stage)
+            if not before:
+                continue
+            ratio = seconds / before
+            print(f"{scale:>8} {stage:<22} {before:10.4f}s -> {seconds:10.4f}s  x{ratio:.2f}")
+            if ratio > 1 + threshold:
+                regressions.append((scale, stage, before, seconds, ratio))
+    return regressions
+
+
+### SCRIPT ###
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks each stage of the renderer on synthetic screenplays.")
+    parser.add_argument(
+        "-s",
+        "--scales",
+        type=int,
+        nargs="+",
+        default=list(DEFAULT_SCALES),
+        help=f"numbers of scenes of the generated screenplays (from 10 to 100000). Defaults to {list(DEFAULT_SCALES)}.",
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=DEFAULT_REPEAT, help="runs of each scale, the best being kept.")
+    parser.add_argument("--no-memory", action="store_true", help="do not record the peak memory of each stage.")
+    parser.add_argument("-o", "--output", type=str, default=None, help="path to the .json file to write the results to.")
+    parser.add_argument("-b", "--baseline", type=str, default=None, help="path to previous .json results to compare to.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"relative slowdown reported as a regression. Defaults to {DEFAULT_THRESHOLD}.",
+    )
+    args = parser.parse_args()
+    lg.root.setLevel(lg.INFO)
+    current = run_benchmarks(args.scales, args.repeat, not args.no_memory)
+    if args.output:
+        with open(args.output, mode="w", encoding="utf-8") as output_file:
+            json.dump(current, output_file, indent=4)
+        lg.info(f"Results written to '{args.output}'.")
+    if args.baseline:
+        with open(args.baseline, mode="r", encoding="utf-8") as baseline_file:
+            regressions = compare(json.load(baseline_file), current, args.threshold)
+        for scale, stage, before, seconds, ratio in regressions:
+            lg.warning(f"Regression on {stage} with {scale} scene(s): {before:.4f}s -> {seconds:.4f}s (x{ratio:.2f}).")
+        raise SystemExit(1 if regressions else 0)
@@ -0,0 +1,134 @@
+import importlib
+import logging as lg
+from pathlib import Path
+
+try:
+    from modules.screenplay import *
+except ModuleNotFoundError:
+    from screenplay import *
+
+
+### CONSTANTS ###
+
+
+# type of each element -> name of the method laying it out, shared by every backend
+ELEMENT_METHODS = {
+    Action: "add_action",
+    Dialog: "add_dialog",
+    Transition: "add_transition",
+    Summary: "add_summary",
+    Dir: "add_dir",
+}
+
+# name -> backend class, filled by register_backend
+BACKENDS = {}
+# name -> module registering the backend, only imported when the backend is used (fpdf for the pdf)
+LAZY_BACKENDS = {"pdf": "pdf_handler", "pdf-web": "pdf_handler"}
+
+
+### FUNCTIONS ###
+
+
+def register_backend(backend: type) -> type:
+    """Makes a backend available by its name (used as a class decorator).
+
+    Args:
+        backend (type): subclass of Backend.
+
+    Returns:
+        type: the backend.
+    """
+    BACKENDS[backend.name] = backend
+    return backend
+
+
+def get_backend_names() -> list:
+    """Lists the names of the available backends, without importing them.
+
+    Returns:
+        list: names of the backends.
+    """
+    return list(dict.fromkeys([*LAZY_BACKENDS, *BACKENDS]))
+
+
+def get_backend(name: str) -> type:
+    """Returns the backend registered under a name, importing its module if needed.
+
+    Args:
+        name (str): name of the backend (pdf, text...).
+
+    Raises:
+        ValueError: if there is no such backend.
+
+    Returns:
+        type: the backend class.
+    """
+    if name not in BACKENDS and name in LAZY_BACKENDS:
+        module = LAZY_BACKENDS[name]
+        importlib.import_module(f"{__package__}.{module}" if __package__ else module)
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown output format '{name}' (available: {', '.join(BACKENDS)}).") from None
+
+
+def render_scene(target, scene_nb: int, scene: Scene) -> None:
+    """Lays out a scene and all its elements.
+
+    Args:
+        target: layout to write into (PDF, TextLayout...), with add_scene_header and one
+        method per element type (see ELEMENT_METHODS).
+        scene_nb (int): number of the scene.
+        scene (Scene): scene to lay out.
+    """
+    target.add_scene_header(scene_nb, scene.value, scene.location, scene.time)
+    for element in scene.iter_elements():
+        method = ELEMENT_METHODS.get(type(element))
+        if method is None:
+            lg.warning(f"Unknown element found: {element.__class__.__name__}. Ignoring it.")
+            continue
+        getattr(target, method)(element)
+
+
+def temporary_path(output_path: Path) -> Path:
+    """Returns where to write an output before renaming it, so that a viewer never sees a half-written file.
+
+    Args:
+        output_path (Path): path to the output.
+
+    Returns:
+        Path: hidden path next to the output.
+    """
+    return output_path.with_name(f".{output_path.name}.tmp")
+
+
+### CLASSES ###
+
+
+class Backend:
+    """Renders a parsed screenplay to one output format."""
+
+    name = ""
+    extension = ""
+
+    def render(
+        self,
+        screenplay: Screenplay,
+        output_path: Path,
+        cache=None,
+        jobs: int = 1,
+        instrumentation=None,
+        page_index=None,
+    ) -> None:
+        """Writes the screenplay to a file.
+
+        Args:
+            screenplay (Screenplay): screenplay to be written.
+            output_path (Path): path to the output.
+            cache (LayoutCache, optional): cache of the scenes' layouts, if the backend uses one. Defaults to None.
+            jobs (int): number of worker processes, if the backend uses them. Defaults to 1.
+            instrumentation (Instrumentation, optional): collects the timings and progress. Defaults to None.
+            page_index (PageIndex, optional): where each scene starts in the full document, when the
+            screenplay is a selection of its scenes (see Screenplay.get_selection). Defaults to None.
+        """
+        raise NotImplementedError
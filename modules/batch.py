@@ -0,0 +1,108 @@
+import json
+import logging as lg
+import os
+import time
+from pathlib import Path
+from typing import Callable
+
+
+### FUNCTIONS ###
+
+
+def find_projects(paths: list, screenplay_name: Path) -> list:
+    """Lists the project directories among the given paths.
+
+    A path is a project if it contains the screenplay file, otherwise it is a root that is
+    searched recursively for projects.
+
+    Args:
+        paths (list): project directories or roots.
+        screenplay_name (Path): name of the screenplay file of a project.
+
+    Returns:
+        list: sorted paths of the projects, without duplicates.
+    """
+    projects = set()
+    for path in map(Path, paths):
+        if (path / screenplay_name).is_file():
+            projects.add(path)
+        elif path.is_dir():
+            projects.update(screenplay.parent for screenplay in path.rglob(str(screenplay_name)))
+        else:
+            lg.error(f"The path '{path}' is not a directory!")
+    return sorted(projects)
+
+
+def _run_project(render_project: Callable, project: Path) -> dict:
+    """Renders one project and reports the outcome (run in a worker process).
+
+    Args:
+        render_project (Callable): function rendering a project directory, raising on failure.
+        project (Path): project directory.
+
+    Returns:
+        dict: project, output, success, error message and duration in seconds.
+    """
+    start = time.perf_counter()
+    output = None
+    try:
+        output = render_project(project)
+        error = None
+    except Exception as ex:
+        error = f"{ex.__class__.__name__}: {ex}"
+    return {
+        "project": str(project),
+        "output": str(output) if output else None,
+        "success": error is None,
+        "error": error,
+        "seconds": round(time.perf_counter() - start, 6),
+        "pid": os.getpid(),
+    }
+
+
+def run_batch(projects: list, render_project: Callable, jobs: int = 1) -> dict:
+    """Renders many projects, in a pool of worker processes reused from one project to the next.
+
+    Args:
+        projects (list): project directories.
+        render_project (Callable): picklable function rendering a project directory, raising on failure.
+        jobs (int): number of worker processes. Defaults to 1 (in this process).
+
+    Returns:
+        dict: summary of the batch, with the report of every project in the input order.
+    """
+    start = time.perf_counter()
+    reports = {}
+    if jobs <= 1:
+        for project in projects:
+            reports[project] = _run_project(render_project, project)
+    else:
+        # imported here, as it is slow to import and not needed by a serial batch
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(_run_project, render_project, project): project for project in projects}
+            for future in as_completed(futures):
+                report = future.result()
+                reports[futures[future]] = report
+                lg.info(f"{'Rendered' if report['success'] else 'Failed'} '{report['project']}' in {report['seconds']:.3f}s.")
+    ordered = [reports[project] for project in projects]
+    succeeded = sum(report["success"] for report in ordered)
+    return {
+        "projects": ordered,
+        "succeeded": succeeded,
+        "failed": len(ordered) - succeeded,
+        "jobs": jobs,
+        "seconds": round(time.perf_counter() - start, 6),
+    }
+
+
+def write_summary(summary: dict, path: Path) -> None:
+    """Writes the summary of a batch to a .json file.
+
+    Args:
+        summary (dict): summary returned by run_batch.
+        path (Path): path to the summary file.
+    """
+    with open(str(path), mode="w", encoding="utf-8") as summary_file:
+        json.dump(summary, summary_file, indent=4)
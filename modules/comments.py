@@ -0,0 +1,81 @@
+import re
+from array import array
+
+
+### CONSTANTS ###
+
+
+# a comment runs from '<' to the next '>', or to the end of its line if it is not closed there
+COMMENT_PATTERN = re.compile(r"<[^>\n]*(?:>|$)", re.M)
+
+
+### FUNCTIONS ###
+
+
+def strip_comments(text: str) -> tuple:
+    """Removes the comments from the text in linear time.
+
+    Args:
+        text (str): text with comments.
+
+    Returns:
+        tuple: (str) text without comments, (array) flat (start, end) offsets of the comments,
+        end being exclusive.
+    """
+    spans = array("I")
+    parts = []
+    last = 0
+    for match in COMMENT_PATTERN.finditer(text):
+        start, end = match.span()
+        parts.append(text[last:start])
+        spans.extend((start, end))
+        last = end
+    if not spans:
+        return text, spans
+    parts.append(text[last:])
+    return "".join(parts), spans
+
+
+### CLASSES ###
+
+
+class CommentStripper:
+    """Removes comments from a stream of lines, including comments spanning several lines.
+
+    A comment in a line of text ends with the line at the latest. Only a whole-line comment
+    (a line starting with '<') may go on over the next lines, up to the next '>'; the lexer
+    stops it before the next command (see close), so that it never swallows one.
+    """
+
+    def __init__(self) -> None:
+        self.in_comment = False
+
+    def strip_line(self, line: str) -> str:
+        """Removes the comments from the next line of the source.
+
+        Args:
+            line (str): next line, without its newline.
+
+        Returns:
+            str: the line without comments.
+        """
+        pos = 0
+        if self.in_comment:
+            pos = line.find(">")
+            if pos < 0:
+                return ""
+            self.in_comment = False
+            pos += 1
+            if "<" not in line[pos:]:
+                return line[pos:]
+        elif "<" not in line:
+            return line
+        text, spans = strip_comments(line[pos:])
+        if not pos and line.startswith("<") and spans[1] == len(line) and not line.endswith(">"):
+            # a whole-line comment still open at the end of the line goes on over the next lines
+            self.in_comment = True
+        return text
+
+    def close(self) -> None:
+        """Ends the comment left open, if any: at the end of the source, or before a command."""
+        self.in_comment = False
@@ -0,0 +1,146 @@
+"""Multi-file projects: the screenplay file may include other files with \\include{file}.
+
+Every file is parsed on its own into its scenes and the places of its includes, so that
+the files can be parsed (and cached) independently, then the scenes are merged in the
+order of the document. An include ends the current scene, and the paths of the included
+files are relative to the including file.
+"""
+import logging as lg
+import os
+from pathlib import Path
+from typing import Callable, Iterator, NamedTuple
+
+try:
+    from modules.lexer import Diagnostic
+except ModuleNotFoundError:
+    from lexer import Diagnostic
+
+
+### CLASSES ###
+
+
+class Include(NamedTuple):
+    """\\include command found in a source file."""
+
+    position: int  # number of scenes of the file before the include
+    path: str  # path of the included file, as written
+    line: int  # line of the command
+
+
+class ParsedFile(NamedTuple):
+    """Result of the parsing of one source file."""
+
+    scenes: list
+    includes: list  # Include, in order
+    lines: int  # number of lines parsed (the lines after the end marker are not read)
+
+
+### FUNCTIONS ###
+
+
+def _report(diagnostics: list, path: Path, include: Include, message: str) -> None:
+    if diagnostics is not None:
+        diagnostics.append(Diagnostic(include.line, 1, "include", message, source=str(path)))
+    else:
+        lg.error(f"{path}:{include.line}: {message}")
+
+
+def include_path(including: Path, target: str) -> Path:
+    """Resolves the path of an included file.
+
+    Args:
+        including (Path): path to the file with the include.
+        target (str): path written in the include, relative to the including file.
+
+    Returns:
+        Path: normalized path to the included file.
+    """
+    return Path(os.path.normpath(Path(including).parent / target))
+
+
+def parse_files(
+    main_path: Path,
+    parse_file: Callable,
+    jobs: int = 1,
+    get_cached: Callable = None,
+    put_cached: Callable = None,
+    diagnostics: list = None,
+) -> dict:
+    """Parses a source file and all the files it includes, directly or not.
+
+    The files are parsed by levels of inclusion: the files included by the files of a level
+    are parsed together, by a pool of worker processes if there are several of them.
+
+    Args:
+        main_path (Path): path to the screenplay file.
+        parse_file (Callable): picklable function parsing a file to a ParsedFile.
+        jobs (int): number of worker processes. Defaults to 1 (in this process).
+        get_cached (Callable, optional): returns the cached ParsedFile of a path, or None. Defaults to None.
+        put_cached (Callable, optional): stores the ParsedFile of a path. Defaults to None.
+        diagnostics (list, optional): filled with the missing files (see Diagnostic), instead of
+        logging them. Defaults to None.
+
+    Returns:
+        dict: path -> ParsedFile, for every file found.
+    """
+    files = {}
+    level = [Path(main_path)]
+    while level:
+        pending = []
+        for path in level:
+            parsed = get_cached(path) if get_cached is not None else None
+            if parsed is None:
+                pending.append(path)
+            else:
+                files[path] = parsed
+        if len(pending) > 1 and jobs > 1:
+            # imported here, as it is slow to import and most projects are a single file
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as executor:
+                results = list(executor.map(parse_file, pending))
+        else:
+            results = [parse_file(path) for path in pending]
+        for path, parsed in zip(pending, results):
+            files[path] = parsed
+            if put_cached is not None:
+                put_cached(path, parsed)
+        next_level = []
+        for path in level:
+            for include in files[path].includes:
+                target = include_path(path, include.path)
+                if target in files or target in next_level:
+                    continue
+                if not target.is_file():
+                    _report(diagnostics, path, include, f"Included file '{include.path}' not found, ignoring it.")
+                    continue
+                next_level.append(target)
+        level = next_level
+    return files
+
+
+def iter_merged_scenes(files: dict, path: Path, including: tuple = (), diagnostics: list = None) -> Iterator:
+    """Yields the scenes of a file and of the files it includes, in the order of the document.
+
+    Args:
+        files (dict): path -> ParsedFile (see parse_files).
+        path (Path): path to the file.
+        including (tuple): files including this one, to detect cycles. Defaults to ().
+        diagnostics (list, optional): filled with the cycles (see Diagnostic), instead of logging
+        them. Defaults to None.
+
+    Yields:
+        Scene: each scene, in order.
+    """
+    parsed = files[path]
+    including += (path,)
+    position = 0
+    for include in parsed.includes:
+        yield from parsed.scenes[position : include.position]
+        position = include.position
+        target = include_path(path, include.path)
+        if target in including:
+            _report(diagnostics, path, include, f"Including '{include.path}' again would loop, ignoring it.")
+        elif target in files:
+            yield from iter_merged_scenes(files, target, including, diagnostics)
+    yield from parsed.scenes[position:]
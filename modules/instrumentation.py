@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Callable
+
+
+### CONSTANTS ###
+
+
+JSON_FORMAT = "json"
+CHROME_FORMAT = "chrome"
+FORMATS = (JSON_FORMAT, CHROME_FORMAT)
+
+
+### FUNCTIONS ###
+
+
+def optional_stage(instrumentation, name: str):
+    """Times a stage if there is an instrumentation, does nothing otherwise.
+
+    Args:
+        instrumentation (Instrumentation): the instrumentation, or None.
+        name (str): name of the stage.
+
+    Returns:
+        context manager around the stage.
+    """
+    if instrumentation is None:
+        return nullcontext()
+    return instrumentation.stage(name)
+
+
+### CLASSES ###
+
+
+class RenderCancelled(Exception):
+    """Raised inside a render when it has been cancelled."""
+
+
+class Instrumentation:
+    """Collects timings and counters of a render, and notifies subscribers of its progress.
+
+    Subscribers are called with an event name and a dict of values:
+        - "stage_start" and "stage_end" around each stage (read, parse, layout, output...),
+        - "scene" after each scene has been laid out.
+    A subscriber (or any other thread) can stop the render by calling cancel(): the render
+    then raises RenderCancelled at the next event.
+    """
+
+    def __init__(self) -> None:
+        self.origin = time.perf_counter()
+        self.stages = {}
+        self.scenes = []
+        self.counters = Counter()
+        self.spans = []  # (name, category, start, duration, args) in seconds from the origin
+        self.subscribers = []
+        self._cancelled = threading.Event()
+
+    def subscribe(self, callback: Callable) -> None:
+        """Subscribes to the progress events.
+
+        Args:
+            callback (Callable): called with (event, values) for each event.
+        """
+        self.subscribers.append(callback)
+
+    def cancel(self) -> None:
+        """Asks the render to stop at the next event."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def emit(self, event: str, **values) -> None:
+        """Notifies the subscribers, then stops the render if it has been cancelled.
+
+        Args:
+            event (str): name of the event.
+        """
+        for callback in self.subscribers:
+            callback(event, values)
+        if self.cancelled:
+            raise RenderCancelled(f"Render cancelled at {event} {values}.")
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Increments a counter.
+
+        Args:
+            name (str): name of the counter.
+            value (int): increment. Defaults to 1.
+        """
+        self.counters[name] += value
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times a stage of the render.
+
+        Args:
+            name (str): name of the stage.
+        """
+        self.emit("stage_start", stage=name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.stages[name] = self.stages.get(name, 0.0) + duration
+            self.spans.append((name, "stage", start - self.origin, duration, {}))
+        self.emit("stage_end", stage=name, seconds=duration)
+
+    def scene(self, scene_nb: int, total: int, scene, start: float, page: int) -> None:
+        """Records the layout of a scene.
+
+        Args:
+            scene_nb (int): number of the scene.
+            total (int): number of scenes.
+            scene (Scene): the scene.
+            start (float): time.perf_counter() when the layout of the scene started.
+            page (int): page where the scene ends.
+        """
+        duration = time.perf_counter() - start
+        elements = Counter(element.__class__.__name__ for element in scene.iter_elements())
+        self.counters.update(elements)
+        self.counters["Scene"] += 1
+        self.scenes.append({"scene": scene_nb, "seconds": duration, "page": page, "elements": dict(elements)})
+        self.spans.append((f"scene {scene_nb}", "scene", start - self.origin, duration, {"page": page}))
+        self.emit("scene", scene=scene_nb, total=total, seconds=duration, page=page)
+
+    def to_dict(self) -> dict:
+        """Returns the collected timings and counters.
+
+        Returns:
+            dict: stages, counters and scenes.
+        """
+        return {"stages": self.stages, "counters": dict(self.counters), "scenes": self.scenes}
+
+    def to_chrome_trace(self) -> dict:
+        """Returns the collected spans in the Chrome trace event format (chrome://tracing, Perfetto).
+
+        Returns:
+            dict: the trace.
+        """
+        pid = os.getpid()
+        events = [
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start * 1e6,
+                "dur": duration * 1e6,
+                "pid": pid,
+                "tid": 1 if category == "stage" else 2,
+                "args": args,
+            }
+            for name, category, start, duration, args in self.spans
+        ]
+        events += [
+            {"name": name, "ph": "C", "ts": 0, "pid": pid, "args": {"value": value}}
+            for name, value in self.counters.items()
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, path: Path, format: str = JSON_FORMAT) -> None:
+        """Writes the profile to a .json file.
+
+        Args:
+            path (Path): path to the profile.
+            format (str): JSON_FORMAT or CHROME_FORMAT. Defaults to JSON_FORMAT.
+        """
+        data = self.to_chrome_trace() if format == CHROME_FORMAT else self.to_dict()
+        with open(str(path), mode="w", encoding="utf-8") as profile_file:
+            json.dump(data, profile_file, indent=4)
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging as lg
+import os
+from collections import OrderedDict
+from functools import lru_cache
+from importlib.util import find_spec
+from pathlib import Path
+
+
+### CONSTANTS ###
+
+
+# bump whenever the format of the entries changes
+LAYOUT_VERSION = 2
+# modules of the layout, next to this one: any change to their code invalidates the cached layouts
+LAYOUT_MODULES = ("pdf_handler.py", "pdf_stream.py", "pdf_optimize.py", "measure.py", "backend.py")
+DEFAULT_MAX_ENTRIES = 4096
+
+LAYOUT_FIELDS = ("text", "text_without_comments", "direction")
+
+
+### FUNCTIONS ###
+
+
+@lru_cache(maxsize=1)
+def layout_fingerprint() -> str:
+    """Hashes the code of the layout and the version of fpdf, so that the cached layouts are
+    invalidated when they change.
+
+    Returns:
+        str: hexadecimal digest of the layout.
+    """
+    digest = hashlib.sha1(repr(LAYOUT_VERSION).encode("utf-8"))
+    directory = Path(__file__).resolve().parent
+    for name in LAYOUT_MODULES:
+        digest.update((directory / name).read_bytes())
+    # the package of fpdf gives its version, and is read without importing fpdf
+    spec = find_spec("fpdf")
+    if spec is not None and spec.origin:
+        digest.update(Path(spec.origin).read_bytes())
+    return digest.hexdigest()
+
+
+def scene_digest(scene_nb: int, scene, start_state: tuple, document: tuple = ()) -> str:
+    """Hashes everything that determines the layout of a scene.
+
+    Args:
+        scene_nb (int): number of the scene, printed in its header.
+        scene (Scene): the scene.
+        start_state (tuple): layout state of the pdf before the scene (see PDF.get_layout_state).
+        document (tuple): document-wide values printed on every page (title, production...).
+
+    Returns:
+        str: hexadecimal digest of the scene.
+    """
+    digest = hashlib.sha1()
+    digest.update(repr((layout_fingerprint(), document, start_state)).encode("utf-8"))
+    digest.update(repr((scene_nb, scene.value, scene.location, scene.time)).encode("utf-8"))
+    for element in scene.iter_elements():
+        speaker = getattr(element, "speaker", None)
+        fields = tuple(getattr(element, field, None) for field in LAYOUT_FIELDS)
+        digest.update(
+            repr((element.__class__.__name__, speaker.name if speaker else None, fields)).encode("utf-8")
+        )
+    return digest.hexdigest()
+
+
+### CLASSES ###
+
+
+class LayoutCache:
+    """On-disk cache of the laid-out content of each scene, with LRU eviction."""
+
+    def __init__(self, directory: Path = None, max_entries: int = DEFAULT_MAX_ENTRIES, in_memory: bool = False) -> None:
+        """Initializes the cache.
+
+        Args:
+            directory (Path, optional): directory where the entries are stored (created when needed).
+            Defaults to None (the entries are only kept in memory).
+            max_entries (int): maximum number of entries kept on disk, and in memory. Defaults to DEFAULT_MAX_ENTRIES.
+            in_memory (bool): whether to also keep the entries used recently in memory, for the
+            long-running processes (watch mode), as a single render uses each entry once.
+            Defaults to False (always True without a directory).
+        """
+        self.directory = Path(directory) if directory is not None else None
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # entries used recently, None when the entries are only read from the disk
+        self.memory = OrderedDict() if in_memory or self.directory is None else None
+
+    def _entry_path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> dict:
+        """Returns the cached layout of a scene.
+
+        Args:
+            key (str): digest of the scene.
+
+        Returns:
+            dict: the cached layout, or None if it is not in the cache.
+        """
+        if self.memory is not None and key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return self.memory[key]
+        if self.directory is None:
+            self.misses += 1
+            return None
+        path = self._entry_path(key)
+        try:
+            with open(str(path), mode="r", encoding="utf-8") as entry_file:
+                entry = json.load(entry_file)
+            os.utime(str(path))  # keep track of the last use for the eviction
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: dict) -> None:
+        if self.memory is None:
+            return
+        self.memory[key] = entry
+        if len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def put(self, key: str, entry: dict) -> None:
+        """Stores the layout of a scene.
+
+        Args:
+            key (str): digest of the scene.
+            entry (dict): layout of the scene (see PDF.get_layout_since).
+        """
+        self._remember(key, entry)
+        if self.directory is None:
+            return
+        path = self._entry_path(key)
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(str(tmp_path), mode="w", encoding="utf-8") as entry_file:
+                json.dump(entry, entry_file)
+            os.replace(str(tmp_path), str(path))
+        except OSError as ex:
+            lg.warning(f"Could not write the layout cache entry '{path}': {ex}")
+
+    def prune(self) -> None:
+        """Evicts the least recently used entries above the maximum number of entries."""
+        if self.directory is None or not self.directory.is_dir():
+            return
+        entries = list(self.directory.glob("*.json"))
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda path: path.stat().st_mtime)
+        for path in entries[: len(entries) - self.max_entries]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
@@ -0,0 +1,232 @@
+import re
+import logging as lg
+from typing import Iterable, Iterator, NamedTuple
+
+try:
+    from modules.comments import CommentStripper
+except ModuleNotFoundError:
+    from comments import CommentStripper
+
+
+### CONSTANTS ###
+
+
+COMMANDS = ("scene", "summary", "dialog", "end", "dir", "transition", "include")
+
+# one pattern recognizes every line header, so the cost per line does not depend on the number of commands
+HEADER_PATTERN = re.compile(r"\\(?P<command>" + "|".join(COMMANDS) + r")|(?P<comment><)")
+
+COMMAND = "command"
+TEXT = "text"
+COMMENT = "comment"
+
+CLOSING = {"{": "}", "[": "]"}
+
+# a line starting like a command which is not one is rendered as text, which is most likely a typo
+UNKNOWN_COMMAND_PATTERN = re.compile(r"\\([A-Za-z]+)")
+
+ERROR = "error"
+WARNING = "warning"
+
+
+### CLASSES ###
+
+
+class Token(NamedTuple):
+    """Typed token emitted by the lexer."""
+
+    kind: str  # COMMAND, TEXT or COMMENT
+    line: int  # line number (starting at 1) where the token begins
+    text: str = ""  # text without comments for TEXT tokens, source line for COMMENT tokens
+    raw: str = ""  # source line of TEXT tokens, with comments
+    command: str = ""  # command name for COMMAND tokens
+    args: tuple = ()  # required {...} arguments for COMMAND tokens
+    optional: tuple = ()  # optional [...] arguments for COMMAND tokens
+
+
+class LexerError(ValueError):
+    """Raised when the source cannot be tokenized."""
+
+    column = 1  # column (starting at 1) where the error is
+    line_offset = 0  # lines between the beginning of the token and the error
+
+
+class Diagnostic(NamedTuple):
+    """Problem found in a source file."""
+
+    line: int  # starting at 1
+    column: int  # starting at 1
+    command: str  # name of the command, "" for text
+    message: str
+    severity: str = ERROR  # ERROR or WARNING
+    source: str = ""  # path to the source file
+
+
+### FUNCTIONS ###
+
+
+def _read_group(line: str, pos: int, lines: Iterator[str]) -> tuple:
+    """Reads a brace or bracket group starting at pos, possibly spanning several lines.
+
+    Nested groups of the same kind are kept verbatim in the argument.
+
+    Args:
+        line (str): current line, with line[pos] being the opening character.
+        pos (int): position of the opening character.
+        lines (Iterator[str]): remaining lines, consumed if the group is not closed on this line.
+
+    Returns:
+        tuple: (str) argument content, (str) line where the group ends, (int) position after the group,
+        (int) number of extra lines consumed.
+    """
+    opening = line[pos]
+    closing = CLOSING[opening]
+    depth = 1
+    start = pos + 1
+    pos = start
+    parts = []
+    consumed = 0
+    while True:
+        for pos in range(pos, len(line)):
+            char = line[pos]
+            if char == opening:
+                depth += 1
+            elif char == closing:
+                depth -= 1
+                if depth == 0:
+                    parts.append(line[start:pos])
+                    return "\n".join(parts), line, pos + 1, consumed
+        # the group goes on, on the next line
+        parts.append(line[start:])
+        line = next(lines, None)
+        if line is None:
+            raise LexerError(f"Unclosed '{opening}' at end of file.")
+        consumed += 1
+        start = pos = 0
+
+
+def _read_arguments(line: str, pos: int, lines: Iterator[str]) -> tuple:
+    """Reads all the {...} and [...] arguments following a command.
+
+    Args:
+        line (str): line containing the command.
+        pos (int): position right after the command name.
+        lines (Iterator[str]): remaining lines, for arguments spanning several lines.
+
+    Returns:
+        tuple: (tuple) required arguments, (tuple) optional arguments, (int) number of extra lines consumed.
+    """
+    args = []
+    optional = []
+    consumed = 0
+    while True:
+        while pos < len(line) and line[pos] in " \t":
+            pos += 1
+        if pos >= len(line) or line[pos] not in CLOSING:
+            return tuple(args), tuple(optional), consumed
+        is_optional = line[pos] == "["
+        try:
+            value, line, pos, extra = _read_group(line, pos, lines)
+        except LexerError as ex:
+            ex.column = pos + 1
+            ex.line_offset = consumed
+            raise
+        consumed += extra
+        (optional if is_optional else args).append(value)
+
+
+def classify(line: str) -> str:
+    """Gives the type of a line from its header.
+
+    Args:
+        line (str): line to be checked.
+
+    Returns:
+        str: the command name, "comment", or "action".
+    """
+    match = HEADER_PATTERN.match(line)
+    if match is None:
+        return "action"
+    return match.group("command") or COMMENT
+
+
+def tokenize(document: Iterable[str], source: str = None, diagnostics: list = None) -> Iterator[Token]:
+    """Turns the lines of a screenplay into typed tokens, in a single pass.
+
+    Comments are removed from the text lines before they are tokenized, and a whole-line
+    comment may span several lines; the commands and their arguments are kept verbatim, and
+    a comment still open at a command stops before it, which is reported as an error, as is
+    a comment still open at the end of the file. Lines containing nothing but comments are
+    emitted as COMMENT tokens.
+
+    Args:
+        document (Iterable[str]): lines from the screenplay file (list or file handle).
+        source (str, optional): name of the source file, in the error messages. Defaults to None.
+        diagnostics (list, optional): filled with the problems found (see Diagnostic), instead of
+        logging them, and with warnings about lines which look like unknown commands. Defaults to None.
+
+    Yields:
+        Token: each token of the document, in order.
+    """
+
+    def report(line: int, column: int, command: str, message: str) -> None:
+        if diagnostics is not None:
+            diagnostics.append(Diagnostic(line, column, command, message, ERROR, source or ""))
+        else:
+            lg.error(f"{source}:{line}: {message}" if source else f"Line {line}: {message}")
+
+    comments = CommentStripper()
+    # continuation lines of multi-line arguments are consumed from the same iterator
+    lines = iter(document)
+    line_nb = 0
+    comment_line = 0  # line where the open comment starts
+    for raw in lines:
+        line_nb += 1
+        match = HEADER_PATTERN.match(raw)
+        if match is not None and match.group("command"):
+            command = match.group("command")
+            if comments.in_comment:
+                # a command is never commented out
+                comments.close()
+                report(comment_line, 1, "", f"Unclosed '<' before the \\{command} of line {line_nb}.")
+            try:
+                args, optional, consumed = _read_arguments(raw, match.end(), lines)
+            except LexerError as ex:
+                report(line_nb + ex.line_offset, ex.column, command, str(ex))
+                return
+            yield Token(COMMAND, line_nb, command=command, args=args, optional=optional)
+            line_nb += consumed
+            continue
+        in_comment = comments.in_comment
+        line = comments.strip_line(raw)
+        if comments.in_comment and not in_comment:
+            comment_line = line_nb
+        if line != raw and not line.strip():
+            yield Token(COMMENT, line_nb, text=raw)
+            continue
+        if diagnostics is not None and line.startswith("\\"):
+            unknown = UNKNOWN_COMMAND_PATTERN.match(line)
+            if unknown:
+                message = f"Unknown command '\\{unknown.group(1)}', rendered as text."
+                diagnostics.append(Diagnostic(line_nb, 1, unknown.group(1), message, WARNING, source or ""))
+        yield Token(TEXT, line_nb, text=line, raw=raw)
+    if comments.in_comment:
+        report(comment_line, 1, "", "Unclosed '<' at end of file.")
+
+
+def expect_args(token: Token, count: int) -> tuple:
+    """Checks the number of required arguments of a command token.
+
+    Args:
+        token (Token): command token.
+        count (int): expected number of required arguments.
+
+    Raises:
+        LexerError: if the number of arguments is wrong.
+
+    Returns:
+        tuple: the required arguments.
+    """
+    if len(token.args) != count:
+        raise LexerError(f"Wrong infos on the {token.command}! Expected {count}, got {len(token.args)}.")
+    return token.args
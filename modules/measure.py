@@ -0,0 +1,380 @@
+"""Pure-Python model of the pdf layout, which never imports fpdf.
+
+Every element is set in Courier, whose glyphs all have the same advance width, so the
+line breaks and page breaks of the PDF class can be computed arithmetically. The
+arithmetic mirrors FPDF 1.7.2 step by step, so that the predicted positions are
+exactly the ones the PDF class reaches.
+"""
+from functools import lru_cache
+
+
+### CONSTANTS ###
+
+
+# page geometry, as computed by FPDF for an A4 page in millimeters
+SCALE = 72 / 25.4  # points per millimeter
+PAGE_WIDTH = 595.28 / SCALE
+PAGE_HEIGHT = 841.89 / SCALE
+DEFAULT_MARGIN = 28.35 / SCALE
+CELL_MARGIN = DEFAULT_MARGIN / 10.0
+BOTTOM_MARGIN = 2 * DEFAULT_MARGIN
+PAGE_BREAK_TRIGGER = PAGE_HEIGHT - BOTTOM_MARGIN
+
+LEFT_MARGIN = 25
+TOP_MARGIN = 10
+RIGHT_MARGIN = 15
+
+# the page header is a 5 mm cell followed by a 20 mm line feed
+HEADER_LINE_FEED = 20
+
+# Courier advance width, in thousandths of the font size, for every latin-1 character
+COURIER_WIDTH = 600
+FONT_FAMILY = "courier"
+
+LINE_HEIGHT = 5
+AFTER_SCENE_HEADER_SPACE = 10
+AFTER_SUMMARY_SPACE = 5
+AFTER_TRANSITION_SPACE = 5
+AFTER_DIALOG_SPACE = 5
+AFTER_ACTION_SPACE = 5
+AFTER_REAL_SPACE = 5
+
+# columns (offset from the left margin, width) used by the dialogs and the transitions
+DIALOG_OFFSET = 40
+DIALOG_WIDTH = 95
+TRANSITION_OFFSET = 80
+TRANSITION_WIDTH = 85
+
+# wrapped texts kept by wrap_lines: scripts repeat many short lines ("Yes.", "CUT TO:"...)
+WRAP_CACHE_SIZE = 8192
+
+
+### FUNCTIONS ###
+
+
+def line_capacity(width: float, font_size_pt: float) -> int:
+    """Gives the number of Courier characters that fit in a cell.
+
+    Args:
+        width (float): width of the cell (mm).
+        font_size_pt (float): font size (pt).
+
+    Returns:
+        int: number of characters.
+    """
+    wmax = (width - 2 * CELL_MARGIN) * 1000.0 / (font_size_pt / SCALE)
+    capacity = int(wmax // COURIER_WIDTH)
+    # same comparison as FPDF, to be immune to rounding
+    while (capacity + 1) * COURIER_WIDTH <= wmax:
+        capacity += 1
+    while capacity > 0 and capacity * COURIER_WIDTH > wmax:
+        capacity -= 1
+    return capacity
+
+
+def _split_variable(paragraph: str, wmax: float) -> list:
+    """Splits a paragraph containing characters without width, like FPDF does.
+
+    Args:
+        paragraph (str): paragraph without newlines.
+        wmax (float): available width, in thousandths of the font size.
+
+    Returns:
+        list: lines of the paragraph.
+    """
+    lines = []
+    sep = -1
+    i = j = 0
+    length = 0
+    while i < len(paragraph):
+        char = paragraph[i]
+        if char == " ":
+            sep = i
+        length += COURIER_WIDTH if ord(char) < 256 else 0
+        if length > wmax:
+            if sep == -1:
+                if i == j:
+                    i += 1
+                lines.append(paragraph[j:i])
+            else:
+                lines.append(paragraph[j:sep])
+                i = sep + 1
+            sep = -1
+            j = i
+            length = 0
+        else:
+            i += 1
+    lines.append(paragraph[j:])
+    return lines
+
+
+@lru_cache(maxsize=WRAP_CACHE_SIZE)
+def wrap_lines(text: str, width: float, font_size_pt: float) -> tuple:
+    """Splits a latin-1 text into the lines FPDF's multi_cell would print.
+
+    The results are kept in a bounded cache (least recently used first out), keyed by the
+    text, the width and the font size: every style of Courier has the same widths.
+
+    Args:
+        text (str): text of the cell, with latin-1 characters only.
+        width (float): width of the cell (mm).
+        font_size_pt (float): font size (pt).
+
+    Returns:
+        tuple: (str) printed line, (int) number of spaces FPDF counts to justify the line when it
+        is broken at a space, 0 otherwise.
+    """
+    text = text.replace("\r", "")
+    if text.endswith("\n"):
+        text = text[:-1]
+    capacity = line_capacity(width, font_size_pt)
+    lines = []
+    for paragraph in text.split("\n"):
+        start = 0
+        while len(paragraph) - start > capacity:
+            end = start + capacity
+            sep = paragraph.rfind(" ", start, end + 1)
+            if sep == -1:
+                end = max(end, start + 1)
+                lines.append((paragraph[start:end], 0))
+                start = end
+            else:
+                lines.append((paragraph[start:sep], paragraph.count(" ", start, end + 1)))
+                start = sep + 1
+        lines.append((paragraph[start:], 0))
+    # shared by the callers through the cache, so it must not be modified
+    return tuple(lines)
+
+
+def wrap_cache_counts() -> tuple:
+    """Gives the number of texts whose line breaks were found in the cache of wrap_lines, and
+    the number of texts wrapped, since the start of the process.
+
+    Returns:
+        tuple: hits and misses.
+    """
+    info = wrap_lines.cache_info()
+    return info.hits, info.misses
+
+
+def is_latin1(text: str) -> bool:
+    """Checks whether every character of a text has a Courier glyph."""
+    return text.isascii() or max(map(ord, text)) < 256
+
+
+def split_lines(text: str, width: float, font_size_pt: float) -> list:
+    """Splits a text into the lines FPDF's multi_cell would print.
+
+    Args:
+        text (str): text of the cell.
+        width (float): width of the cell (mm).
+        font_size_pt (float): font size (pt).
+
+    Returns:
+        list: printed lines.
+    """
+    if is_latin1(text):
+        return [line for line, _ in wrap_lines(text, width, font_size_pt)]
+    # characters without a glyph have no width, so the lines are measured one character at a time
+    text = text.replace("\r", "")
+    if text.endswith("\n"):
+        text = text[:-1]
+    wmax = (width - 2 * CELL_MARGIN) * 1000.0 / (font_size_pt / SCALE)
+    lines = []
+    for paragraph in text.split("\n"):
+        lines += _split_variable(paragraph, wmax)
+    return lines
+
+
+def measure_scenes(state: tuple, list_of_scenes: list) -> list:
+    """Computes where each scene starts and ends, without laying anything out.
+
+    Args:
+        state (tuple): state of the pdf before the first scene (see PDF.get_layout_state).
+        list_of_scenes (list): scenes of the screenplay.
+
+    Returns:
+        list: page map, with for each scene its start state and the page and position where it ends.
+    """
+    model = LayoutModel(state)
+    page_map = []
+    for scene in list_of_scenes:
+        start = model.get_layout_state()
+        model.add_scene(scene)
+        page_map.append({"start": start, "end_page": model.page, "end_y": model.y})
+    return page_map
+
+
+def count_pages(state: tuple, list_of_scenes: list) -> int:
+    """Computes the number of pages of the document, without laying anything out.
+
+    Args:
+        state (tuple): state of the pdf before the first scene (see PDF.get_layout_state).
+        list_of_scenes (list): scenes of the screenplay.
+
+    Returns:
+        int: number of pages, including "the end".
+    """
+    model = LayoutModel(state)
+    for scene in list_of_scenes:
+        model.add_scene(scene)
+    model.add_the_end()
+    return model.page
+
+
+def scene_header_position(state: tuple) -> tuple:
+    """Computes where the header of a scene is drawn, which is on the next page when it does not fit.
+
+    Args:
+        state (tuple): state of the pdf before the scene (see PDF.get_layout_state).
+
+    Returns:
+        tuple: page number and position of the top of the header (mm).
+    """
+    model = LayoutModel(state)
+    model.set_font("B", 12)
+    model.cell(LINE_HEIGHT)
+    return model.page, model.y
+
+
+### CLASSES ###
+
+
+class LayoutModel:
+    """Follows the position of the PDF class through the elements, without drawing anything.
+
+    The state has the same shape as PDF.get_layout_state, so that both can be compared.
+    """
+
+    def __init__(self, state: tuple) -> None:
+        """Initializes the model from a state of the pdf.
+
+        Args:
+            state (tuple): state returned by PDF.get_layout_state.
+        """
+        (
+            self.page,
+            self.x,
+            self.y,
+            self.font_family,
+            self.font_style,
+            self.font_size_pt,
+            self.underline,
+            fonts,
+            self.previous_speaker,
+        ) = state
+        self.fonts = list(fonts)
+        self.body_width = PAGE_WIDTH - RIGHT_MARGIN - LEFT_MARGIN
+
+    def get_layout_state(self) -> tuple:
+        """Returns the predicted state, in the format of PDF.get_layout_state.
+
+        Returns:
+            tuple: the predicted state.
+        """
+        return (
+            self.page,
+            round(self.x, 4),
+            round(self.y, 4),
+            self.font_family,
+            self.font_style,
+            self.font_size_pt,
+            self.underline,
+            tuple(self.fonts),
+            self.previous_speaker,
+        )
+
+    def _register(self, style: str) -> None:
+        fontkey = FONT_FAMILY + style
+        if fontkey not in self.fonts:
+            self.fonts.append(fontkey)
+
+    def set_font(self, style: str, size: float) -> None:
+        self._register(style)
+        self.font_family = FONT_FAMILY
+        self.font_style = style
+        self.font_size_pt = size
+        self.underline = 0
+
+    def page_break(self) -> None:
+        """Follows the footer, the new page and its header."""
+        self._register("I")  # used by the footer
+        self.page += 1
+        self.y = TOP_MARGIN
+        self._register("")  # used by the header
+        self.y += HEADER_LINE_FEED
+
+    def cell(self, height: float) -> None:
+        """Follows a cell that does not move to the next line."""
+        if self.y + height > PAGE_BREAK_TRIGGER:
+            self.page_break()
+
+    def multi_cell(self, text: str, width: float) -> None:
+        """Follows a multi_cell call (one cell per printed line)."""
+        for _ in split_lines(text, width, self.font_size_pt):
+            self.cell(LINE_HEIGHT)
+            self.y += LINE_HEIGHT
+        self.x = LEFT_MARGIN
+
+    def ln(self, height: float) -> None:
+        self.x = LEFT_MARGIN
+        self.y += height
+
+    def add_scene_header(self) -> None:
+        self.set_font("B", 12)
+        self.cell(LINE_HEIGHT)
+        self.cell(LINE_HEIGHT)
+        self.ln(AFTER_SCENE_HEADER_SPACE)
+        self.previous_speaker = ""
+
+    def add_action(self, action) -> None:
+        self.set_font("", 12)
+        self.multi_cell(action.text_without_comments, self.body_width)
+        self.ln(AFTER_ACTION_SPACE)
+
+    def add_dialog(self, dialog) -> None:
+        self.set_font("", 12)
+        self.cell(LINE_HEIGHT)
+        self.ln(LINE_HEIGHT)
+        self.previous_speaker = dialog.speaker.name.upper()
+        if dialog.direction:
+            self.set_font("I", 10)
+            self.cell(0)
+            self.multi_cell(f"({dialog.direction})", DIALOG_WIDTH)
+            self.set_font("", 12)
+        self.cell(0)
+        self.multi_cell(dialog.text, DIALOG_WIDTH)
+        self.ln(AFTER_DIALOG_SPACE)
+
+    def add_transition(self, transition) -> None:
+        self.set_font("", 12)
+        self.cell(0)
+        self.multi_cell(transition.text.upper(), TRANSITION_WIDTH)
+        self.ln(AFTER_TRANSITION_SPACE)
+
+    def add_summary(self, summary) -> None:
+        self.set_font("", 12)
+        self.multi_cell(summary.text, self.body_width)
+        self.ln(AFTER_SUMMARY_SPACE)
+
+    def add_dir(self, dir) -> None:
+        self.set_font("I", 12)
+        self.multi_cell(dir.text, self.body_width)
+        self.ln(AFTER_REAL_SPACE)
+
+    def add_the_end(self) -> None:
+        self.ln(10)
+        self.set_font("B", 25)
+        self.cell(15)
+
+    def add_scene(self, scene) -> None:
+        """Follows a whole scene.
+
+        Args:
+            scene (Scene): the scene.
+        """
+        self.add_scene_header()
+        for element in scene.iter_elements():
+            add_element = getattr(self, f"add_{element.kind}", None)
+            if add_element is not None:
+                add_element(element)
@@ -0,0 +1,106 @@
+import json
+import logging as lg
+import os
+from pathlib import Path
+
+
+### CONSTANTS ###
+
+
+PAGE_INDEX_VERSION = 1
+
+
+### FUNCTIONS ###
+
+
+def parse_scene_ranges(spec: str) -> list:
+    """Parses a selection of scenes, like "40-55" or "3,7,10-12".
+
+    Args:
+        spec (str): comma-separated scene numbers and ranges (both ends included).
+
+    Raises:
+        ValueError: if the selection is not valid.
+
+    Returns:
+        list: selected scene numbers, sorted and without duplicates.
+    """
+    numbers = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        try:
+            first = int(first)
+            last = int(last) if last else first
+        except ValueError:
+            raise ValueError(f"'{part}' is not a scene number or a range of scenes.") from None
+        if first < 1 or last < first:
+            raise ValueError(f"'{part}' is not a valid range of scenes.")
+        numbers.update(range(first, last + 1))
+    if not numbers:
+        raise ValueError("No scene selected.")
+    return sorted(numbers)
+
+
+### CLASSES ###
+
+
+class PageIndex:
+    """Where each scene starts in the full pdf, and its number of pages.
+
+    It is written after each full render, so that a selection of scenes can later be laid
+    out at its place in the document without laying out the other scenes.
+    """
+
+    def __init__(self, key: str, starts: list, nb_pages: int) -> None:
+        """Initializes the index.
+
+        Args:
+            key (str): digest of the sources and the layout the index was computed from.
+            starts (list): layout state of the pdf before each scene (see PDF.get_layout_state).
+            nb_pages (int): number of pages of the full document.
+        """
+        self.key = key
+        self.starts = starts
+        self.nb_pages = nb_pages
+
+    @classmethod
+    def load(cls, path: Path, key: str):
+        """Reads the index of the previous full render.
+
+        Args:
+            path (Path): path to the index.
+            key (str): digest of the current sources and layout.
+
+        Returns:
+            PageIndex: the index, or None if it is missing or stale.
+        """
+        try:
+            with open(str(path), mode="r", encoding="utf-8") as index_file:
+                data = json.load(index_file)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != PAGE_INDEX_VERSION or data.get("key") != key:
+            return None
+        # JSON turned the state tuples (and the registered fonts in them) into lists
+        starts = [tuple(state[:7]) + (tuple(state[7]),) + tuple(state[8:]) for state in data["starts"]]
+        return cls(key, starts, data["pages"])
+
+    def save(self, path: Path) -> None:
+        """Writes the index.
+
+        Args:
+            path (Path): path to the index.
+        """
+        path = Path(path)
+        tmp_path = path.with_suffix(".tmp")
+        data = {"version": PAGE_INDEX_VERSION, "key": self.key, "pages": self.nb_pages, "starts": self.starts}
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(str(tmp_path), mode="w", encoding="utf-8") as index_file:
+                json.dump(data, index_file)
+            os.replace(str(tmp_path), str(path))
+        except OSError as ex:
+            lg.warning(f"Could not write the page index '{path}': {ex}")
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import logging as lg
+import os
+from array import array
+from pathlib import Path
+
+try:
+    from modules.screenplay import *
+    from modules.includes import Include, ParsedFile
+except ModuleNotFoundError:
+    from screenplay import *
+    from includes import Include, ParsedFile
+
+
+### CONSTANTS ###
+
+
+# bump whenever the format of the entries changes
+PARSE_CACHE_VERSION = 3
+# modules of the parser, next to this one: any change to their code invalidates the cache
+PARSER_MODULES = ("lexer.py", "comments.py", "screenplay.py", "utils.py", "includes.py", "source_file.py")
+
+# the entries only hold strings and numbers, so that a cache found in a project cannot run any code
+ENTRY_SUFFIX = ".json"
+
+# element classes by kind, the fields of an element being its slots
+ELEMENT_CLASSES = {element_class.kind: element_class for element_class in (Action, Dialog, Dir, Summary, Transition)}
+
+
+### FUNCTIONS ###
+
+
+def parser_fingerprint(*functions) -> str:
+    """Hashes the code of the parser, so that the cache is invalidated when it changes.
+
+    Args:
+        functions: parsing functions defined outside of PARSER_MODULES (iter_scenes...).
+
+    Returns:
+        str: hexadecimal digest of the parser.
+    """
+    # imported here, as it is slow to import and not needed by --check
+    import inspect
+
+    digest = hashlib.sha1(repr(PARSE_CACHE_VERSION).encode("utf-8"))
+    directory = Path(__file__).resolve().parent
+    for name in PARSER_MODULES:
+        digest.update((directory / name).read_bytes())
+    for function in functions:
+        digest.update(inspect.getsource(function).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _dump_element(element) -> list:
+    fields = [getattr(element, name) for name in element.__slots__]
+    if element.kind == DIALOG:
+        fields[0] = [element.speaker.name, element.speaker.actor]
+    elif element.kind == ACTION:
+        fields[1] = element.comments_pos.tolist()
+    return [element.kind] + fields
+
+
+def _load_element(fields: list, characters: dict):
+    kind = fields[0]
+    if kind == DIALOG:
+        (speaker, actor), text, direction = fields[1:]
+        # one Character per name, as the parser does
+        character = characters.get(speaker)
+        if character is None:
+            character = characters[speaker] = Character(speaker, actor)
+        return Dialog(character, text, direction)
+    if kind == ACTION:
+        # the comments are already stripped
+        action = Action.__new__(Action)
+        action.text_with_comments, comments_pos, action.text_without_comments = fields[1:]
+        action.comments_pos = array("I", comments_pos)
+        return action
+    return ELEMENT_CLASSES[kind](*fields[1:])
+
+
+def dump_parsed(parsed: ParsedFile) -> dict:
+    """Converts a parsed source file to strings, numbers and lists, to be written as JSON.
+
+    Args:
+        parsed (ParsedFile): the parsed file.
+
+    Returns:
+        dict: the scenes, includes and number of lines of the file.
+    """
+    scenes = []
+    for scene in parsed.scenes:
+        scenes.append(
+            [
+                scene.value,
+                scene.location,
+                scene.time,
+                scene.line,
+                [_dump_element(element) for element in scene.elements],
+                _dump_element(scene.summary) if scene.summary else None,
+                _dump_element(scene.transition) if scene.transition else None,
+            ]
+        )
+    return {"scenes": scenes, "includes": [list(include) for include in parsed.includes], "lines": parsed.lines}
+
+
+def load_parsed(data: dict) -> ParsedFile:
+    """Rebuilds a parsed source file converted by dump_parsed.
+
+    Args:
+        data (dict): the converted file.
+
+    Returns:
+        ParsedFile: the parsed file.
+    """
+    characters = {}
+    scenes = []
+    for value, location, time, line, elements, summary, transition in data["scenes"]:
+        scene = Scene(value, location, time, line)
+        scene.elements = [_load_element(fields, characters) for fields in elements]
+        if summary is not None:
+            scene.summary = _load_element(summary, characters)
+        if transition is not None:
+            scene.transition = _load_element(transition, characters)
+        scenes.append(scene)
+    return ParsedFile(scenes, [Include(*include) for include in data["includes"]], data["lines"])
+
+
+def source_key(parser: str, *paths: Path) -> str:
+    """Hashes the source files of a project with the parser.
+
+    Args:
+        parser (str): fingerprint of the parser (see parser_fingerprint).
+        paths (Path): source files (screenplay, metadata).
+
+    Returns:
+        str: digest of the sources.
+    """
+    digest = hashlib.sha1(parser.encode("utf-8"))
+    for path in paths:
+        data = Path(path).read_bytes()
+        digest.update(f"{len(data)}:".encode("utf-8"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+### CLASSES ###
+
+
+class ParseCache:
+    """On-disk cache of a parsed source file, keyed by its content and the parser."""
+
+    def __init__(self, directory: Path, parser: str) -> None:
+        """Initializes the cache.
+
+        Args:
+            directory (Path): directory where the entry is stored (created when needed).
+            parser (str): fingerprint of the parser (see parser_fingerprint).
+        """
+        self.directory = Path(directory)
+        self.parser = parser
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, *paths: Path) -> str:
+        """Hashes the source files of a project with the parser.
+
+        Args:
+            paths (Path): source files (screenplay, metadata).
+
+        Returns:
+            str: digest of the sources.
+        """
+        return source_key(self.parser, *paths)
+
+    def for_source(self, path: Path) -> "ParseCache":
+        """Returns the cache of one source file of a project, in its own subdirectory.
+
+        Args:
+            path (Path): path to the source file.
+
+        Returns:
+            ParseCache: the cache of the file.
+        """
+        name = hashlib.sha1(str(path).encode("utf-8")).hexdigest()[:16]
+        return ParseCache(self.directory / name, self.parser)
+
+    def _entry_path(self, key: str) -> Path:
+        return self.directory / f"{key}{ENTRY_SUFFIX}"
+
+    def get(self, key: str) -> ParsedFile:
+        """Returns the cached parsed file.
+
+        Args:
+            key (str): digest of the sources.
+
+        Returns:
+            ParsedFile: the parsed file, or None if it is not in the cache.
+        """
+        try:
+            with open(str(self._entry_path(key)), mode="r", encoding="utf-8") as entry_file:
+                entry = json.load(entry_file)
+            if entry["version"] != PARSE_CACHE_VERSION or entry["key"] != key:
+                self.misses += 1
+                return None
+            parsed = load_parsed(entry["parsed"])
+        except (OSError, LookupError, TypeError, ValueError, AttributeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return parsed
+
+    def put(self, key: str, parsed: ParsedFile) -> None:
+        """Stores the parsed file, replacing the entries of previous sources.
+
+        Args:
+            key (str): digest of the sources.
+            parsed (ParsedFile): the parsed file.
+        """
+        path = self._entry_path(key)
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(str(tmp_path), mode="w", encoding="utf-8") as entry_file:
+                json.dump({"version": PARSE_CACHE_VERSION, "key": key, "parsed": dump_parsed(parsed)}, entry_file)
+            os.replace(str(tmp_path), str(path))
+        except OSError as ex:
+            lg.warning(f"Could not write the parse cache entry '{path}': {ex}")
+            return
+        for old_path in self.directory.glob(f"*{ENTRY_SUFFIX}"):
+            if old_path != path:
+                try:
+                    old_path.unlink()
+                except OSError:
+                    pass
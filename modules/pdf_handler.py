@@ -1,10 +1,45 @@
+import io
 import logging as lg
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+from typing import BinaryIO
 from fpdf import FPDF
 
 try:
     from modules.screenplay import *
+    from modules.backend import Backend, register_backend, render_scene, temporary_path
+    from modules.layout_cache import LayoutCache, scene_digest
+    from modules import measure
+    from modules.pdf_stream import PageCountMismatch, StreamingMixin
+    from modules.pdf_optimize import optimize_content
+    from modules.pdf_linearize import linearize
+    from modules.page_index import PageIndex
+    from modules.instrumentation import Instrumentation, optional_stage
 except ModuleNotFoundError:
     from screenplay import *
+    from backend import Backend, register_backend, render_scene, temporary_path
+    from layout_cache import LayoutCache, scene_digest
+    import measure
+    from pdf_stream import PageCountMismatch, StreamingMixin
+    from pdf_optimize import optimize_content
+    from pdf_linearize import linearize
+    from page_index import PageIndex
+    from instrumentation import Instrumentation, optional_stage
+
+
+### CONSTANTS ###
+
+
+# number of chunks given to each worker, so that a slow chunk does not leave the others idle
+CHUNKS_PER_JOB = 4
+
+
+### CLASSES ###
+
 
 
 class PDF(FPDF):
@@ -13,28 +48,241 @@ class PDF(FPDF):
     BETWEEN_AUTHORS_SPACE = 1
     BETWENN_OTHERS_SPACE = 5
 
-    AFTER_SCENE_HEADER_SPACE = 10
-    AFTER_SUMMARY_SPACE = 5
-    AFTER_TRANSITION_SPACE = 5
-    AFTER_DIALOG_SPACE = 5
-    AFTER_ACTION_SPACE = 5
-    AFTER_REAL_SPACE = 5
+    AFTER_SCENE_HEADER_SPACE = measure.AFTER_SCENE_HEADER_SPACE
+    AFTER_SUMMARY_SPACE = measure.AFTER_SUMMARY_SPACE
+    AFTER_TRANSITION_SPACE = measure.AFTER_TRANSITION_SPACE
+    AFTER_DIALOG_SPACE = measure.AFTER_DIALOG_SPACE
+    AFTER_ACTION_SPACE = measure.AFTER_ACTION_SPACE
+    AFTER_REAL_SPACE = measure.AFTER_REAL_SPACE
 
     DEBUG = 0  # draws the cells borders
 
     def __init__(self) -> None:
         super().__init__()
         self.previous_speaker = ""
+        # printed page number minus page number, when a selection of scenes is laid out at its place
+        self.page_offset = 0
+        self.next_page_no = None
+        # page count printed instead of the alias, when it is not the number of pages of this document
+        self.total_pages = None
+        # layout state before each scene, recorded for the page index
+        self.scene_starts = []
+        # level of the streamed pages, FPDF compresses the pages kept in memory at zlib's default
+        self.compress_level = 9
+        # web output: name, title, page and position of the header of each scene (see add_scene_bookmarks)
+        self.bookmarks = []
+        self.outline_n = None
+
+    def page_no(self) -> int:
+        return self.page + self.page_offset
+
+    def _beginpage(self, orientation) -> None:
+        super()._beginpage(orientation)
+        if self.next_page_no is not None:
+            self.page_offset = self.next_page_no - self.page
+            self.next_page_no = None
+
+    def skip_to_page(self, page_no: int) -> None:
+        """Starts a new page, numbered as the given page of the whole document.
+
+        Args:
+            page_no (int): printed number of the new page.
+        """
+        self.next_page_no = page_no
+        self.add_page()
+
+    def continue_from_state(self, state: tuple) -> None:
+        """Moves to the position and font of a state returned by get_layout_state, on the current page.
+
+        Args:
+            state (tuple): state to continue from (its page number is ignored).
+        """
+        _, x, y, family, style, size, underline, fonts, previous_speaker = state
+        if family:
+            self.set_font(family, style + ("U" if underline else ""), size)
+        self.x = x
+        self.y = y
+        self.previous_speaker = previous_speaker
+
+    def resolve_page_count(self, nb_pages: int) -> None:
+        """Prints a given total number of pages instead of the number of pages of this document.
+
+        Args:
+            nb_pages (int): number of pages of the whole document.
+        """
+        self.total_pages = nb_pages
+
+    def _putpages(self) -> None:
+        # the footer of the last page is only drawn on close, so the alias is replaced here
+        alias = getattr(self, "str_alias_nb_pages", None)
+        if alias is not None and self.total_pages is not None:
+            for page in self.pages:
+                self.pages[page] = self.pages[page].replace(alias, str(self.total_pages))
+            del self.str_alias_nb_pages
+        for page in self.pages:
+            self.pages[page] = self.finish_page(self.pages[page])
+        super()._putpages()
+
+    def finish_page(self, content: str) -> str:
+        """Returns the content of a page as it is written to the document.
+
+        Args:
+            content (str): content of the page.
+
+        Returns:
+            str: the content, without the operators which change nothing (see pdf_optimize).
+        """
+        return optimize_content(content)
+
+    def add_scene_bookmarks(self, scene_numbers: list, scenes: list) -> None:
+        """Adds a bookmark to the outline and a named destination ("scene-<number>") for the
+        header of each scene, once the scenes are laid out.
+
+        The headers are found from the start of each scene (scene_starts), so that the scenes
+        spliced from the layout cache or from the workers are bookmarked as well.
+
+        Args:
+            scene_numbers (list): number of each scene.
+            scenes (list): scenes laid out.
+        """
+        for scene_nb, scene, state in zip(scene_numbers, scenes, self.scene_starts):
+            page, y = measure.scene_header_position(state)
+            title = f"{scene_nb}. {scene.value.upper()}. {scene.location}. {scene.time.upper()}"
+            self.bookmarks.append((f"scene-{scene_nb}", title, page, y))
+
+    def _putresources(self) -> None:
+        super()._putresources()
+        if self.bookmarks:
+            self._putoutline()
+
+    def _putoutline(self) -> None:
+        """Writes the outline, one item per scene, and the named destinations it points to."""
+        self.outline_n = self.n + 1
+        first = self.outline_n + 1
+        last = self.outline_n + len(self.bookmarks)
+        self._newobj()
+        self._out("<</Type /Outlines /First %d 0 R /Last %d 0 R /Count %d>>" % (first, last, len(self.bookmarks)))
+        self._out("endobj")
+        for index, (name, title, _, _) in enumerate(self.bookmarks):
+            self._newobj()
+            links = "/Prev %d 0 R " % (self.n - 1) if index else ""
+            if self.n != last:
+                links += "/Next %d 0 R " % (self.n + 1)
+            self._out(
+                "<</Title %s /Parent %d 0 R %s/Dest %s>>"
+                % (self._textstring(title), self.outline_n, links, self._textstring(name))
+            )
+            self._out("endobj")
+        # a name tree with a single node, its names in order
+        self._newobj()
+        self._out("<</Names [")
+        for name, _, page, y in sorted(self.bookmarks, key=lambda bookmark: bookmark[0].encode("latin1")):
+            self._out("%s [%d 0 R /XYZ 0 %.2f null]" % (self._textstring(name), 1 + 2 * page, (self.h - y) * self.k))
+        self._out("]>>")
+        self._out("endobj")
+
+    def _putcatalog(self) -> None:
+        super()._putcatalog()
+        if self.outline_n is not None:
+            self._out("/Outlines %d 0 R" % self.outline_n)
+            self._out("/PageMode /UseOutlines")
+            self._out("/Names <</Dests %d 0 R>>" % (self.outline_n + len(self.bookmarks) + 1))
 
     def set_infos(
-        self, title: str, authors: list, director: str, date: str, production: str, div: dict = {}
+        self, title: str, authors: list, director: str, date: str, production: str, div: dict = None
     ) -> None:
         self.title = title
         self.authors = authors
         self.director = director
         self.date = date
         self.production = production
-        self.other = div
+        # a new dict for each document, never shared between renders
+        self.other = div if div is not None else {}
+
+    def get_string_width(self, s: str) -> float:
+        """Measures a string arithmetically when it is set in Courier (fixed-width font)."""
+        if self.font_family != measure.FONT_FAMILY or not measure.is_latin1(s):
+            return super().get_string_width(s)
+        return len(s) * measure.COURIER_WIDTH * self.font_size / 1000.0
+
+    def multi_cell(self, w, h, txt="", border=0, align="J", fill=0, split_only=False):
+        """Prints the lines of a text, wrapped arithmetically when it is set in Courier.
+
+        The lines and their word spacing are computed by the layout model, and the cells
+        are emitted exactly as FPDF's multi_cell would do.
+        """
+        if split_only or self.font_family != measure.FONT_FAMILY or not measure.is_latin1(txt):
+            return super().multi_cell(w, h, txt, border, align, fill, split_only)
+        if w == 0:
+            w = self.w - self.r_margin - self.x
+        wmax = (w - 2 * self.c_margin) * 1000.0 / self.font_size
+        b = 0
+        if border:
+            if border == 1:
+                border = "LTRB"
+                b = "LRT"
+                b2 = "LR"
+            else:
+                b2 = "".join(side for side in "LR" if side in border)
+                b = b2 + "T" if "T" in border else b2
+        lines = measure.wrap_lines(txt, w, self.font_size_pt)
+        last = len(lines) - 1
+        for nl, (line, spaces) in enumerate(lines, start=1):
+            if spaces and align == "J":
+                # broken at a space: justify the line
+                ls = len(line) * measure.COURIER_WIDTH
+                self.ws = (wmax - ls) / 1000.0 * self.font_size / (spaces - 1) if spaces > 1 else 0
+                self._out("%.3f Tw" % (self.ws * self.k))
+            elif self.ws > 0:
+                self.ws = 0
+                self._out("0 Tw")
+            if nl - 1 == last and border and "B" in border:
+                b += "B"
+            self._emit_line(w, h, line, b, align, fill)
+            if border and nl == 1:
+                b = b2
+        self.x = self.l_margin
+
+    def _emit_line(self, w, h, txt, border, align, fill) -> None:
+        """Emits a line of a multi_cell, with the same operators as FPDF's cell."""
+        if (
+            fill
+            or self.color_flag
+            or self.underline
+            or (self.y + h > self.page_break_trigger and not self.in_footer and self.accept_page_break())
+        ):
+            # let FPDF handle the page break and the uncommon cases
+            self.cell(w, h, txt, border, 2, align, fill)
+            return
+        k = self.k
+        s = ""
+        if border:
+            x = self.x
+            y = self.y
+            if "L" in border:
+                s += "%.2f %.2f m %.2f %.2f l S " % (x * k, (self.h - y) * k, x * k, (self.h - (y + h)) * k)
+            if "T" in border:
+                s += "%.2f %.2f m %.2f %.2f l S " % (x * k, (self.h - y) * k, (x + w) * k, (self.h - y) * k)
+            if "R" in border:
+                s += "%.2f %.2f m %.2f %.2f l S " % ((x + w) * k, (self.h - y) * k, (x + w) * k, (self.h - (y + h)) * k)
+            if "B" in border:
+                s += "%.2f %.2f m %.2f %.2f l S " % (x * k, (self.h - (y + h)) * k, (x + w) * k, (self.h - (y + h)) * k)
+        if txt:
+            if align == "R":
+                dx = w - self.c_margin - len(txt) * measure.COURIER_WIDTH * self.font_size / 1000.0
+            elif align == "C":
+                dx = (w - len(txt) * measure.COURIER_WIDTH * self.font_size / 1000.0) / 2.0
+            else:
+                dx = self.c_margin
+            s += "BT %.2f %.2f Td (%s) Tj ET" % (
+                (self.x + dx) * k,
+                (self.h - (self.y + 0.5 * h + 0.3 * self.font_size)) * k,
+                self._escape(txt),
+            )
+        if s:
+            self.pages[self.page] += s + "\n"
+        self.lasth = h
+        self.y += h
 
     def draw_cover(self):
         # draw the title at two-thirds
@@ -90,24 +338,30 @@ class PDF(FPDF):
     def header(self):
         # if it is not the cover page
         if self.page_no() != 1:
-            # Arial bold 10
-            self.set_font("Courier", "", 10)
-            # centered title
-            self.cell(0, 5, f"Screenplay - {self.title.upper()}", self.DEBUG, 0, "C")
+            self._draw_header()
             # Line break
             self.ln(20)
 
+    def _draw_header(self) -> None:
+        # Arial bold 10
+        self.set_font("Courier", "", 10)
+        # centered title
+        self.cell(0, 5, f"Screenplay - {self.title.upper()}", self.DEBUG, 0, "C")
+
     def footer(self):
         # if it is not the cover page
         if self.page_no() != 1:
-            # Position at 1.5 cm from bottom
-            self.set_y(-15)
-            # Arial italic 8
-            self.set_font("Courier", "I", 8)
+            self._draw_production()
             # Page number
-            self.cell(0, 5, f"Prod. {self.production.upper()}", self.DEBUG, 0, "L")
             self.cell(0, 5, "Page " + str(self.page_no()) + "/{nb}", self.DEBUG, 0, "R")
 
+    def _draw_production(self) -> None:
+        # Position at 1.5 cm from bottom
+        self.set_y(-15)
+        # Arial italic 8
+        self.set_font("Courier", "I", 8)
+        self.cell(0, 5, f"Prod. {self.production.upper()}", self.DEBUG, 0, "L")
+
     def add_action(self, action: Action) -> None:
         """Adds an action paragraph to the pdf.
 
@@ -198,6 +452,94 @@ class PDF(FPDF):
         # reset the speakers
         self.previous_speaker = ""
 
+    def get_layout_state(self) -> tuple:
+        """Returns everything the layout of the next element depends on.
+
+        Returns:
+            tuple: page number, position, font state, registered fonts and previous speaker.
+        """
+        return (
+            self.page,
+            round(self.x, 4),
+            round(self.y, 4),
+            self.font_family,
+            self.font_style,
+            self.font_size_pt,
+            self.underline,
+            tuple(self.fonts),
+            self.previous_speaker,
+        )
+
+    def get_layout_since(self, start_page: int, start_length: int) -> dict:
+        """Captures the content written since a given point, and the resulting state.
+
+        Args:
+            start_page (int): page number at the starting point.
+            start_length (int): length of that page's content at the starting point.
+
+        Returns:
+            dict: the written content of each page and the state at the end.
+        """
+        pages = [self.pages[start_page][start_length:]]
+        pages += [self.pages[page] for page in range(start_page + 1, self.page + 1)]
+        return {
+            "pages": pages,
+            "x": self.x,
+            "y": self.y,
+            "lasth": self.lasth,
+            "font": [self.font_family, self.font_style + ("U" if self.underline else ""), self.font_size_pt],
+            "fonts": list(self.fonts),
+            "previous_speaker": self.previous_speaker,
+        }
+
+    def apply_layout(self, layout: dict) -> None:
+        """Splices content captured by get_layout_since, as if it had been laid out here.
+
+        Args:
+            layout (dict): the captured content and state.
+        """
+        self.pages[self.page] += layout["pages"][0]
+        for content in layout["pages"][1:]:
+            self.page += 1
+            self.pages[self.page] = content
+        # register the fonts in the same order and restore the font, without writing to the page
+        length = len(self.pages[self.page])
+        for fontkey in layout["fonts"][len(self.fonts):]:
+            family = fontkey.rstrip("BI")
+            self.set_font(family, fontkey[len(family):])
+        family, style, size = layout["font"]
+        self.font_family = ""
+        self.set_font(family, style, size)
+        self.pages[self.page] = self.pages[self.page][:length]
+        self.x = layout["x"]
+        self.y = layout["y"]
+        self.lasth = layout["lasth"]
+        self.previous_speaker = layout["previous_speaker"]
+
+    def restore_layout_state(self, state: tuple) -> None:
+        """Starts laying out from a state returned by get_layout_state, on an empty page.
+
+        Only the content written from this point is meaningful, see get_layout_since.
+
+        Args:
+            state (tuple): state to start from.
+        """
+        page, x, y, family, style, size, underline, fonts, previous_speaker = state
+        self.page = page
+        self.pages[page] = ""
+        self.state = 2
+        # register the fonts in the same order and select the font, without writing to the page
+        for fontkey in fonts:
+            registered_family = fontkey.rstrip("BI")
+            self.set_font(registered_family, fontkey[len(registered_family):])
+        self.font_family = ""
+        if family:
+            self.set_font(family, style + ("U" if underline else ""), size)
+        self.pages[page] = ""
+        self.x = x
+        self.y = y
+        self.previous_speaker = previous_speaker
+
     def the_end(self) -> None:
         """Prints "the end" at the end of the document."""
         self.ln(10)
@@ -205,6 +547,159 @@ class PDF(FPDF):
         self.cell(0, 15, "The END", self.DEBUG, 0, "C")
 
 
+class StreamingPDF(StreamingMixin, PDF):
+    """PDF class writing its finished pages to the output file during the layout."""
+
+
+def _document_key(pdf: PDF) -> tuple:
+    """Returns the document-wide values printed on every page, for the layout cache."""
+    return (pdf.title, pdf.production, pdf.DEBUG)
+
+
+def render_scene_cached(pdf: PDF, scene_nb: int, scene: Scene, cache: LayoutCache) -> None:
+    """Lays out a scene, or splices its cached layout if neither the scene nor its start state changed.
+
+    Args:
+        pdf (PDF): pdf to write into.
+        scene_nb (int): number of the scene.
+        scene (Scene): scene to lay out.
+        cache (LayoutCache): cache of the scenes' layouts.
+    """
+    key = scene_digest(scene_nb, scene, pdf.get_layout_state(), _document_key(pdf))
+    layout = cache.get(key)
+    if layout is not None:
+        pdf.apply_layout(layout)
+        return
+    start_page = pdf.page
+    start_length = len(pdf.pages[start_page])
+    render_scene(pdf, scene_nb, scene)
+    cache.put(key, pdf.get_layout_since(start_page, start_length))
+
+
+def _setup_pdf(infos: tuple, streaming: bool = False) -> PDF:
+    """Instantiates the pdf class with its attributes and page setup.
+
+    Args:
+        infos (tuple): title, authors, director, date, production and other informations.
+        streaming (bool): whether to instantiate StreamingPDF. Defaults to False.
+
+    Returns:
+        PDF: the pdf, without any page.
+    """
+    title, authors, director, date, production, other = infos
+    pdf = StreamingPDF() if streaming else PDF()
+    pdf.set_infos(title, authors, director, date, production, div=other)
+    pdf.set_margins(left=measure.LEFT_MARGIN, top=measure.TOP_MARGIN, right=measure.RIGHT_MARGIN)
+    pdf.alias_nb_pages()
+    return pdf
+
+
+def _layout_chunk(infos: tuple, start_state: tuple, scene_numbers: list, scenes: list) -> list:
+    """Lays out consecutive scenes from a predicted start state (run in a worker process).
+
+    Args:
+        infos (tuple): informations of the document, see _setup_pdf.
+        start_state (tuple): predicted state of the pdf before the first scene.
+        scene_numbers (list): number of each scene.
+        scenes (list): scenes to lay out.
+
+    Returns:
+        list: layout of each scene, see PDF.get_layout_since.
+    """
+    pdf = _setup_pdf(infos)
+    pdf.restore_layout_state(start_state)
+    layouts = []
+    for scene_nb, scene in zip(scene_numbers, scenes):
+        start_page = pdf.page
+        start_length = len(pdf.pages[start_page])
+        render_scene(pdf, scene_nb, scene)
+        layouts.append(pdf.get_layout_since(start_page, start_length))
+    return layouts
+
+
+def render_scenes_parallel(
+    pdf: PDF,
+    infos: tuple,
+    list_of_scenes: list,
+    jobs: int,
+    cache: LayoutCache = None,
+    instrumentation: Instrumentation = None,
+    scene_numbers: list = None,
+) -> None:
+    """Lays out the scenes in worker processes and splices the results in order.
+
+    The start state of every scene is predicted by the layout model, so that chunks of
+    scenes can be laid out independently. A scene whose predicted start state turns out
+    to be wrong is laid out again in this process, so the result is always the same as
+    a serial layout.
+
+    Args:
+        pdf (PDF): pdf to write into, ready for the first scene.
+        infos (tuple): informations of the document, see _setup_pdf.
+        list_of_scenes (list): scenes to lay out.
+        jobs (int): number of worker processes.
+        cache (LayoutCache, optional): cache of the scenes' layouts. Defaults to None.
+        instrumentation (Instrumentation, optional): collects the timings and progress. Defaults to None.
+        scene_numbers (list, optional): number of each scene. Defaults to None (1, 2, 3...).
+    """
+    if scene_numbers is None:
+        scene_numbers = list(range(1, len(list_of_scenes) + 1))
+    starts = [scene_map["start"] for scene_map in measure.measure_scenes(pdf.get_layout_state(), list_of_scenes)]
+    # reuse the cached scenes, and split the others into chunks of consecutive scenes
+    layouts = [None] * len(list_of_scenes)
+    keys = [None] * len(list_of_scenes)
+    missing = []
+    for index, scene in enumerate(list_of_scenes):
+        if cache is not None:
+            keys[index] = scene_digest(scene_numbers[index], scene, starts[index], _document_key(pdf))
+            layouts[index] = cache.get(keys[index])
+        if layouts[index] is None:
+            missing.append(index)
+    chunk_size = max(1, math.ceil(len(missing) / (jobs * CHUNKS_PER_JOB)))
+    chunks = []
+    for index in missing:
+        if chunks and index == chunks[-1][-1] + 1 and len(chunks[-1]) < chunk_size:
+            chunks[-1].append(index)
+        else:
+            chunks.append([index])
+    # no worker process is started when every scene is in the cache
+    with ProcessPoolExecutor(max_workers=jobs) if chunks else nullcontext() as executor:
+        futures = [
+            executor.submit(
+                _layout_chunk,
+                infos,
+                starts[chunk[0]],
+                [scene_numbers[index] for index in chunk],
+                [list_of_scenes[index] for index in chunk],
+            )
+            for chunk in chunks
+        ]
+        chunk_results = iter(zip(chunks, futures))
+        pending = {}
+        for index, scene in enumerate(list_of_scenes):
+            if layouts[index] is None and index not in pending:
+                chunk, future = next(chunk_results)
+                pending = dict(zip(chunk, future.result()))
+            from_worker = layouts[index] is None
+            layout = pending.pop(index) if from_worker else layouts[index]
+            start = time.perf_counter()
+            pdf.scene_starts.append(pdf.get_layout_state())
+            if pdf.scene_starts[-1] != starts[index]:
+                lg.debug(f"Wrong prediction for scene {scene_numbers[index]}, laying it out again.")
+                if cache is not None:
+                    render_scene_cached(pdf, scene_numbers[index], scene, cache)
+                else:
+                    render_scene(pdf, scene_numbers[index], scene)
+            else:
+                pdf.apply_layout(layout)
+                if from_worker and cache is not None:
+                    cache.put(keys[index], layout)
+            if isinstance(pdf, StreamingPDF):
+                pdf.flush_pages()
+            if instrumentation is not None:
+                instrumentation.scene(scene_numbers[index], len(list_of_scenes), scene, start, pdf.page)
+
+
 def create_pdf(
     title: str,
     authors: list,
@@ -212,7 +707,12 @@ def create_pdf(
     date: str,
     production: str,
     list_of_scenes: list,
-    other: dict = {},
+    other: dict = None,
+    cache: LayoutCache = None,
+    jobs: int = 1,
+    instrumentation: Instrumentation = None,
+    stream: BinaryIO = None,
+    scene_numbers: list = None,
 ) -> PDF:
     """Instantiates the pdf class and sets its attributes.
 
@@ -223,35 +723,271 @@ def create_pdf(
         date (str): creation date of the document.
         production (str): producer of the document.
         list_of_scenes (list): list of scenes to appear in the pdf.
-        other (dict): other informations that might be usefull.
+        other (dict, optional): other informations that might be usefull. Defaults to None.
+        cache (LayoutCache, optional): cache of the scenes' layouts, only the scenes
+        that changed are laid out again. Defaults to None (no cache).
+        jobs (int): number of worker processes laying out the scenes. Defaults to 1.
+        instrumentation (Instrumentation, optional): collects the timing of each scene and notifies
+        the progress; the layout stops with RenderCancelled if it is cancelled. Defaults to None.
+        stream (BinaryIO, optional): file opened for binary writing, where the finished pages are
+        written during the layout; the document is then written by closing the pdf, instead of
+        calling its output method. Defaults to None (the document is kept in memory).
+        scene_numbers (list, optional): number printed in the header of each scene, to render a
+        selection of scenes with their original numbers. Defaults to None (1, 2, 3...).
 
     Returns:
         PDF: created pdf.
     """
-    pdf = PDF()
-    pdf.set_infos(title, authors, director, date, production, div=other)
-    pdf.set_margins(left=25, top=10, right=15)
-    pdf.alias_nb_pages()
+    infos = (title, authors, director, date, production, other)
+    pdf = _setup_pdf(infos, streaming=stream is not None)
     # draw the cover page
     pdf.add_page()
     pdf.draw_cover()
     # write the body
     pdf.add_page()
-    for scene_nb, scene in enumerate(list_of_scenes):
-        pdf.add_scene_header(scene_nb + 1, scene.value, scene.location, scene.time)
-        elements = scene.get_elements()
-        for element in elements:
-            if element.__class__.__name__ == "Action":
-                pdf.add_action(element)
-            elif element.__class__.__name__ == "Dialog":
-                pdf.add_dialog(element)
-            elif element.__class__.__name__ == "Transition":
-                pdf.add_transition(element)
-            elif element.__class__.__name__ == "Summary":
-                pdf.add_summary(element)
-            elif element.__class__.__name__ == "Dir":
-                pdf.add_dir(element)
+    if stream is not None:
+        # the page count is printed on every page, so it is computed before the layout
+        pdf.start_stream(stream, measure.count_pages(pdf.get_layout_state(), list_of_scenes))
+        pdf.flush_pages()
+    if jobs > 1 and len(list_of_scenes) > 1:
+        render_scenes_parallel(pdf, infos, list_of_scenes, jobs, cache, instrumentation, scene_numbers)
+    else:
+        if scene_numbers is None:
+            scene_numbers = range(1, len(list_of_scenes) + 1)
+        for scene_nb, scene in zip(scene_numbers, list_of_scenes):
+            start = time.perf_counter()
+            pdf.scene_starts.append(pdf.get_layout_state())
+            if cache is None:
+                render_scene(pdf, scene_nb, scene)
             else:
-                lg.warning(f"Unknown element found: {element.__class__.__name__}. Ignoring it.")
+                render_scene_cached(pdf, scene_nb, scene, cache)
+            if instrumentation is not None:
+                instrumentation.scene(scene_nb, len(list_of_scenes), scene, start, pdf.page)
+            if stream is not None:
+                pdf.flush_pages()
+    if cache is not None:
+        cache.prune()
     pdf.the_end()
     return pdf
+
+
+def measure_page_index(infos: tuple, list_of_scenes: list) -> tuple:
+    """Computes where each scene starts in the full pdf, and its number of pages, with the layout model.
+
+    Args:
+        infos (tuple): informations of the document, see _setup_pdf.
+        list_of_scenes (list): all the scenes of the screenplay.
+
+    Returns:
+        tuple: layout state before each scene (see PDF.get_layout_state), and number of pages.
+    """
+    pdf = _setup_pdf(infos)
+    pdf.add_page()
+    pdf.draw_cover()
+    pdf.add_page()
+    state = pdf.get_layout_state()
+    starts = [scene_map["start"] for scene_map in measure.measure_scenes(state, list_of_scenes)]
+    return starts, measure.count_pages(state, list_of_scenes)
+
+
+def create_partial_pdf(
+    title: str,
+    authors: list,
+    director: str,
+    date: str,
+    production: str,
+    list_of_scenes: list,
+    starts: list,
+    nb_pages: int,
+    other: dict = None,
+    scene_numbers: list = None,
+    the_end: bool = False,
+) -> PDF:
+    """Lays out a selection of scenes at their place in the full pdf, without the other scenes.
+
+    Each run of consecutive scenes starts on a page numbered as in the full pdf, at the
+    position where it starts in the full pdf, so that the pages look the same.
+
+    Args:
+        title (str): title of the document.
+        authors (list): list of authors of the document.
+        director (str): director of the project.
+        date (str): creation date of the document.
+        production (str): producer of the document.
+        list_of_scenes (list): selected scenes.
+        starts (list): layout state of the full pdf before each selected scene.
+        nb_pages (int): number of pages of the full pdf.
+        other (dict, optional): other informations that might be usefull. Defaults to None.
+        scene_numbers (list, optional): number of each selected scene. Defaults to None (1, 2, 3...).
+        the_end (bool): whether the last scene of the screenplay is selected, and is followed by
+        "the end". Defaults to False.
+
+    Returns:
+        PDF: created pdf.
+    """
+    pdf = _setup_pdf((title, authors, director, date, production, other))
+    if scene_numbers is None:
+        scene_numbers = list(range(1, len(list_of_scenes) + 1))
+    previous_nb = None
+    for scene_nb, scene, state in zip(scene_numbers, list_of_scenes, starts):
+        if previous_nb is None or scene_nb != previous_nb + 1:
+            pdf.skip_to_page(state[0])
+            pdf.continue_from_state(state)
+        pdf.scene_starts.append(pdf.get_layout_state())
+        render_scene(pdf, scene_nb, scene)
+        previous_nb = scene_nb
+    if the_end:
+        pdf.the_end()
+    pdf.resolve_page_count(nb_pages)
+    return pdf
+
+
+@register_backend
+class PDFBackend(Backend):
+    """Renders the screenplay to a .pdf file with the PDF class."""
+
+    name = "pdf"
+    extension = ".pdf"
+
+    def __init__(self, streaming: bool = True, web: bool = False) -> None:
+        """Initializes the backend.
+
+        Args:
+            streaming (bool): whether to write the pages to the file during the layout, so that the
+            memory used does not grow with the screenplay. Defaults to True.
+                web (bool): whether to write the web output: linearized (see pdf_linearize), with a
+            bookmark and a named destination for each scene. Defaults to False.
+        """
+        self.streaming = streaming
+        self.web = web
+
+    def _create_pdf(self, screenplay: Screenplay, cache, jobs, instrumentation, stream=None) -> PDF:
+        pdf = create_pdf(
+            screenplay.title,
+            screenplay.authors,
+            screenplay.director,
+            screenplay.date,
+            screenplay.production,
+            screenplay.scenes,
+            other=screenplay.other,
+            cache=cache,
+            jobs=jobs,
+            instrumentation=instrumentation,
+            stream=stream,
+            scene_numbers=screenplay.get_scene_numbers(),
+        )
+        if self.web:
+            pdf.add_scene_bookmarks(screenplay.get_scene_numbers(), screenplay.scenes)
+        return pdf
+
+    def write(
+        self,
+        screenplay: Screenplay,
+        stream: BinaryIO,
+        cache: LayoutCache = None,
+        jobs: int = 1,
+        instrumentation: Instrumentation = None,
+    ) -> PDF:
+        """Writes the whole screenplay as a pdf to a binary file object (open file, BytesIO...).
+
+        Args:
+            screenplay (Screenplay): screenplay to be written.
+            stream (BinaryIO): seekable file object opened for binary writing.
+            cache (LayoutCache, optional): cache of the scenes' layouts. Defaults to None.
+            jobs (int): number of worker processes laying out the scenes. Defaults to 1.
+            instrumentation (Instrumentation, optional): collects the timings and progress. Defaults to None.
+
+        Returns:
+            PDF: the closed document.
+        """
+        if self.web:
+            # the objects are reordered once the whole document is written
+            buffer = io.BytesIO()
+            pdf = self._write(screenplay, buffer, cache, jobs, instrumentation)
+            with optional_stage(instrumentation, "linearize"):
+                stream.write(linearize(buffer.getvalue()))
+            return pdf
+        return self._write(screenplay, stream, cache, jobs, instrumentation)
+
+    def _write(self, screenplay: Screenplay, stream: BinaryIO, cache, jobs, instrumentation) -> PDF:
+        """Writes the document as FPDF orders it (see write)."""
+        start = stream.tell()
+        if self.streaming:
+            try:
+                with optional_stage(instrumentation, "layout"):
+                    pdf = self._create_pdf(screenplay, cache, jobs, instrumentation, stream)
+                with optional_stage(instrumentation, "output"):
+                    pdf.close()
+                return pdf
+            except PageCountMismatch as ex:
+                lg.warning(f"{ex} Rendering the document again in memory.")
+                stream.seek(start)
+                stream.truncate()
+        with optional_stage(instrumentation, "layout"):
+            pdf = self._create_pdf(screenplay, cache, jobs, instrumentation)
+        with optional_stage(instrumentation, "output"):
+            stream.write(pdf.output(dest="S").encode("latin1"))
+        return pdf
+
+    def render(
+        self,
+        screenplay: Screenplay,
+        output_path: Path,
+        cache: LayoutCache = None,
+        jobs: int = 1,
+        instrumentation: Instrumentation = None,
+        page_index: PageIndex = None,
+    ) -> None:
+        output_path = Path(output_path)
+        tmp_path = temporary_path(output_path)
+        try:
+            if page_index is not None:
+                # a selection of scenes, laid out at its place in the full document
+                numbers = screenplay.get_scene_numbers()
+                with optional_stage(instrumentation, "layout"):
+                    pdf = create_partial_pdf(
+                        screenplay.title,
+                        screenplay.authors,
+                        screenplay.director,
+                        screenplay.date,
+                        screenplay.production,
+                        screenplay.scenes,
+                        [page_index.starts[scene_nb - 1] for scene_nb in numbers],
+                        page_index.nb_pages,
+                        other=screenplay.other,
+                        scene_numbers=numbers,
+                        the_end=numbers[-1] == len(page_index.starts),
+                                )
+                    if self.web:
+                        pdf.add_scene_bookmarks(numbers, screenplay.scenes)
+                with optional_stage(instrumentation, "output"):
+                    if self.web:
+                        tmp_path.write_bytes(linearize(pdf.output(dest="S").encode("latin1")))
+                    else:
+                        pdf.output(str(tmp_path))
+            else:
+                with open(str(tmp_path), mode="wb") as stream:
+                    pdf = self.write(screenplay, stream, cache, jobs, instrumentation)
+            os.replace(str(tmp_path), str(output_path))
+        finally:
+            # left behind when the render failed or was cancelled
+            if tmp_path.exists():
+                tmp_path.unlink()
+        # kept for the page index of the full document
+        self.scene_starts = pdf.scene_starts
+        self.nb_pages = pdf.page
+        if instrumentation is not None:
+            instrumentation.count("pages", pdf.page)
+            instrumentation.count("bytes_written", output_path.stat().st_size)
+
+
+@register_backend
+class WebPDFBackend(PDFBackend):
+    """Renders the screenplay to a linearized .pdf file, whose first page is displayed before the
+    rest of the file is downloaded, with a bookmark and a named destination for each scene."""
+
+    name = "pdf-web"
+    extension = ".web.pdf"
+
+    def __init__(self, streaming: bool = True, web: bool = True) -> None:
+        super().__init__(streaming, web=web)
@@ -0,0 +1,399 @@
+"""Linearized ("fast web view") pdf, for the web output.
+
+A linearized file starts with everything a viewer needs to display the first page: the
+linearization dictionary, a cross-reference table of the first objects, the catalog, the
+hint tables giving where every page lies in the file, then the first page with the resources
+it uses, and the outline when it is opened with the document. The other pages follow, each
+with its own objects, then the objects shared by these pages and the others (page tree,
+informations, named destinations), and the main cross-reference table.
+
+The document is written by FPDF first, then its objects are renumbered and reordered
+(PDF 1.7, annex F). FPDF writes a single page tree node and no object stream, which is
+all this module handles; the attributes the pages inherit from the node (the media box)
+are moved to the pages, as a linearized file has none.
+"""
+import hashlib
+import re
+import zlib
+
+
+### CONSTANTS ###
+
+
+# after the header, so that the file is recognized as binary
+BINARY_COMMENT = b"%\xe2\xe3\xcf\xd3\n"
+
+# the values only known once the file is laid out are padded to this width, so that
+# filling them in moves nothing
+NUMBER_WIDTH = 10
+
+# a literal string (skipped, it may read like a reference) or an indirect reference
+REFERENCE_PATTERN = re.compile(rb"\((?:\\.|[^\\()])*\)|(?<![\d.])(\d+) 0 R", re.S)
+STREAM_PATTERN = re.compile(rb"(.*?>>\s*)(stream\r?\n.*)", re.S)
+# an attribute of the page tree node inherited by the pages, with an array, reference or integer value
+INHERITED_PATTERN = re.compile(rb"/(MediaBox|CropBox|Resources|Rotate)\s*(?:\[[^\]]*\]|\d+ 0 R|-?\d+)\s*")
+
+# denominator of the position of the shared objects in the page hint table (positions not given)
+SHARED_DENOMINATOR = 4
+
+
+### CLASSES ###
+
+
+class BitWriter:
+    """Writes the unsigned integers of the hint tables, on a given number of bits each."""
+
+    def __init__(self) -> None:
+        self.data = bytearray()
+        self.value = 0
+        self.bits = 0
+
+    def write(self, value: int, bits: int) -> None:
+        self.value = (self.value << bits) | value
+        self.bits += bits
+        while self.bits >= 8:
+            self.bits -= 8
+            self.data.append(self.value >> self.bits)
+            self.value &= (1 << self.bits) - 1
+
+    def write_all(self, values: list, bits: int) -> None:
+        """Writes an item for all the pages (or groups), the next item starting on a new byte."""
+        for value in values:
+            self.write(value, bits)
+        self.flush()
+
+    def flush(self) -> None:
+        if self.bits:
+            self.write(0, 8 - self.bits)
+
+
+### FUNCTIONS ###
+
+
+def _read_objects(data: bytes) -> tuple:
+    """Reads the objects of a document written by FPDF, from its cross-reference table.
+
+    Returns:
+        tuple: body of each object by number (between "obj" and "endobj"), and the trailer.
+    """
+    xref = int(data[data.rindex(b"startxref") + len(b"startxref") :].split()[0])
+    header, subsection, entries = data[xref:].split(b"\n", 2)
+    first, count = map(int, subsection.split())
+    offsets = {}
+    for index in range(count):
+        entry = entries[20 * index : 20 * index + 20]
+        if entry[17:18] == b"n":
+            offsets[first + index] = int(entry[:10])
+    bodies = {}
+    ends = sorted(offsets.values())[1:] + [xref]
+    for (number, offset), end in zip(sorted(offsets.items(), key=lambda item: item[1]), ends):
+        start = data.index(b"obj", offset) + len(b"obj\n")
+        bodies[number] = data[start : data.rindex(b"endobj", start, end)]
+    return bodies, data[data.index(b"trailer", xref) :]
+
+
+def _split_stream(body: bytes) -> tuple:
+    """Splits the body of an object into its dictionary (or value) and its stream, if any."""
+    match = STREAM_PATTERN.match(body)
+    if match is None:
+        return body, b""
+    return match.group(1), match.group(2)
+
+
+def _references(body: bytes) -> list:
+    return [int(match.group(1)) for match in REFERENCE_PATTERN.finditer(_split_stream(body)[0]) if match.group(1)]
+
+
+def _reference(body: bytes, key: bytes) -> int:
+    match = re.search(rb"/%s (\d+) 0 R" % key, _split_stream(body)[0])
+    return int(match.group(1)) if match else None
+
+
+def _push_inherited(bodies: dict, pages_root: int, pages: list) -> None:
+    """Moves the attributes inherited from the page tree node to the pages that do not set them."""
+    inherited = {match.group(1): match.group(0).rstrip() for match in INHERITED_PATTERN.finditer(bodies[pages_root])}
+    if not inherited:
+        return
+    bodies[pages_root] = INHERITED_PATTERN.sub(b"", bodies[pages_root])
+    for page in pages:
+        body = bodies[page]
+        own = {match.group(1) for match in INHERITED_PATTERN.finditer(body)}
+        end = body.rindex(b">>")
+        added = b"".join(b"\n" + attribute for key, attribute in inherited.items() if key not in own)
+        bodies[page] = body[:end] + added + body[end:]
+
+
+def _closure(start: list, references: dict, stop: set) -> list:
+    """Lists the objects reachable from some objects, without going through the stop ones.
+
+    Returns:
+        list: the objects, the referencing ones before the referenced ones.
+    """
+    found = []
+    seen = set()
+    todo = list(reversed(start))
+    while todo:
+        number = todo.pop()
+        if number in seen or number in stop:
+            continue
+        seen.add(number)
+        found.append(number)
+        todo.extend(reversed(references[number]))
+    return found
+
+
+def _nbits(value: int) -> int:
+    """Number of bits needed to write a value (0 for 0)."""
+    return value.bit_length()
+
+
+def _padded(value: int) -> bytes:
+    return b"%*d" % (NUMBER_WIDTH, value)
+
+
+def _hint_stream(pages: list, shared_objects: list, first_shared: tuple, outline: tuple = None) -> tuple:
+    """Builds the page offset and shared object hint tables, and the outline hint table.
+
+    The offsets are those of the file without the hint stream, as the hint tables give them.
+
+    Args:
+        pages (list): for each page, its offset, the offset of its end, its number of objects
+        and the identifiers of the shared objects it uses (none for the first page).
+        shared_objects (list): length of each shared object, those of the first page section first.
+        first_shared (tuple): number and offset of the first shared object after the pages
+        ((0, 0) if there is none), and number of objects in the first page section.
+        outline (tuple, optional): number and offset of the outline dictionary, number of objects
+        and length of the outline, when it is opened with the document. Defaults to None.
+
+    Returns:
+        tuple: the data of the stream, the offset of the shared object hint table in it, and the
+        offset of the outline hint table (None without outline).
+    """
+    lengths = [end - offset for offset, end, _, _ in pages]
+    counts = [count for _, _, count, _ in pages]
+    shared = [identifiers for _, _, _, identifiers in pages]
+    min_count, min_length = min(counts), min(lengths)
+    nbits_count = _nbits(max(counts) - min_count)
+    nbits_length = _nbits(max(lengths) - min_length)
+    nbits_shared = _nbits(max(len(identifiers) for identifiers in shared))
+    nbits_identifier = _nbits(max((max(identifiers, default=0) for identifiers in shared), default=0))
+    writer = BitWriter()
+    # page offset hint table: header
+    for value, bits in (
+        (min_count, 32),
+        (pages[0][0], 32),
+        (nbits_count, 16),
+        (min_length, 32),
+        (nbits_length, 16),
+        # the content streams are given as the whole pages (the viewers do not use them)
+        (0, 32),
+        (0, 16),
+        (min_length, 32),
+        (nbits_length, 16),
+        (nbits_shared, 16),
+        (nbits_identifier, 16),
+        (0, 16),
+        (SHARED_DENOMINATOR, 16),
+    ):
+        writer.write(value, bits)
+    # one item for all the pages, then the next item
+    writer.write_all([count - min_count for count in counts], nbits_count)
+    writer.write_all([length - min_length for length in lengths], nbits_length)
+    writer.write_all([len(identifiers) for identifiers in shared], nbits_shared)
+    writer.write_all([identifier for identifiers in shared for identifier in identifiers], nbits_identifier)
+    writer.write_all([length - min_length for length in lengths], nbits_length)
+    shared_offset = len(writer.data)
+    # shared object hint table, one object per group
+    number, offset, nb_first_page = first_shared
+    min_group = min(shared_objects)
+    nbits_group = _nbits(max(shared_objects) - min_group)
+    for value, bits in (
+        (number, 32),
+        (offset, 32),
+        (nb_first_page, 32),
+        (len(shared_objects), 32),
+        (0, 16),
+        (min_group, 32),
+        (nbits_group, 16),
+    ):
+        writer.write(value, bits)
+    writer.write_all([length - min_group for length in shared_objects], nbits_group)
+    writer.write_all([0] * len(shared_objects), 1)  # no MD5 signature
+    if outline is None:
+        return bytes(writer.data), shared_offset, None
+    # outline hint table (a generic hint table)
+    outline_offset = len(writer.data)
+    for value in outline:
+        writer.write(value, 32)
+    return bytes(writer.data), shared_offset, outline_offset
+
+
+def linearize(data: bytes, compress: bool = True) -> bytes:
+    """Rewrites a document written by FPDF as a linearized document.
+
+    Args:
+        data (bytes): the document.
+        compress (bool): whether to compress the hint stream. Defaults to True.
+
+    Returns:
+        bytes: the linearized document, with the same objects and pages.
+    """
+    bodies, trailer = _read_objects(data)
+    catalog = _reference(trailer, b"Root")
+    info = _reference(trailer, b"Info")
+    pages_root = _reference(bodies[catalog], b"Pages")
+    kids = re.search(rb"/Kids \[([^\]]*)\]", bodies[pages_root]).group(1)
+    pages = [int(number) for number in re.findall(rb"(\d+) 0 R", kids)]
+    _push_inherited(bodies, pages_root, pages)
+    references = {number: _references(body) for number, body in bodies.items()}
+    document = [catalog]
+    stop = {pages_root, *pages, catalog}
+
+    # the first page and everything it uses, then the outline if it is opened with the document
+    first_page = [pages[0]] + _closure(references[pages[0]], references, stop)
+    in_first_page = set(first_page)
+    outlines = _reference(bodies[catalog], b"Outlines")
+    outline = []
+    if outlines is not None and b"/PageMode /UseOutlines" in bodies[catalog]:
+        outline = _closure([outlines], references, stop | in_first_page)
+    first_page += outline
+    in_first_page.update(outline)
+    # the objects of each other page, and those shared by several pages
+    used = [_closure(references[page], references, stop) for page in pages[1:]]
+    users = {}
+    for objects in used:
+        for number in objects:
+            users[number] = users.get(number, 0) + 1
+    other_pages = [
+        [page] + [number for number in objects if users[number] == 1 and number not in in_first_page]
+        for page, objects in zip(pages[1:], used)
+    ]
+    shared = list(
+        dict.fromkeys(number for objects in used for number in objects if users[number] > 1 and number not in in_first_page)
+    )
+    placed = set(document) | in_first_page | set(shared)
+    placed.update(number for objects in other_pages for number in objects)
+    others = [number for number in sorted(bodies) if number not in placed]
+
+    # the objects after the first page come first in the main cross-reference table
+    main = [number for objects in other_pages for number in objects] + shared + others
+    first_number = len(main) + 1
+    hint_number = first_number + 1 + len(document)
+    renumbered = {old: new for new, old in enumerate(main, start=1)}
+    renumbered.update({old: new for new, old in enumerate(document, start=first_number + 1)})
+    renumbered.update({old: new for new, old in enumerate(first_page, start=hint_number + 1)})
+    size = hint_number + 1 + len(first_page)
+
+    def serialize(number: int) -> bytes:
+        dictionary, stream = _split_stream(bodies[number])
+        dictionary = REFERENCE_PATTERN.sub(
+            lambda match: match.group(0) if match.group(1) is None else b"%d 0 R" % renumbered[int(match.group(1))],
+            dictionary,
+        )
+        return b"%d 0 obj\n%s%sendobj\n" % (renumbered[number], dictionary, stream)
+
+    objects = {number: serialize(number) for number in bodies}
+    digest = hashlib.md5(data).hexdigest().encode("ascii")
+    file_id = b"/ID [<%s><%s>]" % (digest, digest)
+    head = data[: data.index(b"\n") + 1] + BINARY_COMMENT
+
+    def linearization_dictionary(length, hint_offset, hint_length, first_page_end, main_xref_entry) -> bytes:
+        return b"%d 0 obj\n<</Linearized 1 /L %s /H [%s %s] /O %d /E %s /N %d /T %s>>\nendobj\n" % (
+            first_number,
+            _padded(length),
+            _padded(hint_offset),
+            _padded(hint_length),
+            renumbered[pages[0]],
+            _padded(first_page_end),
+            len(pages),
+            _padded(main_xref_entry),
+        )
+
+    def first_page_xref(offsets: list, main_xref: int) -> bytes:
+        return (
+            b"xref\n%d %d\n" % (first_number, size - first_number)
+            + b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+            + b"trailer\n<</Size %d /Root %d 0 R /Info %d 0 R %s /Prev %s>>\nstartxref\n0\n%%%%EOF\n"
+            % (size, renumbered[catalog], renumbered[info], file_id, _padded(main_xref))
+        )
+
+    # lay out the file without the hint stream, as the hint tables give the offsets
+    position = len(head) + len(linearization_dictionary(0, 0, 0, 0, 0))
+    position += len(first_page_xref([0] * (size - first_number), 0))
+    offsets = {}
+    for number in document:
+        offsets[number] = position
+        position += len(objects[number])
+    hint_position = position
+    for number in first_page + main:
+        offsets[number] = position
+        position += len(objects[number])
+    main_xref = position
+    first_page_end = offsets[main[0]] if main else main_xref
+
+    # page offset and shared object hint tables
+    identifiers = {number: index for index, number in enumerate(first_page + shared)}
+    page_hints = [(offsets[pages[0]], first_page_end, len(first_page), [])]
+    for page_objects, objects_used in zip(other_pages, used):
+        last = page_objects[-1]
+        page_hints.append(
+            (
+                offsets[page_objects[0]],
+                offsets[last] + len(objects[last]),
+                len(page_objects),
+                sorted(identifiers[number] for number in objects_used if number in identifiers),
+            )
+        )
+    if shared:
+        first_shared = (renumbered[shared[0]], offsets[shared[0]], len(first_page))
+    else:
+        first_shared = (0, 0, len(first_page))
+    outline_hint = None
+    if outline:
+        outline_hint = (
+            renumbered[outline[0]],
+            offsets[outline[0]],
+            len(outline),
+            sum(len(objects[number]) for number in outline),
+        )
+    hints, shared_offset, outline_offset = _hint_stream(
+        page_hints, [len(objects[number]) for number in first_page + shared], first_shared, outline_hint
+    )
+    tables = b"/S %d" % shared_offset
+    if outline_offset is not None:
+        tables += b" /O %d" % outline_offset
+    if compress:
+        hints = zlib.compress(hints)
+        hint_dictionary = b"<<%s /Filter /FlateDecode /Length %d>>" % (tables, len(hints))
+    else:
+        hint_dictionary = b"<<%s /Length %d>>" % (tables, len(hints))
+    hint_object = b"%d 0 obj\n%s\nstream\n%s\nendstream\nendobj\n" % (hint_number, hint_dictionary, hints)
+
+    # the objects after the hint stream move by its length
+    for number in first_page + main:
+        offsets[number] += len(hint_object)
+    main_xref += len(hint_object)
+    first_page_end += len(hint_object)
+    main_table = (
+        b"xref\n0 %d\n0000000000 65535 f \n" % first_number
+        + b"".join(b"%010d 00000 n \n" % offsets[number] for number in main)
+        + b"trailer\n<</Size %d %s>>\nstartxref\n%d\n%%%%EOF\n"
+        % (first_number, file_id, len(head) + len(linearization_dictionary(0, 0, 0, 0, 0)))
+    )
+    length = main_xref + len(main_table)
+    first_xref_offsets = [len(head)] + [offsets[number] for number in document] + [hint_position]
+    first_xref_offsets += [offsets[number] for number in first_page]
+    return b"".join(
+        [
+            head,
+            # the white-space before the first entry of the main table
+            linearization_dictionary(
+                length, hint_position, len(hint_object), first_page_end, main_xref + len(b"xref\n0 %d" % first_number)
+            ),
+            first_page_xref(first_xref_offsets, main_xref),
+            *(objects[number] for number in document),
+            hint_object,
+            *(objects[number] for number in first_page + main),
+            main_table,
+        ]
+    )
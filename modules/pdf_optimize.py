@@ -0,0 +1,70 @@
+"""Smaller pdf content streams.
+
+FPDF selects the font of every paragraph and resets the word spacing after every
+justified paragraph, even when they do not change. The pages are written without
+the operators which do not change the text state.
+"""
+import re
+
+
+### CONSTANTS ###
+
+
+FONT_PATTERN = re.compile(r"^BT /F\d+ [\d.]+ Tf ET$")
+WORD_SPACING_PATTERN = re.compile(r"^-?[\d.]+ Tw$")
+
+
+### FUNCTIONS ###
+
+
+def _shows_text(line: str) -> bool:
+    return " Tj" in line or " TJ" in line
+
+
+def remove_redundant_operators(lines: list) -> list:
+    """Removes the font selections and word spacings which do not change the text state.
+
+    A font selection or a word spacing is only emitted before the next line showing text,
+    and only if it differs from the one in effect.
+
+    Args:
+        lines (list): lines of a page content, as emitted by FPDF.
+
+    Returns:
+        list: the lines, without the redundant operators.
+    """
+    result = []
+    font = pending_font = None
+    spacing = pending_spacing = 0.0
+    spacing_line = "0 Tw"
+    for line in lines:
+        if FONT_PATTERN.match(line):
+            pending_font = line
+            continue
+        if WORD_SPACING_PATTERN.match(line):
+            pending_spacing, spacing_line = float(line.split()[0]), line
+            continue
+        if _shows_text(line):
+            if pending_font != font:
+                result.append(pending_font)
+                font = pending_font
+            if pending_spacing != spacing:
+                result.append(spacing_line)
+                spacing = pending_spacing
+            if " Tw " in line:
+                # sets its own word spacing (unicode fonts)
+                spacing = None
+        result.append(line)
+    return result
+
+
+def optimize_content(content: str) -> str:
+    """Makes the content of a page smaller, with the same rendering.
+
+    Args:
+        content (str): content of the page, as emitted by FPDF.
+
+    Returns:
+        str: optimized content.
+    """
+    return "\n".join(remove_redundant_operators(content.split("\n")))
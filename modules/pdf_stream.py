@@ -0,0 +1,145 @@
+"""Streaming output for FPDF, so that the memory used does not grow with the document.
+
+FPDF 1.7.2 keeps the content of every page until the document is closed, then writes
+the whole file into a string. Here the finished pages are written to the output file as
+soon as the layout moves past them, and FPDF's buffer is replaced by the file itself.
+The objects are written in the same order and with the same numbers as FPDF does, so the
+file is the same as the one FPDF would have written.
+
+The total number of pages (the alias of alias_nb_pages) is printed on pages which are
+written before the end of the layout, so it has to be known beforehand (see
+measure.count_pages); if the layout ends on another page count, the document is not
+valid and PageCountMismatch is raised when it is closed.
+"""
+import zlib
+from typing import BinaryIO
+
+from fpdf.php import sprintf, UTF8ToUTF16BE
+
+
+### CLASSES ###
+
+
+class PageCountMismatch(Exception):
+    """Raised when a streamed document does not end on the page count printed in it."""
+
+
+class FileBuffer:
+    """Stands for FPDF's output buffer: appended strings are written to a file, and its length
+    is the number of bytes written, which FPDF uses for the offsets of the objects."""
+
+    def __init__(self, file: BinaryIO) -> None:
+        self.file = file
+        self.length = 0
+
+    def __iadd__(self, string: str) -> "FileBuffer":
+        data = string.encode("latin1")
+        self.file.write(data)
+        self.length += len(data)
+        return self
+
+    def __len__(self) -> int:
+        return self.length
+
+
+class StreamingMixin:
+    """Writes the finished pages of an FPDF document to a file during the layout.
+
+    Call start_stream once the document is started, flush_pages whenever the finished
+    pages can be written (they must not be modified anymore), and close at the end.
+    The class it is mixed in gives the content of a written page (finish_page) and the
+    compression level of the streams (compress_level).
+    """
+
+    def start_stream(self, file: BinaryIO, nb_pages: int) -> None:
+        """Starts writing the document to a file.
+
+        Args:
+            file (BinaryIO): file opened for binary writing.
+            nb_pages (int): total number of pages of the document, printed instead of the alias.
+        """
+        if self.buffer:
+            raise ValueError("The document has already been written.")
+        self.buffer = FileBuffer(file)
+        self.nb_pages = nb_pages
+        self.flushed_pages = 0
+        self.header_written = False
+
+    def flush_pages(self) -> None:
+        """Writes every finished page (all but the current one) that has not been written yet."""
+        # FPDF writes to the current page while it is open, and to the buffer otherwise
+        state, self.state = self.state, 1
+        if not self.header_written:
+            self._putheader()
+        while self.flushed_pages + 1 < self.page:
+            self._putpage(self.flushed_pages + 1)
+        self.state = state
+
+    def _putheader(self) -> None:
+        # written before the first page instead of at the end of the layout
+        if not self.header_written:
+            super()._putheader()
+            self.header_written = True
+
+    def _replace_alias(self, content: str) -> str:
+        if not hasattr(self, "str_alias_nb_pages"):
+            return content
+        alias = UTF8ToUTF16BE(self.str_alias_nb_pages, False)
+        content = content.replace(alias, UTF8ToUTF16BE(str(self.nb_pages), False))
+        return content.replace(self.str_alias_nb_pages, str(self.nb_pages))
+
+    def _putpage(self, n: int) -> None:
+        """Writes a page and its content, like FPDF's _putpages, then forgets its content."""
+        if self.def_orientation == "P":
+            w_pt, h_pt = self.fw_pt, self.fh_pt
+        else:
+            w_pt, h_pt = self.fh_pt, self.fw_pt
+        self._newobj()
+        self._out("<</Type /Page")
+        self._out("/Parent 1 0 R")
+        if n in self.orientation_changes:
+            self._out(sprintf("/MediaBox [0 0 %.2f %.2f]", h_pt, w_pt))
+        self._out("/Resources 2 0 R")
+        if self.page_links and n in self.page_links:
+            annots = "/Annots ["
+            for pl in self.page_links[n]:
+                rect = sprintf("%.2f %.2f %.2f %.2f", pl[0], pl[1], pl[0] + pl[2], pl[1] - pl[3])
+                annots += "<</Type /Annot /Subtype /Link /Rect [" + rect + "] /Border [0 0 0] "
+                if isinstance(pl[4], str):
+                    annots += "/A <</S /URI /URI " + self._textstring(pl[4]) + ">>>>"
+                else:
+                    link = self.links[pl[4]]
+                    h = w_pt if link[0] in self.orientation_changes else h_pt
+                    annots += sprintf("/Dest [%d 0 R /XYZ 0 %.2f null]>>", 1 + 2 * link[0], h - link[1] * self.k)
+            self._out(annots + "]")
+        if self.pdf_version > "1.3":
+            self._out("/Group <</Type /Group /S /Transparency /CS /DeviceRGB>>")
+        self._out("/Contents " + str(self.n + 1) + " 0 R>>")
+        self._out("endobj")
+        content = self._replace_alias(self.finish_page(self.pages.pop(n)))
+        if self.compress:
+            content = zlib.compress(content.encode("latin1"), self.compress_level)
+            filter = "/Filter /FlateDecode "
+        else:
+            filter = ""
+        self._newobj()
+        self._out("<<" + filter + "/Length " + str(len(content)) + ">>")
+        self._putstream(content)
+        self._out("endobj")
+        self.flushed_pages = n
+
+    def _putpages(self) -> None:
+        if self.page != self.nb_pages:
+            raise PageCountMismatch(f"The document has {self.page} page(s), but {self.nb_pages} were printed.")
+        self.flush_pages()
+        self._putpage(self.page)
+        # pages root, as written by FPDF
+        w_pt, h_pt = (self.fw_pt, self.fh_pt) if self.def_orientation == "P" else (self.fh_pt, self.fw_pt)
+        self.offsets[1] = len(self.buffer)
+        self._out("1 0 obj")
+        self._out("<</Type /Pages")
+        self._out("/Kids [" + "".join(str(3 + 2 * i) + " 0 R " for i in range(self.page)) + "]")
+        self._out("/Count " + str(self.page))
+        self._out(sprintf("/MediaBox [0 0 %.2f %.2f]", w_pt, h_pt))
+        self._out(">>")
+        self._out("endobj")
@@ -1,4 +1,21 @@
-from typing import Union
+import sys
+from typing import Iterator, Union
+
+try:
+    from modules.comments import strip_comments
+except ModuleNotFoundError:
+    from comments import strip_comments
+
+
+### CONSTANTS ###
+
+
+# type tags of the elements of a scene, also naming the methods that lay them out (add_<kind>)
+ACTION = "action"
+DIALOG = "dialog"
+DIR = "dir"
+SUMMARY = "summary"
+TRANSITION = "transition"
 
 
 ### FUNCTIONS ###
@@ -16,22 +33,36 @@ def remove_multiple_spaces(string: str) -> str:
     return "\n".join(" ".join(line.split()) for line in string.splitlines())
 
 
+def normalize_name(name: str) -> str:
+    """Normalizes the name of a character, as printed in the pdf.
+
+    Args:
+        name (str): name of the character.
+
+    Returns:
+        str: name in upper case, with single spaces.
+    """
+    return " ".join(name.split()).upper()
+
+
 ### CLASSES ###
 
 class Dir:
     """Object that represents directions elements."""
 
+    __slots__ = ("text",)
+    kind = DIR
+
     def __init__(self, text: str) -> None:
         self.text = text
-        self.pos = None
-
-    def set_pos(self, pos: int) -> None:
-        self.pos = pos
 
 
 class Transition:
     """Object that represents a transition."""
 
+    __slots__ = ("text",)
+    kind = TRANSITION
+
     def __init__(self, text: str) -> None:
         self.text = text
 
@@ -39,6 +70,9 @@ class Transition:
 class Summary:
     """Object that represents a summary."""
 
+    __slots__ = ("text",)
+    kind = SUMMARY
+
     def __init__(self, text: str) -> None:
         self.text = text
 
@@ -46,106 +80,112 @@ class Summary:
 class Character:
     """Object that represents a character."""
 
+    __slots__ = ("name", "actor")
+
     def __init__(self, name: str, actor: str = "") -> None:
-        self.name = name
+        self.name = sys.intern(name)
         self.actor = actor
 
 
-class Action:
-    """Object that represents an action."""
+class CharacterEntry:
+    """Entry of the character index: where a character speaks, and how much."""
+
+    __slots__ = ("name", "scenes", "dialogs", "lines", "words")
 
-    def _remove_comments(self, text: str) -> tuple:
-        """Remove the comments from the text.
+    def __init__(self, name: str) -> None:
+        """Initializes the entry.
 
         Args:
-            text (str): text with comments.
+            name (str): normalized name of the character.
+        """
+        self.name = name
+        self.scenes = []  # indices of the scenes, in order
+        self.dialogs = []  # (scene index, position of the dialog in the scene's elements)
+        self.lines = 0  # lines of the speeches in the source (see stats for the printed lines)
+        self.words = 0
 
-        Returns:
-            tuple: (str) text without comments, (list) (start,end) indices of comments.
+    def add_dialog(self, scene_index: int, position: int, dialog) -> None:
+        """Records a dialog of the character.
+
+        Args:
+            scene_index (int): index of the scene in the screenplay.
+            position (int): position of the dialog in the scene's elements.
+            dialog (Dialog): the dialog.
         """
-        no_comments = ""
-        indices = []
-        inside = False
-        for pos, char in enumerate(text):
-            if char == "<":
-                inside = True
-                start = pos
-            elif inside and char == ">":
-                inside = False
-                end = pos
-                indices.append((start, end))
-            else:
-                if not inside:
-                    no_comments += char
-        return remove_multiple_spaces(no_comments), indices
+        if not self.scenes or self.scenes[-1] != scene_index:
+            self.scenes.append(scene_index)
+        self.dialogs.append((scene_index, position))
+        self.lines += len(dialog.text.splitlines())
+        self.words += len(dialog.text.split())
 
-    def __init__(self, text: str) -> None:
-        self.pos = None
-        self.text_with_comments = text
-        self.text_without_comments, self.comments_pos = self._remove_comments(text)
 
-    def set_pos(self, pos: int) -> None:
-        """Sets the position of the action in the scene.
+class Action:
+    """Object that represents an action."""
+
+    __slots__ = ("text_with_comments", "comments_pos", "text_without_comments")
+    kind = ACTION
+
+    def __init__(self, text: str, text_without_comments: str = None) -> None:
+        """Initializes the action.
 
         Args:
-            pos (int): position in the scene.
+            text (str): text of the action, with comments.
+            text_without_comments (str, optional): text already stripped by the lexer, used when
+            comments cross the action's boundaries. Defaults to None (computed from text).
         """
-        self.pos = pos
+        self.text_with_comments = text
+        stripped, self.comments_pos = strip_comments(text)
+        if text_without_comments is None:
+            text_without_comments = stripped
+        self.text_without_comments = remove_multiple_spaces(text_without_comments)
 
 
 class Dialog:
     """Object that represents a dialog."""
 
+    __slots__ = ("speaker", "text", "direction")
+    kind = DIALOG
+
     def __init__(self, speaker: Character, text: str, direction: str = "") -> None:
-        self.pos = None
         self.speaker = speaker
         self.text = text
         self.direction = direction
 
-    def set_pos(self, pos: int) -> None:
-        """Sets the position of the dialog in the scene.
 
-        Args:
-            pos (int): position in the scene.
-        """
-        self.pos = pos
+class Scene:
+    """Object that represents a scene.
 
+    The actions, dialogs and directions are kept in a single list, in the order of the
+    screenplay; the summary always comes first and the transition last.
+    """
 
-class Scene:
-    """Object that represents a scene."""
+    __slots__ = ("value", "location", "time", "line", "elements", "summary", "transition")
 
-    def __init__(self, value: str, location: str, time: str) -> None:
+    def __init__(self, value: str, location: str, time: str, line: int = 0) -> None:
         """Initializes the scene.
 
         Args:
             value (str): INT or EXT.
             location (str): where the scene takes place.
             time (str): when the scene takes place (DAY, NIGHT, ...).
+            line (int): line of the scene header in the source (starting at 1). Defaults to 0 (unknown).
         """
         self.value = value.upper()
         self.location = location
         self.time = time
-        self.actions = []
-        self.dirs = []
-        self.dialogs = []
+        self.line = line
+        self.elements = []
         self.transition = ""
         self.summary = ""
-        self.pos = 0
 
     def add_action(self, action: Action) -> None:
-        action.set_pos(self.pos)
-        self.pos += 1
-        self.actions.append(action)
+        self.elements.append(action)
 
     def add_dialog(self, dialog: Dialog) -> None:
-        dialog.set_pos(self.pos)
-        self.pos += 1
-        self.dialogs.append(dialog)
+        self.elements.append(dialog)
 
     def add_dir(self, dir: Dir) -> None:
-        dir.set_pos(self.pos)
-        self.pos += 1
-        self.dirs.append(dir)
+        self.elements.append(dir)
 
     def set_transition(self, transition: Transition) -> None:
         self.transition = transition
@@ -153,31 +193,59 @@ class Scene:
     def set_summary(self, summary: Summary) -> None:
         self.summary = summary
 
+    def _of_kind(self, kind: str) -> list:
+        return [element for element in self.elements if element.kind == kind]
+
+    @property
+    def actions(self) -> list:
+        return self._of_kind(ACTION)
+
+    @property
+    def dialogs(self) -> list:
+        return self._of_kind(DIALOG)
+
+    @property
+    def dirs(self) -> list:
+        return self._of_kind(DIR)
+
+    def iter_elements(self) -> Iterator:
+        """Iterates over all elements by order, without building a list.
+
+        Yields:
+            the summary, the actions, dialogs and directions, then the transition.
+        """
+        if self.summary:
+            yield self.summary
+        yield from self.elements
+        if self.transition:
+            yield self.transition
+
     def get_elements(self) -> list:
         """Returns all elements by order
 
         Returns:
             list: ordered list of all elements.
         """
-        res = [None for _ in range(self.pos)]
-        for action in self.actions:
-            res[action.pos] = action
-        for dialog in self.dialogs:
-            res[dialog.pos] = dialog
-        for dir in self.dirs:
-            res[dir.pos] = dir
-        if self.summary:
-            res = [self.summary] + res
-        if self.transition:
-            res += [self.transition]
-        return res
+        return list(self.iter_elements())
 
 
 class Screenplay:
     """General object to represent a screenplay."""
 
+    __slots__ = (
+        "title",
+        "authors",
+        "director",
+        "date",
+        "production",
+        "other",
+        "scenes",
+        "index",
+        "scene_numbers",
+    )
+
     def __init__(
-        self, title: str, authors: Union[list, str], director: str, date: str, production: str, other: dict = {}
+        self, title: str, authors: Union[list, str], director: str, date: str, production: str, other: dict = None
     ) -> None:
         """Initializes the screenplay.
 
@@ -187,8 +255,8 @@ class Screenplay:
             director: name of the director.
             date (str): creation date (format dd/MM/yyy).
             production (str): production name.
-            other (dict): other informations that might be usefull
-            . Defaults to {}.
+            other (dict, optional): other informations that might be usefull
+            . Defaults to None (none).
         """
         self.title = title
         if type(authors) is list:
@@ -198,8 +266,79 @@ class Screenplay:
         self.director = director
         self.date = date
         self.production = production
-        self.other = other
+        self.other = other if other is not None else {}
         self.scenes = []
+        self.index = {}  # normalized name -> CharacterEntry
+        self.scene_numbers = None  # numbers printed in the scene headers, if not 1, 2, 3...
 
     def add_scene(self, scene: Scene) -> None:
+        scene_index = len(self.scenes)
+        for position, element in enumerate(scene.elements):
+            if element.kind == DIALOG:
+                name = normalize_name(element.speaker.name)
+                entry = self.index.get(name)
+                if entry is None:
+                    entry = self.index[name] = CharacterEntry(name)
+                entry.add_dialog(scene_index, position, element)
         self.scenes.append(scene)
+
+    def find_character(self, name: str) -> CharacterEntry:
+        """Looks a character up in the index.
+
+        Args:
+            name (str): name of the character, in any case.
+
+        Returns:
+            CharacterEntry: the character's entry, or None if the character never speaks.
+        """
+        return self.index.get(normalize_name(name))
+
+    def get_scene_numbers(self) -> list:
+        """Returns the number printed in the header of each scene."""
+        if self.scene_numbers is None:
+            return list(range(1, len(self.scenes) + 1))
+        return self.scene_numbers
+
+    def get_sides(self, name: str) -> "Screenplay":
+        """Extracts the sides of a character: only the scenes where the character speaks,
+        with their original numbers.
+
+        Args:
+            name (str): name of the character, in any case.
+
+        Raises:
+            KeyError: if the character never speaks.
+
+        Returns:
+            Screenplay: the sides.
+        """
+        entry = self.find_character(name)
+        if entry is None:
+            raise KeyError(name)
+        return self._extract(entry.scenes, dict(self.other, sides=entry.name))
+
+    def get_selection(self, numbers: list) -> "Screenplay":
+        """Extracts the scenes of the given numbers, keeping their numbers.
+
+        Args:
+            numbers (list): numbers of the scenes, in order.
+
+        Raises:
+            ValueError: if a scene does not exist.
+
+        Returns:
+            Screenplay: the selected scenes.
+        """
+        positions = {scene_nb: scene_index for scene_index, scene_nb in enumerate(self.get_scene_numbers())}
+        missing = [scene_nb for scene_nb in numbers if scene_nb not in positions]
+        if missing:
+            raise ValueError(f"Scene(s) {', '.join(map(str, missing))} not found, the screenplay has {len(self.scenes)} scene(s).")
+        return self._extract([positions[scene_nb] for scene_nb in numbers], self.other)
+
+    def _extract(self, scene_indices: list, other: dict) -> "Screenplay":
+        numbers = self.get_scene_numbers()
+        extract = Screenplay(self.title, self.authors, self.director, self.date, self.production, other)
+        for scene_index in scene_indices:
+            extract.add_scene(self.scenes[scene_index])
+        extract.scene_numbers = [numbers[scene_index] for scene_index in scene_indices]
+        return extract
@@ -0,0 +1,342 @@
+"""Long-running render server, so that a front end does not pay for a process spawn and the
+fpdf import on every render.
+
+The server speaks HTTP/1.1, over TCP or a Unix socket:
+
++ POST /render: JSON body {"metadata": {...}, "screenplay": "...", "project": "..."}, answered
+  with the pdf (the optional project name only routes the renders of a project to the same worker);
++ GET /metrics: queue depth, latencies and caches of the renders, as JSON;
++ GET /health: "ok".
+
+The renders are dispatched to worker processes started once, with fpdf already imported, which
+keep the parsed projects and the layouts of the scenes of their last renders in memory. When
+too many renders are pending, new requests are rejected with 503 instead of queuing without bound.
+"""
+import asyncio
+import hashlib
+import io
+import json
+import logging as lg
+import os
+import time
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+
+try:
+    from modules.backend import get_backend
+    from modules.layout_cache import DEFAULT_MAX_ENTRIES, LayoutCache
+    from modules.source_file import split_source
+except ModuleNotFoundError:
+    from backend import get_backend
+    from layout_cache import DEFAULT_MAX_ENTRIES, LayoutCache
+    from source_file import split_source
+
+
+### CONSTANTS ###
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_PENDING = 32  # renders queued or running, above which the requests are rejected
+DEFAULT_MAX_PROJECTS = 16  # parsed projects kept in memory by each worker
+DEFAULT_MAX_BODY_SIZE = 16 * 1024 * 1024  # bytes of a request body, above which it is rejected
+
+LATENCY_SAMPLES = 1024  # latest renders used for the latency percentiles
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+JSON_TYPE = "application/json"
+PDF_TYPE = "application/pdf"
+
+
+### FUNCTIONS ###
+
+
+# state of a worker process, set by _init_worker
+_worker = {}
+
+
+def _init_worker(parse: Callable, max_projects: int, max_layouts: int) -> None:
+    """Prepares a worker process: imports fpdf and creates its in-memory caches."""
+    get_backend("pdf")
+    _worker.update(
+        parse=parse,
+        projects=OrderedDict(),
+        max_projects=max_projects,
+        cache=LayoutCache(max_entries=max_layouts),
+    )
+
+
+def _render(key: str, metadata: dict, text: str) -> tuple:
+    """Renders a project to pdf bytes (run in a worker process).
+
+    Args:
+        key (str): digest of the metadata and the screenplay, for the cache of parsed projects.
+        metadata (dict): metadata of the project.
+        text (str): content of the screenplay file.
+
+    Returns:
+        tuple: (bytes) the pdf, (dict) statistics of the render.
+    """
+    start = time.perf_counter()
+    projects = _worker["projects"]
+    screenplay = projects.get(key)
+    parsed = screenplay is None
+    if parsed:
+        screenplay = _worker["parse"](metadata, split_source(text))
+        projects[key] = screenplay
+        if len(projects) > _worker["max_projects"]:
+            projects.popitem(last=False)
+    else:
+        projects.move_to_end(key)
+    cache = _worker["cache"]
+    hits, misses = cache.hits, cache.misses
+    stream = io.BytesIO()
+    pdf = get_backend("pdf")().write(screenplay, stream, cache)
+    return stream.getvalue(), {
+        "pages": pdf.page,
+        "parsed": parsed,
+        "layout_cache_hits": cache.hits - hits,
+        "layout_cache_misses": cache.misses - misses,
+        "seconds": round(time.perf_counter() - start, 6),
+        "pid": os.getpid(),
+    }
+
+
+def _percentile(values: list, fraction: float) -> float:
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+### CLASSES ###
+
+
+class ServerBusy(Exception):
+    """Raised when a render is requested while the maximum number of renders are pending."""
+
+
+class RenderServer:
+    """Serves renders over HTTP, from a bounded pool of warm worker processes."""
+
+    def __init__(
+        self,
+        parse: Callable,
+        workers: int = 1,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        max_projects: int = DEFAULT_MAX_PROJECTS,
+        max_layouts: int = DEFAULT_MAX_ENTRIES,
+        max_body_size: int = DEFAULT_MAX_BODY_SIZE,
+    ) -> None:
+        """Initializes the server and starts its workers.
+
+        Args:
+            parse (Callable): picklable function parsing the metadata and the lines of a screenplay
+            to a Screenplay (see doc_to_screenplay).
+            workers (int): number of worker processes. Defaults to 1.
+            max_pending (int): renders queued or running, above which the requests are rejected.
+            Defaults to DEFAULT_MAX_PENDING.
+            max_projects (int): parsed projects kept in memory by each worker. Defaults to DEFAULT_MAX_PROJECTS.
+            max_layouts (int): layouts of scenes kept in memory by each worker. Defaults to DEFAULT_MAX_ENTRIES.
+            max_body_size (int): bytes of a request body, above which the request is rejected with 413
+            before it is read. Defaults to DEFAULT_MAX_BODY_SIZE.
+        """
+        self.worker_args = (parse, max_projects, max_layouts)
+        # one process per executor, so that the renders of a project always go to the same caches
+        self.executors = [self._start_worker() for _ in range(max(1, workers))]
+        self.pending = [0] * len(self.executors)
+        self.max_pending = max_pending
+        self.max_body_size = max_body_size
+        self.started = time.time()
+        self.counters = {"requests": 0, "rendered": 0, "failed": 0, "rejected": 0, "parsed": 0, "pages": 0}
+        self.counters.update(layout_cache_hits=0, layout_cache_misses=0)
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def _start_worker(self) -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=self.worker_args)
+        # start the process now rather than on the first request
+        executor.submit(os.getpid).result()
+        return executor
+
+    async def render(self, metadata: dict, text: str, project: str = None) -> tuple:
+        """Renders a project in a worker.
+
+        Args:
+            metadata (dict): metadata of the project.
+            text (str): content of the screenplay file.
+            project (str, optional): name routing the project to a worker. Defaults to None (the
+            name in the metadata).
+
+        Raises:
+            ServerBusy: if the maximum number of renders are pending.
+
+        Returns:
+            tuple: (bytes) the pdf, (dict) statistics of the render.
+        """
+        if sum(self.pending) >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise ServerBusy(f"{self.max_pending} render(s) already pending.")
+        project = project or str(metadata.get("name", ""))
+        index = zlib.crc32(project.encode("utf-8")) % len(self.executors)
+        source = json.dumps(metadata, sort_keys=True) + "\0" + text
+        key = hashlib.sha1(source.encode("utf-8")).hexdigest()
+        start = time.perf_counter()
+        executor = self.executors[index]
+        self.pending[index] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            data, stats = await loop.run_in_executor(executor, _render, key, metadata, text)
+        except BrokenProcessPool:
+            self.counters["failed"] += 1
+            # the other renders pending on the dead worker fail too, but it is replaced once
+            if self.executors[index] is executor:
+                lg.error(f"Worker {index} died, starting a new one.")
+                self.executors[index] = self._start_worker()
+            raise
+        except Exception:
+            self.counters["failed"] += 1
+            raise
+        finally:
+            self.pending[index] -= 1
+        self.latencies.append(time.perf_counter() - start)
+        self.counters["rendered"] += 1
+        self.counters["parsed"] += stats["parsed"]
+        self.counters["pages"] += stats["pages"]
+        self.counters["layout_cache_hits"] += stats["layout_cache_hits"]
+        self.counters["layout_cache_misses"] += stats["layout_cache_misses"]
+        return data, stats
+
+    def get_metrics(self) -> dict:
+        """Returns the state of the queue, the latencies of the latest renders, and the counters.
+
+        Returns:
+            dict: metrics, durations being in milliseconds.
+        """
+        latencies = sorted(self.latencies)
+        metrics = {
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "workers": len(self.executors),
+            "in_flight": sum(self.pending),
+            # renders waiting for their worker, which runs one render at a time
+            "queue_depth": sum(max(0, pending - 1) for pending in self.pending),
+            "max_pending": self.max_pending,
+            **self.counters,
+        }
+        if latencies:
+            metrics["latency_ms"] = {
+                "samples": len(latencies),
+                "mean": round(sum(latencies) / len(latencies) * 1000, 3),
+                "p50": round(_percentile(latencies, 0.5) * 1000, 3),
+                "p90": round(_percentile(latencies, 0.9) * 1000, 3),
+                "p99": round(_percentile(latencies, 0.99) * 1000, 3),
+                "max": round(latencies[-1] * 1000, 3),
+            }
+        return metrics
+
+    async def _respond(self, reader: asyncio.StreamReader) -> tuple:
+        """Reads a request and handles it.
+
+        Returns:
+            tuple: (int) status, (str) content type, (bytes) body, (dict) extra headers.
+        """
+        try:
+            method, target, _ = (await reader.readline()).decode("latin1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            return 400, JSON_TYPE, b'{"error": "Malformed request."}', {}
+        # checked before reading the body, which is read in memory at once
+        if length < 0:
+            return 400, JSON_TYPE, b'{"error": "Invalid Content-Length."}', {}
+        if length > self.max_body_size:
+            return 413, JSON_TYPE, b'{"error": "Request too large."}', {}
+        body = await reader.readexactly(length)
+        path = target.split("?", 1)[0]
+        if path in ("/metrics", "/health"):
+            if method != "GET":
+                return 405, JSON_TYPE, b'{"error": "Use GET."}', {}
+            if path == "/health":
+                return 200, "text/plain", b"ok", {}
+            return 200, JSON_TYPE, json.dumps(self.get_metrics()).encode("utf-8"), {}
+        if path != "/render":
+            return 404, JSON_TYPE, b'{"error": "Not found."}', {}
+        if method != "POST":
+            return 405, JSON_TYPE, b'{"error": "Use POST."}', {}
+        self.counters["requests"] += 1
+        try:
+            request = json.loads(body)
+            metadata, text = request["metadata"], request["screenplay"]
+            if not isinstance(metadata, dict) or not isinstance(text, str):
+                raise TypeError("'metadata' must be an object and 'screenplay' a string.")
+        except (ValueError, KeyError, TypeError) as ex:
+            error = f"Invalid request: {ex.__class__.__name__}: {ex}"
+            return 400, JSON_TYPE, json.dumps({"error": error}).encode("utf-8"), {}
+        try:
+            data, stats = await self.render(metadata, text, request.get("project"))
+        except ServerBusy as ex:
+            return 503, JSON_TYPE, json.dumps({"error": str(ex)}).encode("utf-8"), {"Retry-After": "1"}
+        except (KeyError, ValueError, TypeError) as ex:
+            # the project itself is not valid (missing metadata...)
+            error = f"Invalid project: {ex.__class__.__name__}: {ex}"
+            return 400, JSON_TYPE, json.dumps({"error": error}).encode("utf-8"), {}
+        except Exception as ex:
+            lg.exception("Render failed.")
+            error = f"Render failed: {ex.__class__.__name__}: {ex}"
+            return 500, JSON_TYPE, json.dumps({"error": error}).encode("utf-8"), {}
+        extra = {"X-Pages": str(stats["pages"]), "X-Render-Seconds": str(stats["seconds"])}
+        return 200, PDF_TYPE, data, extra
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answers one request per connection."""
+        try:
+            status, content_type, body, extra = await self._respond(reader)
+            head = [
+                f"HTTP/1.1 {status} {REASONS[status]}",
+                f"Content-Type: {content_type}",
+                f"Content-Length: {len(body)}",
+                "Connection: close",
+            ]
+            head += [f"{name}: {value}" for name, value in extra.items()]
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin1") + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, socket_path: str = None) -> None:
+        """Serves requests until cancelled.
+
+        Args:
+            host (str): address to listen on. Defaults to DEFAULT_HOST.
+            port (int): port to listen on. Defaults to DEFAULT_PORT.
+            socket_path (str, optional): path to a Unix socket to listen on instead. Defaults to None.
+        """
+        if socket_path:
+            server = await asyncio.start_unix_server(self.handle, path=socket_path)
+            lg.info(f"Serving on '{socket_path}' with {len(self.executors)} worker(s)...")
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            lg.info(f"Serving on http://{host}:{port} with {len(self.executors)} worker(s)...")
+        async with server:
+            await server.serve_forever()
+
+    def close(self) -> None:
+        """Stops the workers."""
+        for executor in self.executors:
+            executor.shutdown(cancel_futures=True)
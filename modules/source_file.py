@@ -0,0 +1,84 @@
+"""Reading of the source files, memory-mapped so that huge files are not copied.
+
+The file is mapped instead of being read, and the parser is given its lines one at a
+time: the lines are decoded straight from the mapped bytes, a block at a time, when the
+parser reaches them. The file is never read nor held as a whole, the lines already parsed
+are not kept, and the lines after the end marker are not decoded at all.
+"""
+import mmap
+import os
+from pathlib import Path
+from typing import Iterator
+
+
+### CONSTANTS ###
+
+
+# bytes decoded at once, each block ending at a line break
+BLOCK_SIZE = 1 << 20
+
+
+### FUNCTIONS ###
+
+
+def split_source(text: str) -> list:
+    """Splits the content of a source file into lines, as a file opened in text mode would do.
+
+    Args:
+        text (str): content of the source file (or whole lines of it).
+
+    Returns:
+        list: the lines, without their line break.
+    """
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    lines = text.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    return lines
+
+
+### CLASSES ###
+
+
+class SourceLines:
+    """Lines of a source file, decoded lazily from a memory map.
+
+    The lines are split as a file opened in text mode would do (on \\n, \\r\\n and \\r), and
+    are given without their line break, including the last one when the file does not end
+    with a line break.
+    """
+
+    def __init__(self, path: Path, encoding: str = "utf-8") -> None:
+        """Initializes the lines, without reading the file.
+
+        Args:
+            path (Path): path to the source file.
+            encoding (str): encoding of the file. Defaults to "utf-8".
+        """
+        self.path = Path(path)
+        self.encoding = encoding
+        # number of lines given by the last iteration
+        self.count = 0
+
+    def __iter__(self) -> Iterator[str]:
+        self.count = 0
+        with open(str(self.path), mode="rb") as source_file:
+            size = os.fstat(source_file.fileno()).st_size
+            if not size:
+                # an empty file cannot be mapped
+                return
+            with mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ) as data, memoryview(data) as view:
+                start = 0
+                while start < size:
+                    # a block of whole lines, so that a character or a \r\n is never cut
+                    end = data.rfind(b"\n", start, start + BLOCK_SIZE) + 1
+                    if not end:
+                        # a line longer than a block, or the last line
+                        end = data.find(b"\n", start) + 1 or size
+                    # decoded from the mapped bytes, without copying them first
+                    block = str(view[start:end], self.encoding)
+                    start = end
+                    for line in split_source(block):
+                        self.count += 1
+                        yield line
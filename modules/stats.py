@@ -0,0 +1,184 @@
+"""Length and screen time of the scenes and characters, from the layout model (never imports fpdf).
+
+The length of a scene is the height it covers on the pages of the pdf, in eighths of a
+page, and its screen time follows the rule of one page per minute. The screen time of a
+character is the height of the character's dialogs.
+"""
+import csv
+from typing import TextIO
+
+try:
+    from modules.screenplay import *
+    from modules import measure
+except ModuleNotFoundError:
+    from screenplay import *
+    import measure
+
+
+### CONSTANTS ###
+
+
+# state of the pdf at the top of the first page after the cover (the fonts do not move anything)
+BODY_TOP = measure.TOP_MARGIN + measure.HEADER_LINE_FEED
+BODY_START = (2, measure.LEFT_MARGIN, BODY_TOP, measure.FONT_FAMILY, "", 12, 0, (), "")
+BODY_HEIGHT = measure.PAGE_BREAK_TRIGGER - BODY_TOP
+EIGHTHS_PER_PAGE = 8
+SECONDS_PER_PAGE = 60
+
+SCENE_FIELDS = ("scene", "header", "page", "eighths", "length", "action_lines", "dialog_lines", "seconds")
+CHARACTER_FIELDS = ("character", "scenes", "dialogs", "dialog_lines", "words", "seconds")
+
+
+### FUNCTIONS ###
+
+
+def _offset(page: int, y: float) -> float:
+    """Height of the body from the top of the first page to a position on a page (mm)."""
+    return (page - BODY_START[0]) * BODY_HEIGHT + y - BODY_TOP
+
+
+def _seconds(height: float) -> float:
+    return round(height / BODY_HEIGHT * SECONDS_PER_PAGE, 1)
+
+
+def format_eighths(eighths: int) -> str:
+    """Formats a length the way a breakdown does, like "1 3/8".
+
+    Args:
+        eighths (int): length in eighths of a page.
+
+    Returns:
+        str: whole pages and eighths.
+    """
+    pages, rest = divmod(eighths, EIGHTHS_PER_PAGE)
+    if not rest:
+        return str(pages)
+    return f"{pages} {rest}/8" if pages else f"{rest}/8"
+
+
+def count_lines(element) -> int:
+    """Counts the printed lines of an element, as the pdf breaks them.
+
+    Args:
+        element: element of a scene (Action, Dialog...).
+
+    Returns:
+        int: number of lines, without the name of the speaker of a dialog.
+    """
+    body_width = measure.PAGE_WIDTH - measure.RIGHT_MARGIN - measure.LEFT_MARGIN
+    if element.kind == DIALOG:
+        lines = len(measure.split_lines(element.text, measure.DIALOG_WIDTH, 12))
+        if element.direction:
+            lines += len(measure.split_lines(f"({element.direction})", measure.DIALOG_WIDTH, 10))
+        return lines
+    if element.kind == TRANSITION:
+        return len(measure.split_lines(element.text.upper(), measure.TRANSITION_WIDTH, 12))
+    text = element.text_without_comments if element.kind == ACTION else element.text
+    return len(measure.split_lines(text, body_width, 12))
+
+
+def _add_element(model: measure.LayoutModel, element) -> tuple:
+    """Follows an element with the layout model.
+
+    Args:
+        model (LayoutModel): model of the pdf, before the element.
+        element: element of a scene (Action, Dialog...).
+
+    Returns:
+        tuple: (int) printed lines of the element (see count_lines), (float) height it covers (mm).
+    """
+    before = _offset(model.page, model.y)
+    getattr(model, f"add_{element.kind}")(element)
+    return count_lines(element), _offset(model.page, model.y) - before
+
+
+def compute_stats(screenplay: Screenplay) -> dict:
+    """Measures every scene and character of a screenplay in a single pass.
+
+    The characters are the ones of the character index of the screenplay, their dialogs being
+    measured along with the scenes.
+
+    Args:
+        screenplay (Screenplay): the screenplay.
+
+    Returns:
+        dict: total pages, eighths and seconds, and the stats of each scene and character
+        (see SCENE_FIELDS and CHARACTER_FIELDS).
+    """
+    model = measure.LayoutModel(BODY_START)
+    dialogs = {}  # (scene index, position of the dialog in the scene's elements) -> (lines, height)
+    scenes = []
+    for scene_index, (scene_nb, scene) in enumerate(zip(screenplay.get_scene_numbers(), screenplay.scenes)):
+        # the header goes to the next page when it does not fit at the bottom of the current one
+        page, y = measure.scene_header_position(model.get_layout_state())
+        start = _offset(page, y)
+        model.add_scene_header()
+        action_lines = dialog_lines = 0
+        if scene.summary:
+            _add_element(model, scene.summary)
+        for position, element in enumerate(scene.elements):
+            lines, height = _add_element(model, element)
+            if element.kind == DIALOG:
+                dialog_lines += lines
+                dialogs[scene_index, position] = (lines, height)
+            elif element.kind == ACTION:
+                action_lines += lines
+        if scene.transition:
+            _add_element(model, scene.transition)
+        height = _offset(model.page, model.y) - start
+        eighths = max(1, round(height / BODY_HEIGHT * EIGHTHS_PER_PAGE))
+        scenes.append(
+            {
+                "scene": scene_nb,
+                "header": f"{scene.value.upper()}. {scene.location}. {scene.time.upper()}",
+                "page": page,
+                "eighths": eighths,
+                "length": format_eighths(eighths),
+                "action_lines": action_lines,
+                "dialog_lines": dialog_lines,
+                "seconds": _seconds(height),
+            }
+        )
+    characters = []
+    for entry in screenplay.index.values():
+        measured = [dialogs[key] for key in entry.dialogs]
+        height = sum(dialog_height for _, dialog_height in measured)
+        characters.append(
+            (
+                height,
+                {
+                    "character": entry.name,
+                    "scenes": len(entry.scenes),
+                    "dialogs": len(entry.dialogs),
+                    "dialog_lines": sum(lines for lines, _ in measured),
+                    "words": entry.words,
+                    "seconds": _seconds(height),
+                },
+            )
+        )
+    height = _offset(model.page, model.y)
+    model.add_the_end()
+    return {
+        "title": screenplay.title,
+        "pages": model.page,
+        "eighths": sum(scene["eighths"] for scene in scenes),
+        "seconds": _seconds(height),
+        "scenes": scenes,
+        # the characters who speak the most first
+        "characters": [character for _, character in sorted(characters, key=lambda item: -item[0])],
+    }
+
+
+def write_csv(stats: dict, output: TextIO) -> None:
+    """Writes the stats as CSV: the table of the scenes, a blank line, then the table of the characters.
+
+    Args:
+        stats (dict): stats returned by compute_stats.
+        output (TextIO): text file to write to (opened with newline="").
+    """
+    writer = csv.writer(output)
+    writer.writerow(SCENE_FIELDS)
+    writer.writerows([scene[field] for field in SCENE_FIELDS] for scene in stats["scenes"])
+    writer.writerow([])
+    writer.writerow(CHARACTER_FIELDS)
+    writer.writerows([character[field] for field in CHARACTER_FIELDS] for character in stats["characters"])
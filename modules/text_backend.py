@@ -0,0 +1,176 @@
+"""Plain-text rendering of a screenplay, to proofread it without producing a pdf.
+
+The text keeps the columns of the pdf (centered speakers, dialogs in the middle column,
+right-aligned transitions, numbered scenes), and its lines are broken where the pdf's are.
+"""
+import os
+import sys
+from pathlib import Path
+
+try:
+    from modules.screenplay import *
+    from modules.backend import Backend, register_backend, render_scene, temporary_path
+    from modules.instrumentation import optional_stage
+    from modules import measure
+except ModuleNotFoundError:
+    from screenplay import *
+    from backend import Backend, register_backend, render_scene, temporary_path
+    from instrumentation import optional_stage
+    import measure
+
+
+### CONSTANTS ###
+
+
+FONT_SIZE = 12
+# width of a Courier character in the body, in millimeters
+CHARACTER_WIDTH = measure.COURIER_WIDTH / 1000 * FONT_SIZE / measure.SCALE
+
+BODY_WIDTH = measure.PAGE_WIDTH - measure.LEFT_MARGIN - measure.RIGHT_MARGIN
+BODY_COLUMNS = measure.line_capacity(BODY_WIDTH, FONT_SIZE)
+SCENE_NUMBER_COLUMNS = round(10 / CHARACTER_WIDTH)
+DIALOG_OFFSET_COLUMNS = round(measure.DIALOG_OFFSET / CHARACTER_WIDTH)
+DIALOG_COLUMNS = measure.line_capacity(measure.DIALOG_WIDTH, FONT_SIZE)
+TRANSITION_OFFSET_COLUMNS = round(measure.TRANSITION_OFFSET / CHARACTER_WIDTH)
+TRANSITION_COLUMNS = measure.line_capacity(measure.TRANSITION_WIDTH, FONT_SIZE)
+
+# ANSI styles, used when writing to a terminal
+BOLD = "\033[1m"
+ITALIC = "\033[3m"
+RESET = "\033[0m"
+
+STDOUT_PATH = "-"
+
+
+### CLASSES ###
+
+
+class TextLayout:
+    """Lays out a screenplay as lines of text, with the same methods as the PDF class."""
+
+    def __init__(self, screenplay: Screenplay, styled: bool = False) -> None:
+        """Initializes the layout.
+
+        Args:
+            screenplay (Screenplay): screenplay to lay out.
+            styled (bool): whether to use ANSI bold and italic, for a terminal. Defaults to False.
+        """
+        self.screenplay = screenplay
+        self.styled = styled
+        self.lines = []
+        self.previous_speaker = ""
+
+    def _style(self, line: str, style: str) -> str:
+        if not self.styled or not line.strip():
+            return line
+        return f"{style}{line}{RESET}"
+
+    def _skip(self, space: float) -> None:
+        """Adds the blank lines of a vertical space of the pdf (mm)."""
+        self.lines += [""] * int(space // measure.LINE_HEIGHT)
+
+    def _wrap(self, text: str, width: float, font_size: float = FONT_SIZE) -> list:
+        return measure.split_lines(text, width, font_size)
+
+    def draw_cover(self) -> None:
+        screenplay = self.screenplay
+        cover = ["Screenplay of", "", screenplay.title.upper()]
+        if "subtitle" in screenplay.other:
+            cover.append(screenplay.other["subtitle"].upper())
+        cover += ["", "", "Written by", ""] + list(screenplay.authors)
+        cover += ["", "Directed by", "", screenplay.director]
+        cover += ["", "Produced by", "", screenplay.production, "", screenplay.date]
+        others = [f"{key}: {value}" for key, value in screenplay.other.items() if key != "subtitle"]
+        if others:
+            cover += [""] + others
+        self.lines += [line.center(BODY_COLUMNS).rstrip() for line in cover]
+        self.lines += ["", "=" * BODY_COLUMNS, ""]
+
+    def add_scene_header(self, scene_nb: int, value: str, location: str, time: str) -> None:
+        header = f"{scene_nb:<{SCENE_NUMBER_COLUMNS}}{value.upper()}. {location}. {time.upper()}"
+        self.lines.append(self._style(header, BOLD))
+        self._skip(measure.AFTER_SCENE_HEADER_SPACE - measure.LINE_HEIGHT)
+        self.previous_speaker = ""
+
+    def add_action(self, action: Action) -> None:
+        self.lines += self._wrap(action.text_without_comments, BODY_WIDTH)
+        self._skip(measure.AFTER_ACTION_SPACE)
+
+    def add_dialog(self, dialog: Dialog) -> None:
+        speaker = dialog.speaker.name.upper()
+        if self.previous_speaker == speaker:
+            speaker += " (cont'd)"
+        self.lines.append(speaker.center(BODY_COLUMNS).rstrip())
+        self.previous_speaker = dialog.speaker.name.upper()
+        indent = " " * DIALOG_OFFSET_COLUMNS
+        if dialog.direction:
+            for line in self._wrap(f"({dialog.direction})", measure.DIALOG_WIDTH, 10):
+                self.lines.append(self._style((indent + line.center(DIALOG_COLUMNS)).rstrip(), ITALIC))
+        for line in self._wrap(dialog.text, measure.DIALOG_WIDTH):
+            self.lines.append((indent + line.center(DIALOG_COLUMNS)).rstrip())
+        self._skip(measure.AFTER_DIALOG_SPACE)
+
+    def add_transition(self, transition: Transition) -> None:
+        indent = " " * TRANSITION_OFFSET_COLUMNS
+        for line in self._wrap(transition.text.upper(), measure.TRANSITION_WIDTH):
+            self.lines.append(indent + line.rjust(TRANSITION_COLUMNS))
+        self._skip(measure.AFTER_TRANSITION_SPACE)
+
+    def add_summary(self, summary: Summary) -> None:
+        # the pdf draws the summary in a box
+        lines = self._wrap(summary.text, BODY_WIDTH)
+        width = max(len(line) for line in lines)
+        self.lines.append("+" + "-" * (width + 2) + "+")
+        self.lines += [f"| {line.ljust(width)} |" for line in lines]
+        self.lines.append("+" + "-" * (width + 2) + "+")
+        self._skip(measure.AFTER_SUMMARY_SPACE)
+
+    def add_dir(self, dir: Dir) -> None:
+        for line in self._wrap(dir.text, BODY_WIDTH):
+            self.lines.append(self._style(line, ITALIC))
+        self._skip(measure.AFTER_REAL_SPACE)
+
+    def the_end(self) -> None:
+        self.lines += ["", self._style("The END".center(BODY_COLUMNS).rstrip(), BOLD)]
+
+    def get_text(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+@register_backend
+class TextBackend(Backend):
+    """Renders the screenplay to a .txt file, or to the terminal when the output is '-'."""
+
+    name = "text"
+    extension = ".txt"
+
+    def render(
+        self,
+        screenplay: Screenplay,
+        output_path: Path,
+        cache=None,
+        jobs: int = 1,
+        instrumentation=None,
+        page_index=None,
+    ) -> None:
+        to_stdout = str(output_path) == STDOUT_PATH
+        with optional_stage(instrumentation, "text"):
+            layout = TextLayout(screenplay, styled=to_stdout and sys.stdout.isatty())
+            layout.draw_cover()
+            for scene_nb, scene in zip(screenplay.get_scene_numbers(), screenplay.scenes):
+                render_scene(layout, scene_nb, scene)
+            layout.the_end()
+            text = layout.get_text()
+            if to_stdout:
+                sys.stdout.write(text)
+                return
+            output_path = Path(output_path)
+            tmp_path = temporary_path(output_path)
+            try:
+                with open(str(tmp_path), mode="w", encoding="utf-8") as output_file:
+                    output_file.write(text)
+                os.replace(str(tmp_path), str(output_path))
+            finally:
+                # left behind when the write failed
+                if tmp_path.exists():
+                    tmp_path.unlink()
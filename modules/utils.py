@@ -1,6 +1,21 @@
 import re
 import logging as lg
 
+try:
+    from modules.lexer import classify
+except ModuleNotFoundError:
+    from lexer import classify
+
+
+### CONSTANTS ###
+
+
+ARG_PATTERN = re.compile(r"(\{[^{}]+\})")
+OPTIONAL_ARG_PATTERN = re.compile(r"\[([^]]+)\]")
+
+
+### FUNCTIONS ###
+
 
 def begins_with(string: str, substring: str) -> bool:
     """Checks wether a given string begins with a given substring.
@@ -24,22 +39,7 @@ def get_header(line: str) -> str:
     Returns:
         str: the line's type.
     """
-    if begins_with(line, "\\scene"):
-        return "scene"
-    elif begins_with(line, "\\summary"):
-        return "summary"
-    elif begins_with(line, "\\dialog"):
-        return "dialog"
-    elif begins_with(line, "\\end"):
-        return "end"
-    elif begins_with(line, "\\dir"):
-        return "dir"
-    elif begins_with(line, "\\transition"):
-        return "transition"
-    elif begins_with(line, "<"):
-        return "comment"
-    else:
-        return "action"
+    return classify(line)
 
 
 def get_scene_info(line: str) -> tuple:
@@ -51,7 +51,7 @@ def get_scene_info(line: str) -> tuple:
     Returns:
         tuple: value, location and time of the scene.
     """
-    infos = re.findall("(\{[^{}]+\})", line)
+    infos = ARG_PATTERN.findall(line)
     if len(infos) != 3:
         lg.error(f"Wrong infos on the scene! Expected 3, got {len(infos)}.")
         res = ()
@@ -68,7 +68,7 @@ def get_dir_info(line: str) -> tuple:
     Returns:
         tuple: direction.
     """
-    dirs = re.findall("(\{[^{}]+\})", line)
+    dirs = ARG_PATTERN.findall(line)
     if len(dirs) != 1:
         lg.error(f"Wrong infos on the scene! Expected 1, got {len(dirs)}.")
         res = ""
@@ -85,12 +85,12 @@ def get_dialog_info(line: str) -> tuple:
     Returns:
         tuple: speaker, line, direction (if any)
     """
-    required = re.findall("(\{[^{}]+\})", line)
+    required = ARG_PATTERN.findall(line)
     if len(required) != 2:
         lg.error(f"Wrong infos on the dialog! Expected 2, got {len(required)}.")
         res = ()
     else:
-        optional = re.findall("\[([^]]+)\]", line)
+        optional = OPTIONAL_ARG_PATTERN.findall(line)
         if optional:
             res = (required[0][1:-1], required[1][1:-1], optional[0])
         else:
@@ -107,7 +107,7 @@ def get_summary(line: str) -> str:
     Returns:
         str: the summary.
     """
-    summary = re.findall("(\{[^{}]+\})", line)
+    summary = ARG_PATTERN.findall(line)
     if len(summary) != 1:
         lg.error(f"Wrong summary! Expected , got {len(summary)}.")
         res = ""
@@ -125,7 +125,7 @@ def get_transition(line: str) -> str:
     Returns:
         str: the transition.
     """
-    transition = re.findall("(\{[^{}]+\})", line)
+    transition = ARG_PATTERN.findall(line)
     if len(transition) != 1:
         lg.error(f"Wrong summary! Expected , got {len(transition)}.")
         res = ""
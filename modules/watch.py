@@ -0,0 +1,136 @@
+import os
+import time
+from pathlib import Path
+from typing import Callable
+
+
+### CONSTANTS ###
+
+
+DEFAULT_POLL_INTERVAL = 0.1  # seconds between two checks of the files
+DEFAULT_DEBOUNCE = 0.2  # seconds without any change before a burst of saves is handled
+
+
+### FUNCTIONS ###
+
+
+def _file_signature(path: Path) -> tuple:
+    try:
+        stat = os.stat(str(path))
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def watch_files(
+    paths: list,
+    on_change: Callable,
+    interval: float = DEFAULT_POLL_INTERVAL,
+    debounce: float = DEFAULT_DEBOUNCE,
+    max_events: int = None,
+) -> None:
+    """Polls files and calls back once a burst of changes has settled.
+
+    Args:
+        paths (list): paths of the watched files.
+        on_change (Callable): called with the list of changed paths.
+        interval (float): seconds between two checks. Defaults to DEFAULT_POLL_INTERVAL.
+        debounce (float): seconds without any change before calling back. Defaults to DEFAULT_DEBOUNCE.
+        max_events (int, optional): stops after this number of callbacks. Defaults to None (never stops).
+    """
+    signatures = {path: _file_signature(path) for path in paths}
+    changed = set()
+    last_change = 0.0
+    events = 0
+    while max_events is None or events < max_events:
+        time.sleep(interval)
+        now = time.monotonic()
+        for path in paths:
+            signature = _file_signature(path)
+            if signature != signatures[path]:
+                signatures[path] = signature
+                changed.add(path)
+                last_change = now
+        if changed and now - last_change >= debounce:
+            on_change(sorted(changed))
+            changed = set()
+            events += 1
+
+
+### CLASSES ###
+
+
+class IncrementalParser:
+    """Keeps the scenes of a document in memory, and only parses again the changed scenes.
+
+    A scene header always starts outside of any comment (a comment still open at a command
+    stops before it, see lexer.tokenize), so the parsing can restart at any scene header with
+    a fresh state and give the same scenes as a full parse.
+    """
+
+    def __init__(self, parse: Callable) -> None:
+        """Initializes the parser.
+
+        Args:
+            parse (Callable): parser yielding the scenes of a list of lines, with their header line.
+        """
+        self.parse = parse
+        self.lines = []
+        self.scenes = []
+        self.reparsed = 0
+
+    def start(self, lines: list, scenes: list) -> None:
+        """Starts from a document which is already parsed, without parsing it again.
+
+        Args:
+            lines (list): lines of the document.
+            scenes (list): its scenes, as given by the parser.
+        """
+        self.lines = lines
+        self.scenes = list(scenes)
+
+    def update(self, lines: list) -> list:
+        """Updates the scenes from the new content of the document.
+
+        Args:
+            lines (list): lines of the document.
+
+        Returns:
+            list: all the scenes of the document.
+        """
+        old_lines = self.lines
+        # find the changed range of lines
+        prefix = 0
+        common = min(len(old_lines), len(lines))
+        while prefix < common and old_lines[prefix] == lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < common - prefix and old_lines[-1 - suffix] == lines[-1 - suffix]:
+            suffix += 1
+        if prefix == len(old_lines) == len(lines):
+            return self.scenes
+        # keep the scenes ending before the change: a scene ends at the next scene header, which must be unchanged
+        kept = 0
+        while kept + 1 < len(self.scenes) and self.scenes[kept + 1].line - 1 < prefix:
+            kept += 1
+        # the lines before the first scene are parsed again with it, for their warnings
+        start = self.scenes[kept].line - 1 if kept else 0
+        # scenes starting in the unchanged suffix, by their line in the old document
+        delta = len(lines) - len(old_lines)
+        suffix_start = len(lines) - suffix
+        old_starts = {scene.line - 1: index for index, scene in enumerate(self.scenes)}
+        new_scenes = self.scenes[:kept]
+        reused = []
+        for scene in self.parse(lines[start:]):
+            scene.line += start
+            index = scene.line - 1
+            if index >= suffix_start and index - delta in old_starts:
+                reused = self.scenes[old_starts[index - delta]:]
+                break
+            new_scenes.append(scene)
+            self.reparsed += 1
+        for scene in reused:
+            scene.line += delta
+        self.lines = lines
+        self.scenes = new_scenes + reused
+        return self.scenes
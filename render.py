@@ -1,11 +1,36 @@
 from pathlib import Path
 import argparse
+import io
 import logging as lg
 import json
+import os
+import re
+import sys
+import time
+from functools import lru_cache, partial
+from typing import BinaryIO, Iterable, Iterator, Union
+
+# the modules of the renderer are imported lazily where they are slow (fpdf), so that --check starts fast
+_import_start = time.perf_counter()
 
 from modules.screenplay import *
 from modules.utils import *
-from modules.pdf_handler import *
+from modules.lexer import *
+from modules.comments import *
+from modules.batch import *
+from modules.watch import *
+from modules.instrumentation import *
+from modules.parse_cache import *
+from modules.page_index import *
+from modules.includes import *
+from modules.source_file import SourceLines, split_source
+from modules.stats import compute_stats, write_csv
+from modules.layout_cache import LayoutCache, layout_fingerprint
+from modules.measure import wrap_cache_counts
+from modules.backend import *
+from modules.text_backend import *
+
+STARTUP_SECONDS = time.perf_counter() - _import_start
 
 
 ### CONSTANTS ###
@@ -14,6 +39,22 @@ from modules.pdf_handler import *
 DEFAULT_OUTPUT_PATH = Path("render.pdf")
 DEFAULT_SCREENPLAY_NAME = Path("screenplay.txt")
 DEFAULT_METADATA_NAME = Path("metadata.json")
+DEFAULT_CACHE_DIR = Path(".render-cache")
+DEFAULT_SUMMARY_PATH = Path("batch-summary.json")
+LAYOUT_CACHE_NAME = Path("layout")
+METADATA_KEYS = ("name", "authors", "director", "creation-date", "production")
+# commands adding to the current scene
+SCENE_COMMANDS = ("dialog", "summary", "dir", "transition")
+PARSE_CACHE_NAME = Path("parse")
+PAGE_INDEX_NAME = Path("pages.json")
+DEFAULT_FORMATS = ("pdf",)
+
+
+### CLASSES ###
+
+
+class ProjectError(Exception):
+    """Raised when a project directory cannot be rendered."""
 
 
 ### FUNCTIONS ###
@@ -30,11 +71,8 @@ def read_screenplay_file(path_to_file: Path) -> list:
     """
     if not path_to_file.is_file():
         lg.error(f"Path '{path_to_file}' is not valid!")
-        data = []
-    else:
-        with open(str(path_to_file), mode="r", encoding="utf-8") as screenplay_file:
-            data = [line[:-1] for line in screenplay_file.readlines()]
-    return data
+        return []
+    return list(SourceLines(path_to_file))
 
 
 def read_metadata(path_to_metadata: Path) -> dict:
@@ -55,76 +93,148 @@ def read_metadata(path_to_metadata: Path) -> dict:
     return data
 
 
-def doc_to_scenes(document: list) -> list:
-    """Parses the document to obtain all the scenes.
+def iter_screenplay_file(path_to_file: Path) -> Iterator[str]:
+    """Lazily reads the screenplay file line by line, from a memory map (see SourceLines).
+
+    Args:
+        path_to_file (Path): path to the screenplay file.
+
+    Yields:
+        str: each line of the screenplay file, without its newline.
+    """
+    if not path_to_file.is_file():
+        lg.error(f"Path '{path_to_file}' is not valid!")
+        return
+    yield from SourceLines(path_to_file)
+
+
+def _build_action(action_tokens: list) -> Action:
+    """Builds an action from the cached text tokens.
 
     Args:
-        document (list): list of strings from the screenplay file.
+        action_tokens (list): cached text tokens, in order.
 
     Returns:
-        list: list of all scenes of the document.
+        Action: the action.
+    """
+    return Action(
+        "\n".join(token.raw for token in action_tokens),
+        "\n".join(token.text for token in action_tokens),
+    )
+
+
+def iter_scenes(
+    document: Iterable[str],
+    source: str = None,
+    includes: list = None,
+    diagnostics: list = None,
+) -> Iterator[Scene]:
+    """Parses the document in a single pass, yielding each scene once it is finished.
+
+    A scene is finished as soon as the next scene header, an include or the end marker is
+    seen, so only one scene is held in memory at a time.
+
+    Args:
+        document (Iterable[str]): lines from the screenplay file (list or file handle).
+        source (str, optional): name of the source file, in the error messages. Defaults to None.
+        includes (list, optional): filled with the includes of the document (see Include); they
+        are ignored if it is None. Defaults to None.
+        diagnostics (list, optional): filled with the problems found (see Diagnostic), instead of
+        printing them. Defaults to None.
+
+    Yields:
+        Scene: each scene of the document, in order.
     """
-    scenes = []
-    doc_copy = document.copy()
-    in_scene = False
-    in_action = False
-    new_action_txt = ""
-    line_type = ""
-    # look at each element
-    line_nb = 1
-    while doc_copy:
-        line = doc_copy.pop(0)
+
+    def report(line: int, command: str, message: str, severity: str = ERROR) -> None:
+        if diagnostics is not None:
+            diagnostics.append(Diagnostic(line, 1, command, message, severity, source or ""))
+        else:
+            location = f"{source}:{line}" if source else f"line {line}"
+            print(f"Exception at {location}: {message}")
+
+    new_scene = None
+    action_lines = []
+    characters = {}  # one Character per name, shared by the dialogs
+    nb_scenes = 0
+    for token in tokenize(document, source, diagnostics):
         try:
-            # if the previous line was a summary or a new scene, no need for newline
-            if line_type in {"scene", "summary"} and line == "\n":
+            if token.kind == COMMENT:
                 continue
-            line_type = get_header(line)
-            if line_type == "comment":
-                continue
-            # first, if we were in an action and it is now finished, append the cached action to the scene
-            if in_action and line_type != "action":
-                in_action = False
-                if begins_with(new_action_txt, "\n"):
-                    new_action_txt = new_action_txt[1:]
-                if new_action_txt.endswith("\n"):
-                    new_action_txt = new_action_txt[:-1]
-                new_action = Action(new_action_txt)
-                new_action_txt = ""
-                new_scene.add_action(new_action)
-            # next, check the actual type
-            if line_type == "scene":
-                if in_scene:  # if we were in a scene, it is a new one, so append the previous to the set
-                    scenes.append(new_scene)
-                in_scene = True  # create a new scene
-                value, location, time = get_scene_info(line)
-                new_scene = Scene(value, location, time)
             # if it is an action, cache it for later
-            elif line_type == "action" and line:
-                if in_action:
-                    line = "\n" + line
-                in_action = True
-                new_action_txt += line
-            elif line_type == "dialog":
-                speaker, speech, direction = get_dialog_info(line)
-                new_dialog = Dialog(Character(speaker), speech, direction)
-                new_scene.add_dialog(new_dialog)
-            elif line_type == "summary":
-                new_scene.set_summary(Summary(get_summary(line)))
-            elif line_type == "dir":
-                dir_txt = get_dir_info(line)
-                new_scene.add_dir(Dir(dir_txt))
-            elif line_type == "transition":
-                new_scene.set_transition(Transition(get_transition(line)))
-            elif line_type == "comment":
+            if token.kind == TEXT:
+                if token.text:
+                    action_lines.append(token)
                 continue
-            # if we see the end marker, break the loop
-            elif line_type == "end":
-                scenes.append(new_scene)
-                break
+            # if we were in an action and it is now finished, append the cached action to the scene
+            if action_lines:
+                if new_scene is None:
+                    report(action_lines[0].line, "", "Text outside of a scene, ignoring it.", WARNING)
+                else:
+                    new_scene.add_action(_build_action(action_lines))
+                action_lines = []
+            if new_scene is None and token.command in SCENE_COMMANDS:
+                raise LexerError(f"\\{token.command} outside of a scene, ignoring it.")
+            if token.command == "scene":
+                if new_scene is not None:  # if we were in a scene, it is a new one, so yield the previous
+                    yield new_scene
+                    nb_scenes += 1
+                    new_scene = None
+                value, location, time = expect_args(token, 3)
+                new_scene = Scene(value, location, time, token.line)
+            elif token.command == "dialog":
+                speaker, speech = expect_args(token, 2)
+                direction = token.optional[0] if token.optional else ""
+                character = characters.get(speaker)
+                if character is None:
+                    character = characters[speaker] = Character(speaker)
+                new_scene.add_dialog(Dialog(character, speech, direction))
+            elif token.command == "summary":
+                (summary,) = expect_args(token, 1)
+                new_scene.set_summary(Summary(summary))
+            elif token.command == "dir":
+                (dir_txt,) = expect_args(token, 1)
+                new_scene.add_dir(Dir(dir_txt))
+            elif token.command == "transition":
+                (transition,) = expect_args(token, 1)
+                new_scene.set_transition(Transition(transition))
+            elif token.command == "include":
+                (path,) = expect_args(token, 1)
+                if includes is None:
+                    raise LexerError("\\include is only allowed in the files of a project.")
+                # the scenes of the included file come after the current scene
+                if new_scene is not None:
+                    yield new_scene
+                    nb_scenes += 1
+                    new_scene = None
+                includes.append(Include(nb_scenes, path, token.line))
+            # if we see the end marker, stop parsing
+            elif token.command == "end":
+                if new_scene is not None:
+                    yield new_scene
+                return
         except Exception as ex:
-            print(f"Exception at line {line_nb}: {ex}")
-        line_nb += 1
-    return scenes
+            report(token.line, token.command, str(ex))
+    # the end of the file ends the last scene too, so that an included file needs no end marker
+    if action_lines:
+        if new_scene is None:
+            report(action_lines[0].line, "", "Text outside of a scene, ignoring it.", WARNING)
+        else:
+            new_scene.add_action(_build_action(action_lines))
+    if new_scene is not None:
+        yield new_scene
+
+
+def doc_to_scenes(document: Iterable[str]) -> list:
+    """Parses the document to obtain all the scenes.
+
+    Args:
+        document (Iterable[str]): lines from the screenplay file (list or file handle).
+
+    Returns:
+        list: list of all scenes of the document.
+    """
+    return list(iter_scenes(document))
 
 
 def get_screenplay_args(metadata: dict) -> tuple:
@@ -151,70 +261,668 @@ def get_screenplay_args(metadata: dict) -> tuple:
     )
 
 
-def doc_to_screenplay(metadata: dict, document: list) -> Screenplay:
+def doc_to_screenplay(metadata: dict, document: Iterable[str]) -> Screenplay:
     """Parses the screenplay file's content to obtain a screenplay.
 
     Args:
         metadata (dict): dictionary containing the project's metadata.
-        document (list): list of strings from the screenplay file.
+        document (Iterable[str]): lines from the screenplay file (list or file handle).
 
     Returns:
         Screenplay: the screenplay object.
     """
     args = get_screenplay_args(metadata)
     screenplay = Screenplay(*args)
-    scenes = doc_to_scenes(document)
-    for scene in scenes:
+    for scene in iter_scenes(document):
         screenplay.add_scene(scene)
     return screenplay
 
 
-def screenplay_to_pdf(screenplay: Screenplay, output_path: Path) -> None:
+def parse_source_file(path: Path, diagnostics: list = None) -> ParsedFile:
+    """Parses one source file of a project, without the files it includes (run in a worker process).
+
+    Args:
+        path (Path): path to the source file.
+        diagnostics (list, optional): filled with the problems found (see Diagnostic). Defaults to None.
+
+    Returns:
+        ParsedFile: its scenes, includes and number of lines.
+    """
+    # the lines are decoded as they are parsed, and not kept
+    lines = SourceLines(path)
+    includes = []
+    scenes = list(iter_scenes(lines, source=str(path), includes=includes, diagnostics=diagnostics))
+    return ParsedFile(scenes, includes, lines.count)
+
+
+@lru_cache(maxsize=1)
+def get_parser_fingerprint() -> str:
+    """Returns the fingerprint of the parser, including the parsing functions of this module."""
+    return parser_fingerprint(_build_action, iter_scenes, parse_source_file, get_screenplay_args)
+
+
+def parse_project(
+    screenplay_file_path: Path,
+    metadata_file_path: Path,
+    cache: ParseCache = None,
+    instrumentation: Instrumentation = None,
+    jobs: int = 1,
+    sources: list = None,
+) -> Screenplay:
+    """Reads and parses the source files of a project, loading the files which did not change from the cache.
+
+    The screenplay file may include other files (see modules/includes.py), which are parsed
+    in parallel and cached each on its own.
+
+    Args:
+        screenplay_file_path (Path): path to the screenplay file.
+        metadata_file_path (Path): path to the metadata file.
+        cache (ParseCache, optional): cache of the parsed files. Defaults to None.
+        instrumentation (Instrumentation, optional): collects the timings of each stage. Defaults to None.
+        jobs (int): number of worker processes parsing the included files. Defaults to 1.
+        sources (list, optional): filled with the paths of the source files, the screenplay file
+        first. Defaults to None.
+
+    Returns:
+        Screenplay: the screenplay object.
+    """
+    get_cached = put_cached = None
+    if cache is not None:
+        keys = {}
+
+        def get_cached(path: Path) -> ParsedFile:
+            file_cache = cache.for_source(path)
+            with optional_stage(instrumentation, "parse_cache"):
+                keys[path] = file_cache.key(path)
+                parsed = file_cache.get(keys[path])
+            cache.hits += file_cache.hits
+            cache.misses += file_cache.misses
+            return parsed
+
+        def put_cached(path: Path, parsed: ParsedFile) -> None:
+            cache.for_source(path).put(keys[path], parsed)
+
+    lg.info(f"Reading metadata content...")
+    with optional_stage(instrumentation, "read_metadata"):
+        meta_content = read_metadata(metadata_file_path)
+    lg.info("Converting raw content to screenplay object...")
+    with optional_stage(instrumentation, "parse"):
+        files = parse_files(screenplay_file_path, parse_source_file, jobs, get_cached, put_cached)
+        screenplay = Screenplay(*get_screenplay_args(meta_content))
+        for scene in iter_merged_scenes(files, screenplay_file_path):
+            screenplay.add_scene(scene)
+    if cache is not None:
+        lg.info(f"Parse cache: {cache.hits} file(s) reused, {cache.misses} parsed.")
+    if instrumentation is not None:
+        instrumentation.count("files", len(files))
+        instrumentation.count("lines", sum(parsed.lines for parsed in files.values()))
+    if sources is not None:
+        sources.extend(files)
+    return screenplay
+
+
+def screenplay_to_pdf(
+    screenplay: Screenplay,
+    output_path: Path,
+    cache: LayoutCache = None,
+    jobs: int = 1,
+    instrumentation: Instrumentation = None,
+) -> None:
     """Writes the screenplay into a .pdf file.
 
     Args:
         screenplay (Screenplay): screenplay to be written.
         output_path (Path): path to the output.
+        cache (LayoutCache, optional): cache of the scenes' layouts. Defaults to None.
+        jobs (int): number of worker processes laying out the scenes. Defaults to 1.
+        instrumentation (Instrumentation, optional): collects the timings and progress. Defaults to None.
+    """
+    get_backend("pdf")().render(screenplay, output_path, cache, jobs, instrumentation)
+
+
+def render_bytes(metadata: dict, source: Union[str, Iterable[str]], stream: BinaryIO = None) -> bytes:
+    """Renders a screenplay to pdf in memory, without reading or writing any file.
+
+    Every call works on its own objects, so renders can run concurrently in threads.
+
+    Args:
+        metadata (dict): metadata of the project, as in the metadata file (name, authors...).
+        source (str | Iterable[str]): content of the screenplay file, or its lines (list or file handle).
+        stream (BinaryIO, optional): seekable file object opened for binary writing, where the pdf
+        is written. Defaults to None (the pdf is returned).
+
+    Raises:
+        ValueError: if a key of the metadata is missing.
+
+    Returns:
+        bytes: the pdf, or None if it is written to the stream.
+    """
+    missing = [key for key in METADATA_KEYS if key not in metadata]
+    if missing:
+        raise ValueError(f"Missing key(s) in the metadata: {', '.join(missing)}.")
+    if isinstance(source, str):
+        source = split_source(source)
+    else:
+        # the lines of a file handle keep their line break
+        source = (line.rstrip("\r\n") for line in source)
+    screenplay = doc_to_screenplay(metadata, source)
+    output = io.BytesIO() if stream is None else stream
+    get_backend("pdf")().write(screenplay, output)
+    return output.getvalue() if stream is None else None
+
+
+def check_metadata(metadata_file_path: Path, diagnostics: list) -> None:
+    """Checks that the metadata file is valid JSON, with every required key.
+
+    Args:
+        metadata_file_path (Path): path to the metadata file.
+        diagnostics (list): filled with the problems found (see Diagnostic).
+    """
+    source = str(metadata_file_path)
+    try:
+        with open(source, mode="r", encoding="utf-8") as metadata_file:
+            metadata = json.load(metadata_file)
+    except OSError as ex:
+        diagnostics.append(Diagnostic(1, 1, "", f"Cannot read the metadata: {ex}", source=source))
+        return
+    except json.JSONDecodeError as ex:
+        diagnostics.append(Diagnostic(ex.lineno, ex.colno, "", f"Invalid JSON: {ex.msg}.", source=source))
+        return
+    if not isinstance(metadata, dict):
+        diagnostics.append(Diagnostic(1, 1, "", "The metadata must be a JSON object.", source=source))
+        return
+    for key in METADATA_KEYS:
+        if key not in metadata:
+            diagnostics.append(Diagnostic(1, 1, "", f"Missing metadata '{key}'.", source=source))
+
+
+def check_project(path_to_folder: Path) -> dict:
+    """Checks the source files of a project in one pass, without laying anything out.
+
+    Args:
+        path_to_folder (Path): path to the project's directory.
+
+    Raises:
+        ProjectError: if the project directory or its screenplay file is not found.
+
+    Returns:
+        dict: checked files, number of scenes, errors, warnings, diagnostics (see Diagnostic), and
+        durations in milliseconds of the startup (importing the renderer) and of the check.
+    """
+    start = time.perf_counter()
+    screenplay_file_path = path_to_folder / DEFAULT_SCREENPLAY_NAME
+    metadata_file_path = path_to_folder / DEFAULT_METADATA_NAME
+    if not path_to_folder.is_dir():
+        raise ProjectError(f"The path '{path_to_folder}' is not a directory!")
+    if not screenplay_file_path.is_file():
+        raise ProjectError(f"Screenplay file not found at '{screenplay_file_path}'!")
+    diagnostics = []
+    check_metadata(metadata_file_path, diagnostics)
+    parse_file = partial(parse_source_file, diagnostics=diagnostics)
+    files = parse_files(screenplay_file_path, parse_file, diagnostics=diagnostics)
+    nb_scenes = sum(1 for _ in iter_merged_scenes(files, screenplay_file_path, diagnostics=diagnostics))
+    diagnostics.sort(key=lambda diagnostic: (diagnostic.source, diagnostic.line, diagnostic.column))
+    errors = sum(diagnostic.severity == ERROR for diagnostic in diagnostics)
+    return {
+        "project": str(path_to_folder),
+        "files": [str(metadata_file_path)] + [str(path) for path in files],
+        "scenes": nb_scenes,
+        "errors": errors,
+        "warnings": len(diagnostics) - errors,
+        "diagnostics": [diagnostic._asdict() for diagnostic in diagnostics],
+        "startup_ms": round(STARTUP_SECONDS * 1000, 3),
+        "check_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+
+
+def get_extract_name(label: str) -> Path:
+    """Gives the default name of an output holding only some of the scenes.
+
+    Args:
+        label (str): what the output holds (name of a character, selected scenes...).
+
+    Returns:
+        Path: name of the output, in the project directory.
+    """
+    slug = re.sub(r"[^a-z0-9]+", "-", label.lower()).strip("-")
+    return DEFAULT_OUTPUT_PATH.with_name(f"{DEFAULT_OUTPUT_PATH.stem}-{slug}{DEFAULT_OUTPUT_PATH.suffix}")
+
+
+def get_output_paths(
+    path_to_folder: Path, output_path: Path = None, formats: tuple = DEFAULT_FORMATS, name: Path = DEFAULT_OUTPUT_PATH
+) -> dict:
+    """Gives the path of the output of each format.
+
+    Args:
+        path_to_folder (Path): path to the project's directory.
+        output_path (Path, optional): path to the output. With several formats, each output gets
+        the extension of its format. Defaults to None (in the project directory).
+        formats (tuple): names of the backends (pdf, text...). Defaults to DEFAULT_FORMATS.
+        name (Path): name of the output in the project directory. Defaults to DEFAULT_OUTPUT_PATH.
+
+    Raises:
+        ValueError: if several formats have the same extension.
+
+    Returns:
+        dict: format -> path to its output.
+    """
+    if output_path and len(formats) == 1:
+        return {formats[0]: Path(output_path)}
+    base = Path(output_path) if output_path else path_to_folder / name
+    paths = {name: base.with_suffix(get_backend(name).extension) for name in formats}
+    if len(set(paths.values())) < len(paths):
+        raise ValueError(f"The formats {', '.join(formats)} would be written to the same file.")
+    return paths
+
+
+def render_screenplay(
+    screenplay: Screenplay,
+    output_paths: dict,
+    cache: LayoutCache = None,
+    jobs: int = 1,
+    instrumentation: Instrumentation = None,
+    page_index: PageIndex = None,
+) -> dict:
+    """Writes the screenplay to every output, from the same parsed screenplay.
+
+    Args:
+        screenplay (Screenplay): screenplay to be written.
+        output_paths (dict): format -> path to its output (see get_output_paths).
+        cache (LayoutCache, optional): cache of the scenes' layouts. Defaults to None.
+        jobs (int): number of worker processes laying out the scenes. Defaults to 1.
+        instrumentation (Instrumentation, optional): collects the timings and progress. Defaults to None.
+        page_index (PageIndex, optional): where each scene starts in the full document, when the
+        screenplay is a selection of its scenes. Defaults to None.
+
+    Returns:
+        dict: format -> backend that rendered it.
+    """
+    backends = {}
+    for name, output_path in output_paths.items():
+        backends[name] = get_backend(name)()
+        backends[name].render(screenplay, output_path, cache, jobs, instrumentation, page_index)
+    return backends
+
+
+def get_page_index(screenplay: Screenplay, key: str, path: Path = None) -> PageIndex:
+    """Returns where each scene starts in the full pdf, from the previous full render if it is up to date.
+
+    Args:
+        screenplay (Screenplay): the whole screenplay.
+        key (str): digest of the sources and the layout (see get_page_index_key).
+        path (Path, optional): path to the index of the previous full render. Defaults to None.
+
+    Returns:
+        PageIndex: the index.
     """
-    pdf = create_pdf(
+    page_index = PageIndex.load(path, key) if path else None
+    if page_index is not None and len(page_index.starts) == len(screenplay.scenes):
+        lg.info("Using the page index of the previous render...")
+        return page_index
+    lg.info("Measuring the full screenplay to place the selected scenes...")
+    infos = (
         screenplay.title,
         screenplay.authors,
         screenplay.director,
         screenplay.date,
         screenplay.production,
-        screenplay.scenes,
-        other=screenplay.other,
+        screenplay.other,
     )
-    pdf.output(output_path)
+    # imported here, so that fpdf is only imported when a pdf is rendered
+    from modules.pdf_handler import measure_page_index
+
+    starts, nb_pages = measure_page_index(infos, screenplay.scenes)
+    return PageIndex(key, starts, nb_pages)
+
 
+def get_page_index_key(*paths: Path) -> str:
+    """Hashes everything the page index depends on: the source files, the parser and the layout."""
+    return source_key(f"{get_parser_fingerprint()}:{layout_fingerprint()}", *paths)
 
-def main(path_to_folder: Path, output_path: Path = None) -> None:
+
+def render_project(
+    path_to_folder: Path,
+    output_path: Path = None,
+    use_cache: bool = True,
+    jobs: int = 1,
+    instrumentation: Instrumentation = None,
+    formats: tuple = DEFAULT_FORMATS,
+    character: str = None,
+    scenes: str = None,
+    parsed: list = None,
+) -> Path:
+    """Renders a project directory to a .pdf file (or to other formats).
+
+    Args:
+        path_to_folder (Path): path to the project's directory.
+        output_path (Path, optional): path to the rendered pdf. Defaults to None (in the project directory).
+        use_cache (bool): whether to reuse the cached parsed screenplay and scenes' layouts. Defaults to True.
+        jobs (int): number of worker processes laying out the scenes. Defaults to 1.
+        instrumentation (Instrumentation, optional): collects the timings of each stage and notifies
+        the progress; the render stops with RenderCancelled if it is cancelled. Defaults to None.
+        formats (tuple): names of the backends to render with, all from a single parse (see
+        get_output_paths). Defaults to DEFAULT_FORMATS.
+        character (str, optional): only render the sides of this character, meaning the scenes
+        where the character speaks, with their original numbers. Defaults to None (every scene).
+        scenes (str, optional): only render the selected scenes ("40-55", "3,7,10-12"), with their
+        numbers and page numbers in the full pdf. Defaults to None (every scene).
+        parsed (list, optional): filled with the parsed screenplay, before the sides or the
+        selection are taken from it, and with the paths of its source files, so that they are
+        not parsed again (see main_watch). Defaults to None.
+
+    Raises:
+        ProjectError: if the project directory is not valid, a format is unknown, the character
+        never speaks, or the selected scenes do not exist.
+
+    Returns:
+        Path: path to the rendered pdf (the output of the first format).
+    """
     # explore the directory
     lg.info(f"Reading directory '{path_to_folder}'...")
     if not path_to_folder.is_dir():
-        lg.error(f"The path '{path_to_folder}' is not a directory!")
-        return
-    if not output_path:
-        output_path = path_to_folder / DEFAULT_OUTPUT_PATH
-        lg.info(f"Defined output path at '{output_path}'...")
+        raise ProjectError(f"The path '{path_to_folder}' is not a directory!")
+    try:
+        selection = parse_scene_ranges(scenes) if scenes else None
+        if character:
+            name = get_extract_name(character)
+        elif selection:
+            name = get_extract_name(f"scenes-{scenes}")
+        else:
+            name = DEFAULT_OUTPUT_PATH
+        output_paths = get_output_paths(path_to_folder, output_path, formats, name)
+    except ValueError as ex:
+        raise ProjectError(ex) from None
+    lg.info(f"Defined output path(s) at {', '.join(str(path) for path in output_paths.values())}...")
     # find the metadata file
     metadata_file_path = path_to_folder / DEFAULT_METADATA_NAME
     screenplay_file_path = path_to_folder / DEFAULT_SCREENPLAY_NAME
     if not screenplay_file_path.is_file():
-        lg.error(f"Screenplay file not found at '{screenplay_file_path}'!")
-        return
+        raise ProjectError(f"Screenplay file not found at '{screenplay_file_path}'!")
     if not metadata_file_path.is_file():
-        lg.error(f"Metadata file not found at '{metadata_file_path}'!")
-        return
+        raise ProjectError(f"Metadata file not found at '{metadata_file_path}'!")
     # generate the screenplay
-    lg.info(f"Reading screenplay content...")
-    screen_content = read_screenplay_file(screenplay_file_path)
-    lg.info(f"Reading metadata content...")
-    meta_content = read_metadata(metadata_file_path)
-    lg.info("Converting raw content to screenplay object...")
-    screenplay = doc_to_screenplay(meta_content, screen_content)
-    lg.info(f"Rendering the screenplay object to '{output_path}'...")
-    screenplay_to_pdf(screenplay, output_path)
+    parse_cache = None
+    if use_cache:
+        parse_cache = ParseCache(path_to_folder / DEFAULT_CACHE_DIR / PARSE_CACHE_NAME, get_parser_fingerprint())
+    sources = []
+    screenplay = parse_project(screenplay_file_path, metadata_file_path, parse_cache, instrumentation, jobs, sources)
+    if parsed is not None:
+        parsed.extend((screenplay, sources))
+    if character:
+        try:
+            screenplay = screenplay.get_sides(character)
+        except KeyError:
+            speaking = ", ".join(sorted(screenplay.index)) or "none"
+            raise ProjectError(f"The character '{character}' never speaks (speaking characters: {speaking}).") from None
+        lg.info(f"Rendering the {len(screenplay.scenes)} scene(s) where {character} speaks...")
+    page_index_path = path_to_folder / DEFAULT_CACHE_DIR / PAGE_INDEX_NAME if use_cache else None
+    page_index_key = get_page_index_key(metadata_file_path, *sources)
+    page_index = None
+    if selection:
+        try:
+            selected = screenplay.get_selection(selection)
+        except ValueError as ex:
+            raise ProjectError(ex) from None
+        with optional_stage(instrumentation, "page_index"):
+            page_index = get_page_index(screenplay, page_index_key, page_index_path)
+        screenplay = selected
+    cache = None
+    # a selection is laid out from the page index, not from the cached layouts of the full render
+    if use_cache and not selection:
+        cache = LayoutCache(path_to_folder / DEFAULT_CACHE_DIR / LAYOUT_CACHE_NAME)
+    lg.info(f"Rendering the screenplay object...")
+    wrap_hits, wrap_misses = wrap_cache_counts()
+    backends = render_screenplay(screenplay, output_paths, cache, jobs, instrumentation, page_index)
+    # the line breaks computed in this process (not in the worker processes)
+    wrap_hits, wrap_misses = (count - start for count, start in zip(wrap_cache_counts(), (wrap_hits, wrap_misses)))
+    if wrap_hits or wrap_misses:
+        lg.info(f"Wrap cache: {wrap_hits} text(s) reused, {wrap_misses} wrapped.")
+        if instrumentation is not None:
+            instrumentation.count("wrap_cache_hits", wrap_hits)
+            instrumentation.count("wrap_cache_misses", wrap_misses)
+    # the pdf backends record where the scenes start, the web pdf has the same pages
+    pdf_backend = next((backend for backend in backends.values() if hasattr(backend, "scene_starts")), None)
+    if page_index_path and not (character or selection) and pdf_backend is not None:
+        PageIndex(page_index_key, pdf_backend.scene_starts, pdf_backend.nb_pages).save(page_index_path)
+    if cache is not None:
+        lg.info(f"Layout cache: {cache.hits} scene(s) reused, {cache.misses} laid out.")
+        if instrumentation is not None:
+            instrumentation.count("layout_cache_hits", cache.hits)
+            instrumentation.count("layout_cache_misses", cache.misses)
+            instrumentation.count("parse_cache_hits", parse_cache.hits)
+    return next(iter(output_paths.values()))
+
+
+def main(
+    path_to_folder: Path,
+    output_path: Path = None,
+    use_cache: bool = True,
+    jobs: int = 1,
+    profile_path: Path = None,
+    profile_format: str = JSON_FORMAT,
+    formats: tuple = DEFAULT_FORMATS,
+    character: str = None,
+    scenes: str = None,
+) -> bool:
+    """Renders a project directory, logging the errors.
+
+    Args:
+        formats (tuple): names of the backends to render with. Defaults to DEFAULT_FORMATS.
+        character (str, optional): only render the sides of this character. Defaults to None.
+        scenes (str, optional): only render the selected scenes ("40-55", "3,7,10-12"). Defaults to None.
+        profile_path (Path, optional): path to write the timings and counters of the render to.
+        Defaults to None (no profiling).
+        profile_format (str): JSON_FORMAT, or CHROME_FORMAT for a Chrome trace. Defaults to JSON_FORMAT.
+
+    Returns:
+        bool: whether the project was rendered.
+    """
+    instrumentation = Instrumentation() if profile_path else None
+    try:
+        render_project(path_to_folder, output_path, use_cache, jobs, instrumentation, formats, character, scenes)
+    except ProjectError as ex:
+        lg.error(ex)
+        return False
+    if instrumentation is not None:
+        instrumentation.write(profile_path, profile_format)
+        lg.info(f"Profile written to '{profile_path}'.")
+    return True
+
+
+def main_check(path_to_folder: Path) -> bool:
+    """Checks a project and prints the report as JSON (see check_project).
+
+    Args:
+        path_to_folder (Path): path to the project's directory.
+
+    Returns:
+        bool: whether the project has no errors.
+    """
+    try:
+        report = check_project(path_to_folder)
+    except ProjectError as ex:
+        lg.error(ex)
+        return False
+    print(json.dumps(report, indent=4))
+    return report["errors"] == 0
+
+
+def main_stats(path_to_folder: Path, output_path: Path = None, stats_format: str = "csv", use_cache: bool = True) -> bool:
+    """Measures the scenes and characters of a project without rendering it (see modules/stats.py).
+
+    Args:
+        path_to_folder (Path): path to the project's directory.
+        output_path (Path, optional): path to write the stats to. Defaults to None (printed).
+        stats_format (str): "csv" or "json". Defaults to "csv".
+        use_cache (bool): whether to reuse the parsed screenplay. Defaults to True.
+
+    Returns:
+        bool: whether the project was measured.
+    """
+    screenplay_file_path = path_to_folder / DEFAULT_SCREENPLAY_NAME
+    metadata_file_path = path_to_folder / DEFAULT_METADATA_NAME
+    for path in (screenplay_file_path, metadata_file_path):
+        if not path.is_file():
+            lg.error(f"File not found at '{path}'!")
+            return False
+    parse_cache = None
+    if use_cache:
+        parse_cache = ParseCache(path_to_folder / DEFAULT_CACHE_DIR / PARSE_CACHE_NAME, get_parser_fingerprint())
+    stats = compute_stats(parse_project(screenplay_file_path, metadata_file_path, parse_cache))
+    output = open(str(output_path), mode="w", encoding="utf-8", newline="") if output_path else sys.stdout
+    try:
+        if stats_format == "json":
+            output.write(json.dumps(stats, indent=4) + "\n")
+        else:
+            write_csv(stats, output)
+    finally:
+        if output_path:
+            output.close()
+    lg.info(f"{len(stats['scenes'])} scene(s), {stats['pages']} page(s), about {round(stats['seconds'] / 60)} minute(s).")
+    return True
+
+
+def main_serve(
+    host: str = None,
+    port: int = None,
+    socket_path: str = None,
+    jobs: int = 1,
+    max_pending: int = None,
+    max_body_size: int = None,
+) -> None:
+    """Serves renders over HTTP until interrupted (see modules/server.py).
+
+    Args:
+        host (str, optional): address to listen on. Defaults to None (DEFAULT_HOST).
+        port (int, optional): port to listen on. Defaults to None (DEFAULT_PORT).
+        socket_path (str, optional): path to a Unix socket to listen on instead. Defaults to None.
+        jobs (int): number of worker processes. Defaults to 1.
+        max_pending (int, optional): renders queued or running, above which the requests are
+        rejected. Defaults to None (DEFAULT_MAX_PENDING).
+        max_body_size (int, optional): bytes of a request body, above which the request is
+        rejected. Defaults to None (DEFAULT_MAX_BODY_SIZE).
+    """
+    # imported here, so that the other modes do not import asyncio
+    import asyncio
+    from modules.server import DEFAULT_HOST, DEFAULT_MAX_BODY_SIZE, DEFAULT_MAX_PENDING, DEFAULT_PORT, RenderServer
+
+    server = RenderServer(
+        doc_to_screenplay,
+        jobs,
+        max_pending or DEFAULT_MAX_PENDING,
+        max_body_size=max_body_size or DEFAULT_MAX_BODY_SIZE,
+    )
+    try:
+        asyncio.run(server.serve(host or DEFAULT_HOST, port or DEFAULT_PORT, socket_path))
+    except KeyboardInterrupt:
+        lg.info("Stopped serving.")
+    finally:
+        server.close()
+
+
+def main_batch(
+    paths: list, summary_path: Path, use_cache: bool = True, jobs: int = 1, formats: tuple = DEFAULT_FORMATS
+) -> bool:
+    """Renders every project found in the given paths and writes a .json summary.
+
+    Args:
+        paths (list): project directories, or roots searched recursively for projects.
+        summary_path (Path): path to the summary file.
+        use_cache (bool): whether to reuse the cached scenes' layouts. Defaults to True.
+        jobs (int): number of worker processes, each rendering one project at a time. Defaults to 1.
+        formats (tuple): names of the backends to render with. Defaults to DEFAULT_FORMATS.
+
+    Returns:
+        bool: whether every project was rendered.
+    """
+    projects = find_projects(paths, DEFAULT_SCREENPLAY_NAME)
+    lg.info(f"Rendering {len(projects)} project(s) with {jobs} worker(s)...")
+    summary = run_batch(projects, partial(render_project, use_cache=use_cache, formats=formats), jobs)
+    write_summary(summary, summary_path)
+    lg.info(
+        f"{summary['succeeded']} project(s) rendered, {summary['failed']} failed in {summary['seconds']:.3f}s. "
+        f"Summary written to '{summary_path}'."
+    )
+    return summary["failed"] == 0
+
+
+def main_watch(
+    path_to_folder: Path,
+    output_path: Path = None,
+    use_cache: bool = True,
+    jobs: int = 1,
+    formats: tuple = DEFAULT_FORMATS,
+) -> None:
+    """Renders the project each time one of its source files is saved.
+
+    The scenes are kept in memory and only the changed scenes are parsed again, while the
+    layout cache only lays out again the scenes that changed. In a project with included
+    files, only the changed files are parsed again, and the files included after the start
+    are only watched from the next start.
+
+    Args:
+        path_to_folder (Path): path to the project's directory.
+        output_path (Path, optional): path to the rendered pdf. Defaults to None (in the project directory).
+        use_cache (bool): whether to reuse the cached scenes' layouts. Defaults to True.
+        jobs (int): number of worker processes laying out the scenes. Defaults to 1.
+        formats (tuple): names of the backends to render with. Defaults to DEFAULT_FORMATS.
+    """
+    parsed = []
+    try:
+        render_project(path_to_folder, output_path, use_cache, jobs, formats=formats, parsed=parsed)
+    except ProjectError as ex:
+        lg.error(ex)
+        return
+    screenplay, sources = parsed
+    output_paths = get_output_paths(path_to_folder, output_path, formats)
+    metadata_file_path = path_to_folder / DEFAULT_METADATA_NAME
+    screenplay_file_path = path_to_folder / DEFAULT_SCREENPLAY_NAME
+    parse_cache = None
+    if use_cache:
+        parse_cache = ParseCache(path_to_folder / DEFAULT_CACHE_DIR / PARSE_CACHE_NAME, get_parser_fingerprint())
+    multi_file = len(sources) > 1
+    parser = IncrementalParser(partial(iter_scenes, source=str(screenplay_file_path)))
+    if not multi_file:
+        # the scenes of the first render, the file is only parsed again once it changes
+        parser.start(list(iter_screenplay_file(screenplay_file_path)), screenplay.scenes)
+    metadata = read_metadata(metadata_file_path)
+    cache = None
+    if use_cache:
+        cache = LayoutCache(path_to_folder / DEFAULT_CACHE_DIR / LAYOUT_CACHE_NAME, in_memory=True)
+
+    def on_change(changed: list) -> None:
+        nonlocal metadata
+        start = time.perf_counter()
+        try:
+            if metadata_file_path in changed:
+                metadata = read_metadata(metadata_file_path)
+            reparsed = parser.reparsed
+            if multi_file:
+                # the per-file cache only parses again the changed files
+                screenplay = parse_project(screenplay_file_path, metadata_file_path, parse_cache, jobs=jobs)
+                details = f"{len([path for path in changed if path != metadata_file_path])} file(s) changed"
+            else:
+                if screenplay_file_path in changed:
+                    parser.update(list(iter_screenplay_file(screenplay_file_path)))
+                screenplay = Screenplay(*get_screenplay_args(metadata))
+                for scene in parser.scenes:
+                    screenplay.add_scene(scene)
+                details = f"{parser.reparsed - reparsed} scene(s) parsed again"
+            render_screenplay(screenplay, output_paths, cache, jobs)
+        except Exception as ex:
+            lg.error(f"Could not render the project: {ex}")
+            return
+        lg.info(
+            f"Rendered {', '.join(str(path) for path in output_paths.values())} in {time.perf_counter() - start:.3f}s "
+            f"({details})."
+        )
+
+    watched = sources + [metadata_file_path]
+    lg.info(f"Watching {', '.join(repr(str(path)) for path in watched)} (press Ctrl+C to stop)...")
+    try:
+        watch_files(watched, on_change)
+    except KeyboardInterrupt:
+        lg.info("Stopped watching.")
 
 
 ### SCRIPT ###
@@ -227,7 +935,8 @@ if __name__ == "__main__":
     parser.add_argument(
         "project",
         type=str,
-        help=f"path to the project's directory (must contain the screenplay file '{DEFAULT_SCREENPLAY_NAME}' and the metadata file '{DEFAULT_METADATA_NAME}').",
+        nargs="*",
+        help=f"path to the project's directory (must contain the screenplay file '{DEFAULT_SCREENPLAY_NAME}' and the metadata file '{DEFAULT_METADATA_NAME}'). With --batch, any number of project directories or roots to search for projects.",
     )
     parser.add_argument(
         "-o",
@@ -237,10 +946,182 @@ if __name__ == "__main__":
         default=None,
         help=f"path to the rendered pdf. By default, it will be rendered in the project directory as '{DEFAULT_OUTPUT_PATH}'.",
     )
+    parser.add_argument(
+        "-f",
+        "--format",
+        nargs="+",
+        choices=get_backend_names(),
+        default=list(DEFAULT_FORMATS),
+        help="output format(s), all rendered from a single parse: 'pdf', 'pdf-web' for a linearized pdf with a bookmark per scene, and 'text' for a quick plain-text preview (use '-o -' to print it). With several formats, each output gets the extension of its format. Defaults to 'pdf'.",
+    )
+    parser.add_argument(
+        "-c",
+        "--character",
+        type=str,
+        required=False,
+        default=None,
+        help="only render the sides of a character: the scenes where the character speaks, with their original numbers. By default, it will be rendered in the project directory as 'render-<character>.pdf'.",
+    )
+    parser.add_argument(
+        "-s",
+        "--scenes",
+        type=str,
+        required=False,
+        default=None,
+        help="only render the selected scenes, like '40-55' or '3,7,10-12', with their numbers and page numbers in the full pdf. By default, it will be rendered in the project directory as 'render-scenes-<selection>.pdf'.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"parse the screenplay and lay out every scene again, instead of reusing the parsed screenplay and the layouts cached in '{DEFAULT_CACHE_DIR}'.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        required=False,
+        default=1,
+        help="number of worker processes laying out the scenes (with --batch, rendering the projects). By default, everything is done serially.",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        required=False,
+        default=None,
+        help="path to a .json file to write the timings of each stage and scene, and the counters of the render to.",
+    )
+    parser.add_argument(
+        "--profile-format",
+        choices=FORMATS,
+        default=JSON_FORMAT,
+        help=f"format of the profile: plain '{JSON_FORMAT}', or '{CHROME_FORMAT}' trace (chrome://tracing, Perfetto). Defaults to '{JSON_FORMAT}'.",
+    )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="render the project again each time its screenplay or metadata file is saved.",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="only check the source files, without rendering them, and print the problems found as JSON. Exits with an error if there are errors.",
+    )
+    parser.add_argument(
+        "--stats",
+        nargs="?",
+        const="csv",
+        choices=("csv", "json"),
+        default=None,
+        help="only measure the length of each scene in eighths of a page, its lines and its screen time, and the screen time of each character, without rendering the screenplay. Prints them as CSV (or JSON with '--stats json'), or writes them to the --output path.",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="render every project found in the given paths, and write a .json summary of the outcomes.",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="run a render server: POST /render takes the metadata and the screenplay as JSON and answers the pdf, GET /metrics gives the queue depth and latencies. The renders are done by --jobs warm worker processes.",
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        required=False,
+        default=None,
+        help="address the server listens on. Defaults to 127.0.0.1.",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        required=False,
+        default=None,
+        help="port the server listens on. Defaults to 8765.",
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        required=False,
+        default=None,
+        help="path to a Unix socket the server listens on, instead of a TCP port.",
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        required=False,
+        default=None,
+        help="renders queued or running in the server, above which the requests are rejected with 503. Defaults to 32.",
+    )
+    parser.add_argument(
+        "--max-body-size",
+        type=int,
+        required=False,
+        default=None,
+        help="size in bytes of a request body, above which the server rejects the request with 413. Defaults to 16 MiB.",
+    )
+    parser.add_argument(
+        "--summary",
+        type=str,
+        required=False,
+        default=str(DEFAULT_SUMMARY_PATH),
+        help=f"path to the .json summary written by --batch. Defaults to '{DEFAULT_SUMMARY_PATH}'.",
+    )
     args = parser.parse_args()
     lg.root.setLevel(lg.INFO)
+    if args.serve:
+        if args.project:
+            parser.error("--serve takes no project.")
+        main_serve(args.host, args.port, args.socket, args.jobs, args.max_pending, args.max_body_size)
+        raise SystemExit(0)
+    if not args.project:
+        parser.error("a project directory is required.")
+    if (args.character or args.scenes) and (args.batch or args.watch):
+        parser.error("--character and --scenes cannot be used with --batch or --watch.")
+    if args.character and args.scenes:
+        parser.error("--character and --scenes cannot be used together.")
+    if args.check:
+        if args.batch or args.watch:
+            parser.error("--check cannot be used with --batch or --watch.")
+        if len(args.project) > 1:
+            parser.error("only one project can be checked at a time.")
+        raise SystemExit(0 if main_check(Path(args.project[0])) else 1)
+    if args.stats:
+        if args.batch or args.watch or args.character or args.scenes:
+            parser.error("--stats cannot be used with --batch, --watch, --character or --scenes.")
+        if len(args.project) > 1:
+            parser.error("only one project can be measured at a time.")
+        ok = main_stats(Path(args.project[0]), args.output, args.stats, use_cache=not args.no_cache)
+        raise SystemExit(0 if ok else 1)
+    if args.batch:
+        if args.output:
+            parser.error("--output cannot be used with --batch.")
+        ok = main_batch(
+            args.project, Path(args.summary), use_cache=not args.no_cache, jobs=args.jobs, formats=args.format
+        )
+        raise SystemExit(0 if ok else 1)
+    if len(args.project) > 1:
+        parser.error("only one project can be rendered without --batch.")
+    if args.output == STDOUT_PATH and args.format != [TextBackend.name]:
+        parser.error(f"only the '{TextBackend.name}' format can be written to the standard output.")
     if args.output:
         output_path = Path(args.output)
     else:
         output_path = None
-    main(Path(args.project), output_path)
+    if args.watch:
+        main_watch(
+            Path(args.project[0]), output_path, use_cache=not args.no_cache, jobs=args.jobs, formats=args.format
+        )
+    else:
+        profile_path = Path(args.profile) if args.profile else None
+        main(
+            Path(args.project[0]),
+            output_path,
+            use_cache=not args.no_cache,
+            jobs=args.jobs,
+            profile_path=profile_path,
+            profile_format=args.profile_format,
+            formats=args.format,
+            character=args.character,
+            scenes=args.scenes,
+        )
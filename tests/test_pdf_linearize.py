@@ -0,0 +1,49 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+# the tests run against the renderer of this repository
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from render import render_project
+from generate import write_project
+
+pikepdf = pytest.importorskip("pikepdf")
+
+
+### FUNCTIONS ###
+
+
+def check_linearization(path: Path) -> list:
+    """Runs the linearization check of qpdf on a pdf, and returns its warnings."""
+    with pikepdf.open(str(path)) as pdf:
+        assert pdf.is_linearized
+        valid = pdf.check_linearization()
+        warnings = pdf.get_warnings()
+    assert valid, warnings
+    return warnings
+
+
+### TESTS ###
+
+
+def test_demo_is_linearized(tmp_path: Path) -> None:
+    output_path = render_project(ROOT / "demo", tmp_path / "render.web.pdf", use_cache=False, formats=("pdf-web",))
+    assert check_linearization(output_path) == []
+
+
+@pytest.mark.parametrize("nb_scenes", [1, 300])
+def test_generated_project_is_linearized(tmp_path: Path, nb_scenes: int) -> None:
+    project = write_project(tmp_path / "project", nb_scenes)
+    output_path = render_project(project, tmp_path / "render.web.pdf", use_cache=False, formats=("pdf-web",))
+    assert check_linearization(output_path) == []
+
+
+def test_selection_is_linearized(tmp_path: Path) -> None:
+    project = write_project(tmp_path / "project", 60)
+    render_project(project, tmp_path / "render.pdf")
+    output_path = render_project(project, tmp_path / "render.web.pdf", formats=("pdf-web",), scenes="20-30")
+    assert check_linearization(output_path) == []